@@ -1,4 +1,11 @@
 """project metadata."""
-from importlib.metadata import version
+from typing import Any
 
-__version__ = version(__name__)
+
+def __getattr__(name: str) -> Any:
+    """Look up the version only when asked, it is slow to find."""
+    if name == "__version__":
+        from importlib.metadata import version
+
+        return version(__name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
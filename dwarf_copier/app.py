@@ -5,10 +5,36 @@ from typing import Any
 
 from textual.app import App, ComposeResult
 from textual.binding import Binding
+from textual.screen import Screen
 from textual.widgets import Footer, Header
 
 from dwarf_copier import configuration
-from dwarf_copier.screens import DashboardScreen, HelpScreen, QuitScreen, SettingsScreen
+
+
+# Screens are imported when first shown: the help screen in particular pulls in the
+# markdown viewer which is slow to import and rarely needed.
+def _dashboard_screen() -> Screen:
+    from dwarf_copier.screens.dashboard import DashboardScreen
+
+    return DashboardScreen()
+
+
+def _settings_screen() -> Screen:
+    from dwarf_copier.screens.settings import SettingsScreen
+
+    return SettingsScreen()
+
+
+def _search_screen() -> Screen:
+    from dwarf_copier.screens.search import SearchScreen
+
+    return SearchScreen()
+
+
+def _help_screen() -> Screen:
+    from dwarf_copier.screens.help import HelpScreen
+
+    return HelpScreen()
 
 
 class DwarfCopyApp(App):
@@ -21,6 +47,7 @@ class DwarfCopyApp(App):
             key="d", action="toggle_dark", description="Toggle dark mode", show=False
         ),
         ("s", "push_screen('settings')", "Settings"),
+        ("f", "push_screen('search')", "Find"),
         Binding(
             key="question_mark",
             action="push_screen('help')",
@@ -34,11 +61,12 @@ class DwarfCopyApp(App):
         ),
     ]
     MODES = {
-        "dashboard": DashboardScreen,
+        "dashboard": _dashboard_screen,
     }
     SCREENS = {
-        "settings": SettingsScreen,
-        "help": HelpScreen,
+        "settings": _settings_screen,
+        "search": _search_screen,
+        "help": _help_screen,
     }
 
     def __init__(self, *args: Any, **kw: Any) -> None:
@@ -63,6 +91,7 @@ class DwarfCopyApp(App):
 
     def action_request_quit(self) -> None:
         """Action to display the quit dialog."""
+        from dwarf_copier.screens.quit import QuitScreen
 
         def check_quit(confirm_quit: bool) -> None:
             """Called when QuitScreen is dismissed."""
@@ -0,0 +1,397 @@
+"""Catalogue of the sessions on every source, to find a session without opening each.
+
+Sessions are kept in an SQLite database in the cache directory with the targets each
+has been copied to. Queries use indexes on the target name, date, and exposure and
+gain, so they take the same time however large the archive grows.
+
+The catalogue is updated a source at a time. Drive sources report the modification
+time of each session folder and only new or changed folders are read again, other
+sources are listed in full. A source that can't be reached, such as a card that
+isn't inserted, keeps the sessions recorded when it was last seen.
+
+Sessions are fingerprinted as they are read, so copies of a session on several
+sources can be found, together with the throughput measured reading from each source
+(see dedup).
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from fractions import Fraction
+from pathlib import Path
+from typing import Self
+
+from dwarf_copier.configuration import ConfigSource, ConfigurationModel
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.session_record import SessionRecord
+from dwarf_copier.models.source_directory import SourceDirectory
+
+CATALOGUE_FILE = "catalogue.sqlite"
+SEARCH_LIMIT = 500
+# An older catalogue is dropped and rebuilt from the sources.
+SCHEMA_VERSION = 2
+# Weight of the latest measurement in a source's throughput.
+THROUGHPUT_WEIGHT = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    source TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    path TEXT NOT NULL,
+    date TEXT NOT NULL,
+    target TEXT NOT NULL COLLATE NOCASE,
+    exp TEXT NOT NULL,
+    exp_seconds REAL NOT NULL,
+    gain INTEGER NOT NULL,
+    ir TEXT NOT NULL,
+    binning TEXT NOT NULL,
+    format TEXT NOT NULL,
+    dec REAL NOT NULL,
+    ra REAL NOT NULL,
+    stacked INTEGER NOT NULL,
+    taken INTEGER NOT NULL,
+    to_take INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT,
+    PRIMARY KEY (source, folder)
+);
+CREATE INDEX IF NOT EXISTS sessions_folder ON sessions (folder, fingerprint);
+CREATE INDEX IF NOT EXISTS sessions_target ON sessions (target, date);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (date);
+CREATE INDEX IF NOT EXISTS sessions_exp_gain ON sessions (exp_seconds, gain, date);
+CREATE TABLE IF NOT EXISTS copies (
+    target TEXT NOT NULL,
+    source TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    PRIMARY KEY (source, folder, target),
+    FOREIGN KEY (source, folder) REFERENCES sessions ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS copies_target ON copies (target);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    throughput REAL NOT NULL
+);
+"""
+DROP = """
+DROP TABLE IF EXISTS copies;
+DROP TABLE IF EXISTS sessions;
+DROP TABLE IF EXISTS sources;
+"""
+
+COLUMNS = (
+    "path, date, target, exp, gain, ir, binning, format, dec, ra, stacked, taken, "
+    "to_take"
+)
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+DATE_TERM = re.compile(r"^((?:19|20)\d\d)(?:-(\d{1,2}))?(?:-(\d{1,2}))?$")
+
+
+@dataclass
+class Query:
+    """Conditions a session must meet, all are optional."""
+
+    # Wildcards may be used, matching is not case sensitive.
+    target: str | None = None
+    since: datetime | None = None
+    before: datetime | None = None
+    exp: str | None = None
+    gain: int | None = None
+    source: str | None = None
+    copied_to: list[str] = field(default_factory=list)
+    missing_from: list[str] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Found:
+    """A session found in the catalogue."""
+
+    source: str
+    record: SessionRecord
+    copied_to: tuple[str, ...]
+
+
+def parse_query(text: str) -> Query:
+    """Parse a search, e.g. 'M42 2024-03 exp:15 gain:80 at:Backup'.
+
+    Terms are a year, month or day, `exp:`, `gain:` or `source:` followed by a value,
+    `at:` or `missing:` followed by a target name, and anything else is the target
+    name.
+
+    Raises:
+        ValueError: A date, exposure or gain is not valid.
+    """
+    query = Query()
+    names: list[str] = []
+    for term in text.split():
+        key, sep, value = term.partition(":")
+        if (m := DATE_TERM.match(term)) is not None:
+            year, month, day = (int(g) if g else None for g in m.groups())
+            assert year is not None
+            query.since = datetime(year, month or 1, day or 1)
+            if day is not None:
+                query.before = query.since + timedelta(days=1)
+            elif month is not None:
+                query.before = datetime(year + month // 12, month % 12 + 1, 1)
+            else:
+                query.before = datetime(year + 1, 1, 1)
+        elif sep and key == "exp":
+            Fraction(value)
+            query.exp = value
+        elif sep and key == "gain":
+            query.gain = int(value)
+        elif sep and key == "source":
+            query.source = value
+        elif sep and key == "at":
+            query.copied_to.append(value)
+        elif sep and key == "missing":
+            query.missing_from.append(value)
+        else:
+            names.append(term)
+    if names:
+        query.target = " ".join(names)
+    return query
+
+
+def like(pattern: str) -> str:
+    """Convert a wildcard pattern to LIKE, matching names that start with it."""
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_") + "%"
+
+
+class Catalogue:
+    """Sessions on every source, safe to share between threads."""
+
+    def __init__(self, path: Path | str) -> None:
+        if isinstance(path, Path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA foreign_keys = ON")
+        (version,) = self.db.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            self.db.executescript(DROP)
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    def __enter__(self) -> Self:
+        """Use the catalogue, closing it afterwards."""
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Close the database."""
+        self.close()
+
+    def update(self, source: ConfigSource, config: ConfigurationModel) -> int:
+        """Bring a source up to date, returns the number of sessions read."""
+        driver = source.driver
+        with self.lock:
+            known = dict(
+                self.db.execute(
+                    "SELECT folder, mtime_ns FROM sessions WHERE source = ?",
+                    (source.name,),
+                )
+            )
+        try:
+            stamps = driver.session_stamps()
+            if stamps is None:
+                sessions = self._list_all(source)
+                stamps = {s.path.name: 0 for s in sessions}
+            else:
+                sessions = []
+                for name, mtime in stamps.items():
+                    if known.get(name) != mtime:
+                        session = driver.create_session(source.path / name)
+                        if session is not None:
+                            sessions.append(session)
+            fingerprints = [driver.fingerprint(s.path) for s in sessions]
+        except OSError as e:
+            logging.info("Catalogue not updated for %s: %s", source.name, e)
+            return 0
+
+        records = [SessionRecord.from_session(s) for s in sessions]
+        with self.lock, self.db:
+            self.db.executemany(
+                "DELETE FROM sessions WHERE source = ? AND folder = ?",
+                [(source.name, name) for name in known.keys() - stamps.keys()],
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO sessions VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        source.name,
+                        r.name,
+                        r.path,
+                        r.date.strftime(DATE_FORMAT),
+                        r.target,
+                        r.exp,
+                        float(r.exp_fraction),
+                        r.gain,
+                        r.ir,
+                        r.binning,
+                        r.format,
+                        r.dec,
+                        r.ra,
+                        r.stacked,
+                        r.taken,
+                        r.to_take,
+                        stamps[r.name],
+                        fingerprint,
+                    )
+                    for r, fingerprint in zip(records, fingerprints)
+                ],
+            )
+            self.db.executemany(
+                "DELETE FROM copies WHERE source = ? AND folder = ?",
+                [(source.name, r.name) for r in records],
+            )
+        self._update_copies(source, config)
+        return len(records)
+
+    def update_all(self, config: ConfigurationModel) -> int:
+        """Update every configured source, returns the number of sessions read."""
+        return sum(self.update(source, config) for source in config.sources)
+
+    def _list_all(self, source: ConfigSource) -> list[SourceDirectory]:
+        sessions: list[SourceDirectory] = []
+        source.driver.list_dirs(lambda s: None if s is None else sessions.append(s))
+        return sessions
+
+    def _update_copies(self, source: ConfigSource, config: ConfigurationModel) -> None:
+        """Record copies of sessions not yet known to be in each target.
+
+        Sessions aren't removed from a target by the app, so copies already
+        recorded are not checked again unless the source session changes.
+        """
+        for target in config.targets:
+            try:
+                format = config.get_format(target.format)
+            except KeyError:
+                continue
+            with self.lock:
+                rows = self.db.execute(
+                    f"SELECT folder, {COLUMNS} FROM sessions WHERE source = ? "
+                    "AND folder NOT IN "
+                    "(SELECT folder FROM copies WHERE source = ? AND target = ?)",
+                    (source.name, source.name, target.name),
+                ).fetchall()
+            copies = []
+            for folder, *values in rows:
+                session = self._record(values).session()
+                destination = DestinationDirectory(session, target, format).destination
+                if destination.exists():
+                    copies.append((target.name, source.name, folder, str(destination)))
+            with self.lock, self.db:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO copies VALUES (?, ?, ?, ?)", copies
+                )
+
+    @staticmethod
+    def _record(values: list) -> SessionRecord:
+        path, when, *rest = values
+        return SessionRecord(path, datetime.strptime(when, DATE_FORMAT), *rest)
+
+    def search(self, query: Query, limit: int = SEARCH_LIMIT) -> list[Found]:
+        """Sessions matching the query, newest first."""
+        sql, params = select(query, limit)
+        with self.lock:
+            rows = self.db.execute(sql, params).fetchall()
+        return [
+            Found(
+                source,
+                self._record(values),
+                tuple(sorted(targets.split("|"))) if targets else (),
+            )
+            for source, _, *values, targets in rows
+        ]
+
+    def holding(self, folder: str, fingerprint: str) -> list[str]:
+        """Sources with a copy of a session, by folder name and fingerprint."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT source FROM sessions WHERE folder = ? AND fingerprint = ?",
+                (folder, fingerprint),
+            ).fetchall()
+        return [source for (source,) in rows]
+
+    def throughput(self, source: str) -> float | None:
+        """Bytes per second read from a source, None if never measured."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT throughput FROM sources WHERE source = ?", (source,)
+            ).fetchone()
+        return None if row is None else float(row[0])
+
+    def record_throughput(self, source: str, measured: float) -> None:
+        """Add a measurement to the running average for a source."""
+        previous = self.throughput(source)
+        if previous is not None:
+            measured = THROUGHPUT_WEIGHT * measured + (1 - THROUGHPUT_WEIGHT) * previous
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?)", (source, measured)
+            )
+
+    def count(self) -> int:
+        with self.lock:
+            (count,) = self.db.execute("SELECT count(*) FROM sessions").fetchone()
+        return int(count)
+
+
+def select(query: Query, limit: int = SEARCH_LIMIT) -> tuple[str, list[object]]:
+    """SQL and parameters to search for a query."""
+    where: list[str] = []
+    params: list[object] = []
+    if query.target:
+        where.append("target LIKE ? ESCAPE '\\'")
+        params.append(like(query.target))
+    if query.since is not None:
+        where.append("date >= ?")
+        params.append(query.since.strftime(DATE_FORMAT))
+    if query.before is not None:
+        where.append("date < ?")
+        params.append(query.before.strftime(DATE_FORMAT))
+    if query.exp is not None:
+        where.append("exp_seconds = ?")
+        params.append(float(Fraction(query.exp)))
+    if query.gain is not None:
+        where.append("gain = ?")
+        params.append(query.gain)
+    if query.source is not None:
+        where.append("source = ?")
+        params.append(query.source)
+    for targets, test in (
+        (query.copied_to, "EXISTS"),
+        (query.missing_from, "NOT EXISTS"),
+    ):
+        for target in targets:
+            where.append(
+                f"{test} (SELECT 1 FROM copies c WHERE c.source = s.source "
+                "AND c.folder = s.folder AND c.target = ?)"
+            )
+            params.append(target)
+    sql = (
+        f"SELECT source, folder, {COLUMNS}, (SELECT group_concat(target, '|') "
+        "FROM copies c WHERE c.source = s.source AND c.folder = s.folder) "
+        f"FROM sessions s {'WHERE ' + ' AND '.join(where) if where else ''} "
+        "ORDER BY date DESC LIMIT ?"
+    )
+    params.append(limit)
+    return sql, params
+
+
+def open_catalogue() -> Catalogue | None:
+    """The catalogue in the cache directory, None if caching is disabled."""
+    from dwarf_copier.configuration import cache_dir
+
+    cache = cache_dir()
+    return None if cache is None else Catalogue(cache / CATALOGUE_FILE)
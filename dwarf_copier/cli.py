@@ -0,0 +1,512 @@
+"""Command line entry point for dwarf-copy.
+
+With no arguments the Textual user interface is started. Subcommands run without the
+user interface (and without importing Textual) so they can be scripted, e.g. from cron.
+Progress is written to stdout as one JSON object per line.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Any, Sequence
+
+from dwarf_copier import configuration, journal, profiling, report
+from dwarf_copier.catalogue import (
+    CATALOGUE_FILE,
+    SEARCH_LIMIT,
+    Catalogue,
+    open_catalogue,
+    parse_query,
+)
+from dwarf_copier.configuration import (
+    ConfigSource,
+    ConfigTarget,
+    ConfigurationModel,
+    load_config,
+)
+from dwarf_copier.dedup import SourceChooser
+from dwarf_copier.drivers import disk
+from dwarf_copier.frame_filter import Criterion, FrameFilter, parse_ranges
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+from dwarf_copier.pipeline import Progress, SessionRunner
+from dwarf_copier.throttle import Throttle
+from dwarf_copier.watch import SessionWatcher
+
+_emit_lock = threading.Lock()
+
+
+def emit(event: str, **data: Any) -> None:
+    """Write a single progress record to stdout."""
+    line = json.dumps({"event": event, **data}, default=str)
+    with _emit_lock:
+        print(line, flush=True)
+
+
+def get_config(args: argparse.Namespace) -> ConfigurationModel:
+    """Configuration named on the command line, or the usual one."""
+    if args.config is None:
+        return configuration.config
+    path = Path(args.config)
+    return load_config(name=path.name, search_path=[str(path.parent)])
+
+
+def matches(session: SourceDirectory, select: Sequence[str]) -> bool:
+    """Filter sessions by folder or target name."""
+    return not select or any(
+        fnmatch(session.path.name, pattern) or fnmatch(session.info.target, pattern)
+        for pattern in select
+    )
+
+
+def find_sessions(
+    source: ConfigSource,
+    since: datetime | None = None,
+    select: Sequence[str] = (),
+) -> list[SourceDirectory]:
+    """List sessions on a source, filtered by date and folder or target name."""
+    sessions: list[SourceDirectory] = []
+
+    def callback(session: SourceDirectory | None) -> None:
+        if session is None:
+            return
+        if since is not None and session.date < since:
+            return
+        if matches(session, select):
+            sessions.append(session)
+
+    with profiling.phase("list_dirs"):
+        source.driver.list_dirs(callback)
+    return sessions
+
+
+def progress_callback(progress: Progress) -> None:
+    """Report each file as it is copied."""
+    action = progress.action
+    if progress.error is not None:
+        emit(
+            "error",
+            source=action.source,
+            dest=action.dest,
+            error=str(progress.error),
+        )
+    else:
+        emit(
+            type(action).__name__.removesuffix("Command").lower(),
+            source=action.source,
+            dest=action.dest,
+            bytes=progress.bytes,
+        )
+
+
+def get_frame_filter(args: argparse.Namespace) -> FrameFilter:
+    """Frame filter from the command line options."""
+    frame_filter = FrameFilter(ranges=args.frames or [], criteria=args.where)
+    for path in args.reject:
+        try:
+            frame_filter.read_reject_list(path)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Cannot read reject list {path}: {e}")
+    return frame_filter
+
+
+def copy_sessions(
+    sessions: list[list[DestinationDirectory]],
+    source: ConfigSource,
+    workers: int,
+    frame_filter: FrameFilter | None = None,
+    throttle: Throttle | None = None,
+    chooser: SourceChooser | None = None,
+    transfers: int = 0,
+) -> int:
+    """Copy sessions using a pool of worker threads, returns count of failures.
+
+    Each item is a session with a destination for every target it is copied to. With
+    a chooser each session is read from the fastest source holding a copy of it. With
+    transfers the source is read on an event loop instead of by the worker threads.
+    """
+    errors = 0
+    run = report.RunReport()
+    runners: dict[str, SessionRunner] = {}
+    with ExitStack() as stack:
+        for group in sessions:
+            reading, source_dir = source, group[0].source_directory
+            if chooser is not None:
+                reading, source_dir = chooser.choose(source, source_dir)
+            if reading is not source:
+                emit("dedup", session=source_dir.path.name, source=reading.name)
+                group = [
+                    DestinationDirectory(
+                        source_dir, session.config_destination, session.config_format
+                    )
+                    for session in group
+                ]
+            if reading.name not in runners:
+                if throttle is not None:
+                    throttle.limit(reading.path, reading.max_transfers)
+                runners[reading.name] = stack.enter_context(
+                    SessionRunner(
+                        reading,
+                        workers,
+                        progress_callback,
+                        frame_filter,
+                        throttle,
+                        run,
+                        transfers,
+                    )
+                )
+            errors += copy_session(runners[reading.name], group)
+    if chooser is not None:
+        chooser.measured(run, [runner.source for runner in runners.values()])
+    if (path := report.save(run)) is not None:
+        emit("report", path=path)
+    return errors
+
+
+def copy_session(runner: SessionRunner, sessions: list[DestinationDirectory]) -> int:
+    """Copy a single session to one or more targets, returns count of failures."""
+    source = sessions[0].source_directory.path
+    emit("session", source=source, status="start")
+    results = runner.fan_out(sessions)
+    for session, ok in zip(sessions, results):
+        emit(
+            "session",
+            source=source,
+            destination=session.destination,
+            status="done" if ok else "failed",
+        )
+    return results.count(False)
+
+
+def destinations(
+    source_dir: SourceDirectory,
+    targets: list[ConfigTarget],
+    config: ConfigurationModel,
+) -> list[DestinationDirectory]:
+    """Destinations of a session in each target, except those already copied."""
+    sessions = [
+        DestinationDirectory(source_dir, target, config.get_format(target.format))
+        for target in targets
+    ]
+    return [session for session in sessions if not session.destination.exists()]
+
+
+def recover() -> None:
+    """Finish or clear away copies a crash interrupted, before copying again.
+
+    Only run by commands that copy, recovery renames and removes directories.
+    """
+    recovery = journal.journal().recover()
+    if recovery.completed or recovery.removed:
+        logging.info("Recovered interrupted copies: %s", recovery)
+
+
+def copy_command(args: argparse.Namespace) -> int:
+    """Copy sessions from a source to targets without the user interface."""
+    config = get_config(args)
+    try:
+        source = config.get_source(args.source)
+        targets = [config.get_target(name) for name in args.target]
+    except KeyError as e:
+        sys.exit(str(e.args[0]))
+    recover()
+
+    # Sessions already at the destination are skipped, as in the user interface.
+    selected = [
+        sessions
+        for source_dir in find_sessions(source, args.since, args.select)
+        if (sessions := destinations(source_dir, targets, config))
+    ]
+    if (args.frames or args.reject) and len(selected) != 1:
+        sys.exit(
+            "--frames and --reject number the frames of a single session, "
+            f"select exactly one ({len(selected)} selected)"
+        )
+    emit(
+        "start",
+        source=source.name,
+        target=",".join(target.name for target in targets),
+        sessions=len(selected),
+    )
+    throttle = Throttle.from_config(config.general, source, *targets)
+    with ExitStack() as stack:
+        chooser = None
+        if args.dedup and (catalogue := open_catalogue()) is not None:
+            stack.enter_context(catalogue)
+            for other in config.sources:
+                # Only drives are scanned, other sources are recorded by a search.
+                if isinstance(other.driver, disk.Driver):
+                    catalogue.update(other, config)
+            chooser = SourceChooser(catalogue, config.sources)
+        errors = copy_sessions(
+            selected,
+            source,
+            throttle.workers(args.workers or config.general.workers),
+            get_frame_filter(args),
+            throttle,
+            chooser,
+            args.transfers or 0,
+        )
+    emit("finished", sessions=len(selected), errors=errors)
+    return 1 if errors else 0
+
+
+def watch_command(args: argparse.Namespace) -> int:
+    """Copy sessions to targets as they appear on a source, until interrupted."""
+    config = get_config(args)
+    try:
+        source = config.get_source(args.source)
+        targets = [config.get_target(name) for name in args.target]
+    except KeyError as e:
+        sys.exit(str(e.args[0]))
+    if not isinstance(source.driver, disk.Driver):
+        sys.exit(f"Source {source.name} cannot be watched")
+    recover()
+
+    watcher = SessionWatcher(source.driver, settle=args.settle)
+    emit(
+        "watch",
+        source=source.name,
+        target=",".join(target.name for target in targets),
+    )
+    errors = 0
+    throttle = Throttle.from_config(config.general, source, *targets)
+    with SessionRunner(
+        source,
+        throttle.workers(args.workers or config.general.workers),
+        progress_callback,
+        get_frame_filter(args),
+        throttle,
+    ) as runner:
+        try:
+            while True:
+                for source_dir in watcher.poll():
+                    if not matches(source_dir, args.select):
+                        continue
+                    try:
+                        sessions = destinations(source_dir, targets, config)
+                        failed = copy_session(runner, sessions) if sessions else 0
+                    except OSError as e:
+                        # e.g. a full target, keep watching and try again later.
+                        logging.exception("Copying %s failed", source_dir.path)
+                        emit("error", source=source_dir.path, error=str(e))
+                        failed = 1
+                    if failed:
+                        errors += failed
+                        watcher.retry(source_dir)
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+    if (path := report.save(runner.report)) is not None:
+        emit("report", path=path)
+    emit("finished", errors=errors)
+    return 1 if errors else 0
+
+
+def search_command(args: argparse.Namespace) -> int:
+    """Find sessions on any source in the catalogue."""
+    config = get_config(args)
+    try:
+        query = parse_query(" ".join(args.query))
+    except ValueError as e:
+        sys.exit(f"Invalid search: {e}")
+    path = args.catalogue
+    if path is None:
+        if (cache := configuration.cache_dir()) is None:
+            sys.exit("Caching is disabled, give the catalogue file with --catalogue")
+        path = cache / CATALOGUE_FILE
+    with Catalogue(path) as catalogue:
+        if not args.no_update:
+            catalogue.update_all(config)
+        for found in catalogue.search(query, args.limit):
+            record = found.record
+            emit(
+                "found",
+                source=found.source,
+                path=record.path,
+                target=record.target,
+                date=record.date,
+                exp=record.exp,
+                gain=record.gain,
+                copied_to=list(found.copied_to),
+            )
+    return 0
+
+
+def add_filter_arguments(
+    parser: argparse.ArgumentParser, per_session: bool = True
+) -> None:
+    """Options to exclude frames from the copy.
+
+    Args:
+        parser: Parser of the command the options are added to.
+        per_session: False if the command copies sessions not yet known, frame
+            numbers and reject lists only make sense for a single session.
+    """
+    parser.add_argument(
+        "--where",
+        type=Criterion.parse,
+        action="append",
+        default=[],
+        metavar="KEY<op>VALUE",
+        help="Only copy frames whose FITS header matches, e.g. 'CCD-TEMP<20' "
+        "(may be repeated)",
+    )
+    if not per_session:
+        parser.set_defaults(frames=None, reject=[])
+        return
+    parser.add_argument(
+        "--frames",
+        type=parse_ranges,
+        metavar="RANGES",
+        help="Only copy these frames, e.g. 0-99,120,150-",
+    )
+    parser.add_argument(
+        "--reject",
+        type=Path,
+        action="append",
+        default=[],
+        metavar="FILE",
+        help="Do not copy frames excluded in a Siril .seq file, or listed one per "
+        "line by name or number (may be repeated)",
+    )
+
+
+def parser() -> argparse.ArgumentParser:
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(
+        prog="dwarf-copy",
+        description="Copy files from Dwarf II telescope to PC.",
+    )
+    parser.add_argument("--config", help="Configuration file to use")
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="DIR",
+        help="Profile listing sessions and copying, writing the results to DIR",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    copy = subparsers.add_parser("copy", help=copy_command.__doc__)
+    copy.add_argument("--source", required=True, help="Name of configured source")
+    copy.add_argument(
+        "--target",
+        required=True,
+        action="append",
+        help="Name of configured target, may be repeated to copy to several targets "
+        "reading the source once",
+    )
+    copy.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="Only copy sessions started on or after this date (YYYY-MM-DD)",
+    )
+    copy.add_argument(
+        "--select",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Only copy sessions whose folder or target name matches this wildcard "
+        "(may be repeated)",
+    )
+    copy.add_argument("--workers", type=int, help="Number of files to copy at once")
+    copy.add_argument(
+        "--transfers",
+        type=int,
+        help="Read up to this many files at once on one event loop, not a thread each",
+    )
+    copy.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Read each session from whichever source holding an identical copy "
+        "has been fastest, scanning every drive source first",
+    )
+    add_filter_arguments(copy)
+    copy.set_defaults(func=copy_command)
+
+    watch = subparsers.add_parser("watch", help=watch_command.__doc__)
+    watch.add_argument("--source", required=True, help="Name of configured source")
+    watch.add_argument(
+        "--target",
+        required=True,
+        action="append",
+        help="Name of configured target (may be repeated)",
+    )
+    watch.add_argument(
+        "--select",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Only copy sessions whose folder or target name matches this wildcard "
+        "(may be repeated)",
+    )
+    watch.add_argument("--workers", type=int, help="Number of files to copy at once")
+    watch.add_argument(
+        "--interval", type=float, default=5.0, help="Seconds between polls"
+    )
+    watch.add_argument(
+        "--settle",
+        type=float,
+        default=30.0,
+        help="Seconds a session must be unchanged before it is copied",
+    )
+    add_filter_arguments(watch, per_session=False)
+    watch.set_defaults(func=watch_command)
+
+    search = subparsers.add_parser("search", help=search_command.__doc__)
+    search.add_argument(
+        "query",
+        nargs="*",
+        help="Target name and terms such as 2024-03, exp:15, gain:80, at:TARGET or "
+        "missing:TARGET",
+    )
+    search.add_argument(
+        "--no-update",
+        action="store_true",
+        help="Search without reading new sessions from the sources first",
+    )
+    search.add_argument(
+        "--limit", type=int, default=SEARCH_LIMIT, help="Most sessions to list"
+    )
+    search.add_argument(
+        "--catalogue", type=Path, help="Catalogue file, defaults to the cache"
+    )
+    search.set_defaults(func=search_command)
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Parse arguments and run the requested command."""
+    args = parser().parse_args(argv)
+    if profile := args.profile or profiling.configured():
+        profiling.start(profile)
+    try:
+        if args.command is None:
+            from dwarf_copier.app import DwarfCopyApp
+
+            if args.config is not None:
+                configuration.config = get_config(args)
+            # The app copies too.
+            recover()
+            DwarfCopyApp().run()
+            return 0
+        result: int = args.func(args)
+        return result
+    finally:
+        profiling.stop()
+
+
+def run() -> None:
+    """Run dwarf-copy."""
+    sys.exit(main())
+
+
+if __name__ == "__main__":
+    run()
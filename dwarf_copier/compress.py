@@ -0,0 +1,44 @@
+"""Compression of FITS files as they are copied.
+
+Compression is CPU bound so it runs in the process stage rather than in the copy
+worker threads which would otherwise be serialised by the GIL. The copy worker
+blocks on the result, so the number of files compressed at once is still limited by
+the number of copy workers.
+
+This module is imported by the pool processes so must stay free of heavy imports.
+"""
+
+import gzip
+import os
+import shutil
+from concurrent.futures import Future
+from pathlib import Path
+
+from dwarf_copier.processes import stage
+
+BLOCK_SIZE = 1024 * 1024
+GZIP_LEVEL = 6
+FITS_SUFFIXES = (".fits", ".fit", ".fts")
+
+
+def is_fits(name: str) -> bool:
+    """True if the name is that of an uncompressed FITS file."""
+    return name.lower().endswith(FITS_SUFFIXES)
+
+
+def gzip_file(src: str, dest: str, remove: bool) -> int:
+    """Write a gzip compressed copy of src, returns the size of the original."""
+    with open(src, "rb") as f_in, gzip.open(dest, "wb", GZIP_LEVEL) as f_out:
+        shutil.copyfileobj(f_in, f_out, BLOCK_SIZE)
+        size = f_in.tell()
+    if remove:
+        os.unlink(src)
+    return size
+
+
+def compress_file(src: Path, dest: Path, remove: bool = False) -> "Future[int]":
+    """Compress src to dest in the process pool.
+
+    If remove is true src is a temporary copy which is deleted once compressed.
+    """
+    return stage().pool.submit(gzip_file, str(src), str(dest), remove)
@@ -3,6 +3,8 @@
 Read/write configuration file. Searches locations to find an available file.
 """
 
+import hashlib
+import json
 import logging
 import os
 import sys
@@ -11,10 +13,16 @@ from enum import StrEnum
 from functools import cached_property
 from pathlib import Path
 from string import Template
-from typing import Annotated, Callable, Literal, Self, Sequence
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    Any,
+    Callable,
+    Literal,
+    Self,
+    Sequence,
+)
 
-import rich.text
-import yaml
 from pydantic import (
     BaseModel,
     ConfigDict,
@@ -25,11 +33,13 @@ from pydantic import (
     model_validator,
 )
 from pydantic_core import core_schema
-from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from dwarf_copier.models.destination_directory import DestinationDirectory
 from dwarf_copier.models.source_directory import SourceDirectory
 
+if TYPE_CHECKING:
+    import rich.text
+
 __all__ = ["config"]
 
 ConfigTemplate = Annotated[
@@ -54,6 +64,21 @@ class SourceType(StrEnum):
     MTP = "MTP"
 
 
+class Compression(StrEnum):
+    """Compression applied to FITS files copied to the target."""
+
+    NONE = "none"
+    GZIP = "gzip"
+
+
+class Durability(StrEnum):
+    """When copied files are flushed to disk."""
+
+    NONE = "none"
+    FILE = "file"
+    SESSION = "session"
+
+
 class ConfigCopy(BaseModel):
     """Single copy or link."""
 
@@ -88,6 +113,10 @@ class ConfigFormat(BaseModel):
     copy_only: list[ConfigCopy] = Field(
         default=[], description="List of files to copy, never link"
     )
+    compress: Compression = Field(
+        default=Compression.NONE,
+        description="Compress FITS files that are copied, 'gzip' writes .fits.gz",
+    )
 
 
 class BaseDriver(ABC):
@@ -113,8 +142,8 @@ class BaseDriver(ABC):
         """Build maps of files to be copied or linked."""
 
     @abstractmethod
-    def copy_file(self, src: Path, dest: Path) -> None:
-        """Copy a single file."""
+    def copy_file(self, src: Path, dest: Path) -> int:
+        """Copy a single file, returns the number of bytes copied."""
 
     @abstractmethod
     def link_file(self, src: Path, dest: Path) -> None:
@@ -124,16 +153,44 @@ class BaseDriver(ABC):
     def match_wildcards(self, base: Path, filename: str) -> list[Path]:
         """Expand a wildcard pattern."""
 
+    def first_match(self, base: Path, filename: str) -> Path | None:
+        """First path a wildcard pattern matches, in the order of match_wildcards."""
+        return next(iter(self.match_wildcards(base, filename)), None)
+
     @abstractmethod
     def create_session(self, p: Path) -> SourceDirectory | None:
         """Create reference to a source directory."""
 
+    def local_path(self, src: Path) -> Path | None:
+        """Path to read a source file directly, or None if it must be copied."""
+        return None
+
+    def session_stamps(self) -> dict[str, int] | None:
+        """Modification time of each session folder by name, None if unknown.
+
+        Lets the catalogue read only the sessions that have changed.
+        """
+        return None
+
+    def fingerprint(self, p: Path) -> str | None:
+        """Identity of a session's content, see dedup. None if unknown."""
+        return None
+
 
 class ConfigGeneral(BaseModel):
     """General configuration."""
 
     theme: str = Field(default="dark", description="App theme")
     workers: int = Field(default=4, description="Number of workers to copy files.")
+    bandwidth: float | None = Field(
+        default=None,
+        gt=0,
+        description="Limit on copying in MB/s shared by all workers, None for no limit",
+    )
+    background: bool = Field(
+        default=False,
+        description="Copy workers run at low CPU and I/O priority",
+    )
 
 
 class ConfigSourceBase(BaseModel):
@@ -151,6 +208,12 @@ class ConfigSourceBase(BaseModel):
             "for both source and target.",
         ),
     ] = False
+    max_transfers: int | None = Field(
+        default=None,
+        ge=1,
+        description="Most files read from this source at once, e.g. 1 or 2 for an SD "
+        "card. Defaults to the general workers setting",
+    )
 
     darks: list[ConfigTemplate] = Field(
         default=[
@@ -216,6 +279,7 @@ class ConfigSourceFTP(ConfigSourceBase):
     user: Annotated[
         str, Field(default="", description="User name for networked drives")
     ] = ""
+    port: Annotated[int, Field(default=21, description="Port for FTP connections")] = 21
 
     def describe(self) -> str:
         """Return formatted description of the source for display to the user."""
@@ -227,11 +291,45 @@ class ConfigSourceFTP(ConfigSourceBase):
             ]
         )
 
+    @cached_property
+    def driver(self) -> "BaseDriver":
+        """Return the appropriate driver for this source."""
+        from dwarf_copier.drivers import ftp
+
+        return ftp.Driver(
+            self.path,
+            host=self.ip_address or "",
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            cache_dir=cache_dir(),
+        )
+
 
 class ConfigSourceMTP(ConfigSourceBase):
-    """Defines a source of Dwarf data, may be a local path or a network drive."""
+    """Defines a source of Dwarf data on a device connected by USB."""
 
-    type: Literal[SourceType.FTP] = SourceType.FTP
+    type: Literal[SourceType.MTP] = SourceType.MTP
+    device: Annotated[
+        str, Field(default="", description="Device to connect to over MTP")
+    ] = ""
+
+    def describe(self) -> str:
+        """Return formatted description of the source for display to the user."""
+        return "\n".join(
+            [
+                f" Source: [b]{self.name}[/b]",
+                f" Device: [i]{self.device}[/i]",
+                f"   Path: [i]{self.path}[/i]",
+            ]
+        )
+
+    @cached_property
+    def driver(self) -> "BaseDriver":
+        """Return the appropriate driver for this source."""
+        from dwarf_copier.drivers import mtp
+
+        return mtp.Driver(self.path, mtp.connect(self.device))
 
 
 ConfigSource = ConfigSourceDrive | ConfigSourceFTP | ConfigSourceMTP
@@ -251,6 +349,17 @@ class ConfigTarget(BaseModel):
             "for both source and target.",
         ),
     ] = False
+    max_transfers: int | None = Field(
+        default=None,
+        ge=1,
+        description="Most files written to this target at once, e.g. 8 for a NAS. "
+        "Defaults to the general workers setting",
+    )
+    durability: Durability = Field(
+        default=Durability.NONE,
+        description="Flush copies to disk: 'file' as each file is copied, 'session' "
+        "once the whole session is copied, or 'none' to leave it to the system",
+    )
 
     @field_validator("path")
     @classmethod
@@ -301,8 +410,10 @@ class ConfigurationModel(BaseModel):
     def get_format(self, name: str) -> ConfigFormat:
         return self._formats[name]
 
-    def describe_target(self, target: ConfigTarget) -> rich.text.Text:
+    def describe_target(self, target: ConfigTarget) -> "rich.text.Text":
         """Return formatted description of the source for display to the user."""
+        import rich.text
+
         fmt = next(
             (f for f in self.formats if f.name.lower() == target.format.lower()), None
         )
@@ -328,85 +439,128 @@ class ConfigurationModel(BaseModel):
         return self
 
 
-class Settings(BaseSettings):
-    """Global settings."""
+DEFAULT_SD_PATH = Path(r"D:\DWARF_II\Astronomy" if os.name == "nt" else "/mnt/sdcard")
+
 
-    model_config = SettingsConfigDict(env_prefix="dwarf_copy_")
+def _default_backup_path() -> Path:
+    return (
+        Path(r"C:\Backup\Dwarf_II" if os.name == "nt" else "~/Backup/Dwarf_II")
+        .expanduser()
+        .resolve()
+    )
 
-    config_filename: str = "dwarf-copy.yml"
-    config_path: Annotated[
-        str,
-        Field(
-            default="~/AppData/dwarf-copy",
-            description=f"Search path for config files (use '{os.pathsep
-                                                          }' to separate elements)",
-        ),
-    ]
 
+def _default_siril_path() -> Path:
+    return (
+        Path(r"C:\Astrophotography" if os.name == "nt" else "~/Astrophotography")
+        .expanduser()
+        .resolve()
+    )
 
-DEFAULT_SD_PATH = Path(r"D:\DWARF_II\Astronomy" if os.name == "nt" else "/mnt/sdcard")
-DEFAULT_BACKUP_PATH = (
-    Path(r"C:\Backup\Dwarf_II" if os.name == "nt" else "~/Backup/Dwarf_II")
-    .expanduser()
-    .resolve()
-)
-DEFAULT_SIRIL_PATH = (
-    Path(r"C:\Astrophotography" if os.name == "nt" else "~/Astrophotography")
-    .expanduser()
-    .resolve()
-)
-DEFAULT_CONFIG = ConfigurationModel(
-    general=ConfigGeneral(),
-    sources=[
-        ConfigSourceDrive(name="MicroSD", path=DEFAULT_SD_PATH),
-        ConfigSourceFTP(
-            name="WiFi Direct",
-            ip_address="192.168.88.1",
-            path=Path("/Astronomy"),
-            type=SourceType.FTP,
-        ),
-        ConfigSourceDrive(
-            name="Backup",
-            path=DEFAULT_BACKUP_PATH,
-            darks=["../DWARF_DARKS_EXP_${exp}_GAIN_${gain}_${Y}-${M}-${d}"],
-        ),
-    ],
-    targets=[
-        ConfigTarget(name="Backup", path=DEFAULT_BACKUP_PATH, format="Backup"),
-        ConfigTarget(
-            name="Astrophotography", path=DEFAULT_SIRIL_PATH, format="Siril", link=True
-        ),
-    ],
-    formats=[
-        ConfigFormat(
-            name="Backup",
-            description="Copy files without changes",
-            path="DWARF_RAW_${target_}EXP_${exp}_GAIN_${gain}_${Y}-${M}-${d}-${H}-${m}-${S}-${ms}",
-            darks="../DWARF_DARKS_EXP_${exp}_GAIN_${gain}_${Y}-${M}-${d}",
-            copy_only=[ConfigCopy(source="*", destination="${name}")],
-        ),
-        ConfigFormat(
-            name="Siril",
-            description="Copy into Siril directory structure",
-            path="${name}_EXP_${exp}_GAIN_${gain}_${Y}_${M}_${d}",
-            darks="darks",
-            flats="flats",
-            biases="biases",
-            directories=["darks", "lights", "flats", "biases"],
-            link_or_copy=[
-                ConfigCopy(
-                    source="stacked-16_*.fits", destination="${name}"
-                ),  # New stacked image.
-                ConfigCopy(source="shotsInfo.json", destination="shotsInfo.json"),
-                ConfigCopy(source="*.fits", destination="lights/${name}"),
-                ConfigCopy(source="*.jpg", destination="${target}-${name}"),
-                ConfigCopy(
-                    source="*.png", destination="${target}-${name}"
-                ),  # Old stacked image.
-            ],
-        ),
-    ],
-)
+
+def _default_config() -> ConfigurationModel:
+    """Build the configuration used when no configuration file is found."""
+    backup_path = _default_backup_path()
+    siril_path = _default_siril_path()
+    return ConfigurationModel(
+        general=ConfigGeneral(),
+        sources=[
+            ConfigSourceDrive(name="MicroSD", path=DEFAULT_SD_PATH),
+            ConfigSourceFTP(
+                name="WiFi Direct",
+                ip_address="192.168.88.1",
+                path=Path("/Astronomy"),
+                type=SourceType.FTP,
+            ),
+            ConfigSourceDrive(
+                name="Backup",
+                path=backup_path,
+                darks=["../DWARF_DARKS_EXP_${exp}_GAIN_${gain}_${Y}-${M}-${d}"],
+            ),
+        ],
+        targets=[
+            ConfigTarget(name="Backup", path=backup_path, format="Backup"),
+            ConfigTarget(
+                name="Astrophotography", path=siril_path, format="Siril", link=True
+            ),
+        ],
+        formats=[
+            ConfigFormat(
+                name="Backup",
+                description="Copy files without changes",
+                path="DWARF_RAW_${target_}EXP_${exp}_GAIN_${gain}_${Y}-${M}-${d}-${H}-${m}-${S}-${ms}",
+                darks="../DWARF_DARKS_EXP_${exp}_GAIN_${gain}_${Y}-${M}-${d}",
+                copy_only=[ConfigCopy(source="*", destination="${name}")],
+            ),
+            ConfigFormat(
+                name="Siril",
+                description="Copy into Siril directory structure",
+                path="${name}_EXP_${exp}_GAIN_${gain}_${Y}_${M}_${d}",
+                darks="darks",
+                flats="flats",
+                biases="biases",
+                directories=["darks", "lights", "flats", "biases"],
+                link_or_copy=[
+                    ConfigCopy(
+                        source="stacked-16_*.fits", destination="${name}"
+                    ),  # New stacked image.
+                    ConfigCopy(source="shotsInfo.json", destination="shotsInfo.json"),
+                    ConfigCopy(source="*.fits", destination="lights/${name}"),
+                    ConfigCopy(source="*.jpg", destination="${target}-${name}"),
+                    ConfigCopy(
+                        source="*.png", destination="${target}-${name}"
+                    ),  # Old stacked image.
+                ],
+            ),
+        ],
+    )
+
+
+def cache_dir() -> Path | None:
+    """Directory for cached data, None if caching is disabled."""
+    from dwarf_copier.settings import Settings
+
+    settings = Settings()
+    return Path(settings.cache_path).expanduser() if settings.cache_path else None
+
+
+def _cache_file(cache: Path, config_file: Path) -> Path:
+    """Name of the cached copy of a configuration file."""
+    key = hashlib.sha1(str(config_file).encode()).hexdigest()
+    return cache / f"config-{key}.json"
+
+
+def _read_config_data(config_file: Path, cache: Path | None) -> dict:
+    """Parse a YAML configuration file.
+
+    Parsing YAML is slow compared to JSON so the parsed data is saved in the cache
+    directory and reused for as long as the file's size and mtime are unchanged.
+    """
+    stat = config_file.stat()
+    stamp = [stat.st_mtime_ns, stat.st_size]
+    cache_file = None if cache is None else _cache_file(cache, config_file)
+    if cache_file is not None:
+        try:
+            cached = json.loads(cache_file.read_text())
+            if cached["path"] == str(config_file) and cached["stamp"] == stamp:
+                data: dict = cached["data"]
+                return data
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    data = yaml.load(config_file.read_text(), Loader=loader)
+    if cache_file is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            cache_file.write_text(
+                json.dumps({"path": str(config_file), "stamp": stamp, "data": data})
+            )
+        except (OSError, TypeError, ValueError) as e:
+            logging.debug("Config not cached: %s", e)
+    return data
 
 
 def load_config(
@@ -414,11 +568,14 @@ def load_config(
     search_path: Sequence[str] = (),
 ) -> ConfigurationModel:
     """Search for configuration file and load the first one found."""
+    from dwarf_copier.settings import Settings
+
     settings = Settings()
     if not name:
         name = settings.config_filename
     if not search_path:
         search_path = settings.config_path.split(os.pathsep)
+    cache = cache_dir()
 
     for directory in [Path(s).expanduser().resolve() for s in search_path] + [
         (Path(__file__).parent.resolve())
@@ -426,8 +583,9 @@ def load_config(
         config_file = directory / name
         logging.debug("config %s", config_file)
         if config_file.exists():
-            data: dict = yaml.safe_load(config_file.read_text())
-            logging.info("Using config %r", data)
+            data = _read_config_data(config_file, cache)
+            logging.info("Using config %s", config_file)
+            logging.debug("Config data %r", data)
             try:
                 return ConfigurationModel(**data)
             except ValidationError as e:
@@ -435,9 +593,33 @@ def load_config(
 
     logging.warning("No configuration found, using default")
 
-    config = DEFAULT_CONFIG.model_copy(deep=True)
-    logging.warning("Config %r", config)
-    return config
+    return _default_config()
+
+
+config: ConfigurationModel
+"""Active configuration, loaded from file the first time it is accessed."""
+
+DEFAULT_CONFIG: ConfigurationModel
+"""Configuration used when no configuration file is found."""
+
+DEFAULT_BACKUP_PATH: Path
+DEFAULT_SIRIL_PATH: Path
+
+_LAZY: dict[str, Callable[[], Any]] = {
+    "config": load_config,
+    "DEFAULT_CONFIG": _default_config,
+    "DEFAULT_BACKUP_PATH": _default_backup_path,
+    "DEFAULT_SIRIL_PATH": _default_siril_path,
+}
+
 
+def __getattr__(name: str) -> Any:
+    """Create expensive module attributes on first access."""
+    if name in _LAZY:
+        value = globals()[name] = _LAZY[name]()
+        return value
+    if name == "Settings":
+        from dwarf_copier.settings import Settings
 
-config = load_config()
+        return Settings
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,131 @@
+"""Copy a session from the fastest source holding an identical copy.
+
+The same session folder is often on the card, a backup disk and a NAS. A session is
+fingerprinted by its folder name, a hash of its shotsInfo.json and the number and
+total size of its files, copies with the same fingerprint are treated as identical.
+The catalogue records the fingerprint of each session it reads and the throughput
+measured reading from each source, so a copy may read from whichever source holding
+the session has been fastest. Both copies are fingerprinted again before switching.
+
+A source that has never been read is timed reading one frame of the session, that
+measurement is then refined by every run which reads from the source.
+"""
+
+import hashlib
+import logging
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING, Iterable, Sequence
+
+from dwarf_copier.configuration import ConfigSource
+from dwarf_copier.models.source_directory import SourceDirectory
+
+if TYPE_CHECKING:
+    from dwarf_copier.catalogue import Catalogue
+    from dwarf_copier.report import RunReport
+
+
+def fingerprint(name: str, shots_info: bytes, sizes: Iterable[int]) -> str:
+    """Fingerprint of a session folder."""
+    sizes = list(sizes)
+    digest = hashlib.sha256(shots_info).hexdigest()[:16]
+    return f"{name}:{digest}:{len(sizes)}:{sum(sizes)}"
+
+
+def stream_throughput(run: "RunReport", folder: Path) -> float | None:
+    """Bytes per second each worker read from a folder, None if nothing was read.
+
+    Based on the time workers were busy, so it doesn't depend on how many ran.
+    """
+    with run.lock:
+        files = [
+            f
+            for f in run.files
+            if f.error is None and Path(f.source).is_relative_to(folder)
+        ]
+    size = sum(f.bytes for f in files)
+    busy = sum(f.timing.busy for f in files)
+    return size / busy if size and busy else None
+
+
+def probe(source: ConfigSource, session: Path) -> float | None:
+    """Bytes per second reading the first frame of a session, None if unknown."""
+    try:
+        frames = sorted(source.driver.match_wildcards(session, "*.fits"))
+        if not frames:
+            return None
+        with TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            size = source.driver.copy_file(frames[0], Path(tmp) / frames[0].name)
+            elapsed = time.perf_counter() - started
+    except OSError as e:
+        logging.debug("Cannot time reading %s: %s", session, e)
+        return None
+    return size / elapsed if size and elapsed else None
+
+
+class SourceChooser:
+    """Picks the source to read each session from."""
+
+    def __init__(self, catalogue: "Catalogue", sources: Sequence[ConfigSource]) -> None:
+        self.catalogue = catalogue
+        self.sources = {source.name: source for source in sources}
+
+    def choose(
+        self, source: ConfigSource, session: SourceDirectory
+    ) -> tuple[ConfigSource, SourceDirectory]:
+        """The fastest source with an identical copy of the session.
+
+        The given source is kept unless another has been measured to be faster.
+        Sources never measured are probed, only when another source holds the
+        session.
+        """
+        name = session.path.name
+        try:
+            expected = source.driver.fingerprint(session.path)
+        except OSError as e:
+            logging.debug("Cannot fingerprint %s: %s", session.path, e)
+            return source, session
+        if expected is None:
+            return source, session
+
+        others = [
+            other
+            for other_name in self.catalogue.holding(name, expected)
+            if (other := self.sources.get(other_name)) is not None
+            and other is not source
+        ]
+        if not others:
+            return source, session
+
+        best, best_session = source, session
+        best_speed = self.speed(source, session.path)
+        for other in others:
+            path = other.path / name
+            try:
+                if other.driver.fingerprint(path) != expected:
+                    continue
+                if (speed := self.speed(other, path)) <= best_speed:
+                    continue
+                other_session = other.driver.create_session(path)
+            except OSError as e:
+                logging.debug("Cannot read %s: %s", path, e)
+                continue
+            if other_session is not None:
+                best, best_session, best_speed = other, other_session, speed
+        return best, best_session
+
+    def speed(self, source: ConfigSource, session: Path) -> float:
+        """Throughput of a source, probed with a frame of the session if unknown."""
+        if (speed := self.catalogue.throughput(source.name)) is None:
+            if (speed := probe(source, session)) is None:
+                return 0.0
+            self.catalogue.record_throughput(source.name, speed)
+        return speed
+
+    def measured(self, run: "RunReport", sources: Iterable[ConfigSource]) -> None:
+        """Record the throughput of each source read in a run."""
+        for source in sources:
+            if (speed := stream_throughput(run, source.path)) is not None:
+                self.catalogue.record_throughput(source.name, speed)
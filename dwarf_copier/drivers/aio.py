@@ -0,0 +1,220 @@
+"""asyncio-native interface used to access photo files.
+
+`AsyncDriver` mirrors `BaseDriver` with coroutines and an async iterator of sessions.
+Network-backed drivers can implement it directly to multiplex many transfers on one
+event loop. Existing synchronous drivers are wrapped by `ThreadedDriver` which runs
+each call in a worker thread.
+
+`copy_all` runs copy commands with many transfers waiting on one event loop. For a
+wrapped synchronous driver each command runs pipeline's run_command in a thread, so
+the copy commands keep a single implementation.
+"""
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+
+from dwarf_copier import pipeline, profiling
+from dwarf_copier.compress import compress_file
+from dwarf_copier.configuration import BaseDriver, ConfigFormat
+from dwarf_copier.model import CompressCommand, CopyCommand, LinkCommand
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+from dwarf_copier.pipeline import FileCommand, Progress, ProgressCallback
+from dwarf_copier.throttle import Throttle
+
+
+class AsyncDriver(ABC):
+    """Async interface used to access photo files."""
+
+    @abstractmethod
+    def list_sessions(self) -> AsyncIterator[SourceDirectory]:
+        """Iterate over the sessions on the source."""
+
+    @abstractmethod
+    async def create_session(self, p: Path) -> SourceDirectory | None:
+        """Create reference to a source directory."""
+
+    @abstractmethod
+    async def prepare(
+        self,
+        format: ConfigFormat,
+        session: DestinationDirectory,
+        target_path: Path,
+    ) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
+        """Build maps of files to be copied or linked."""
+
+    @abstractmethod
+    async def copy_file(self, src: Path, dest: Path) -> int:
+        """Copy a single file, returns the number of bytes copied."""
+
+    @abstractmethod
+    async def link_file(self, src: Path, dest: Path) -> None:
+        """Create a link from dest back to src."""
+
+    @abstractmethod
+    async def match_wildcards(self, base: Path, filename: str) -> list[Path]:
+        """Expand a wildcard pattern."""
+
+    def local_path(self, src: Path) -> Path | None:
+        """Path to read a source file directly, or None if it must be copied."""
+        return None
+
+
+class _Stop(Exception):
+    """Raised in the listing thread when the consumer has gone away."""
+
+
+class ThreadedDriver(AsyncDriver):
+    """Adapter running a synchronous driver's methods in worker threads."""
+
+    def __init__(self, driver: BaseDriver, buffer: int = 16) -> None:
+        self.driver = driver
+        self.buffer = buffer
+
+    async def list_sessions(self) -> AsyncIterator[SourceDirectory]:
+        """Iterate over sessions as the driver's list_dirs finds them.
+
+        The listing thread blocks once `buffer` sessions are waiting to be consumed.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[SourceDirectory | None] = asyncio.Queue(self.buffer)
+        stopped = False
+
+        def callback(session: SourceDirectory | None) -> None:
+            if stopped:
+                raise _Stop()
+            asyncio.run_coroutine_threadsafe(queue.put(session), loop).result()
+
+        def list_dirs() -> None:
+            try:
+                with profiling.phase("list_dirs"):
+                    self.driver.list_dirs(callback)
+            finally:
+                # Make sure the consumer wakes up even if list_dirs failed.
+                if not stopped:
+                    callback(None)
+
+        listing = loop.run_in_executor(None, list_dirs)
+        try:
+            while (session := await queue.get()) is not None:
+                yield session
+        finally:
+            stopped = True
+            # Unblock the listing thread if it is waiting for space in the queue.
+            while not listing.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait([listing], timeout=0.01)
+            try:
+                await listing
+            except _Stop:
+                pass
+
+    async def create_session(self, p: Path) -> SourceDirectory | None:
+        return await asyncio.to_thread(self.driver.create_session, p)
+
+    async def prepare(
+        self,
+        format: ConfigFormat,
+        session: DestinationDirectory,
+        target_path: Path,
+    ) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
+        """Build maps of files to be copied or linked."""
+        return await asyncio.to_thread(
+            self.driver.prepare, format, session, target_path
+        )
+
+    async def copy_file(self, src: Path, dest: Path) -> int:
+        """Copy a single file, returns the number of bytes copied."""
+        return await asyncio.to_thread(self.driver.copy_file, src, dest)
+
+    async def link_file(self, src: Path, dest: Path) -> None:
+        """Create a link from dest back to src."""
+        await asyncio.to_thread(self.driver.link_file, src, dest)
+
+    async def match_wildcards(self, base: Path, filename: str) -> list[Path]:
+        """Expand a wildcard pattern."""
+        return await asyncio.to_thread(self.driver.match_wildcards, base, filename)
+
+    def local_path(self, src: Path) -> Path | None:
+        """Path to read a source file directly, or None if it must be copied."""
+        return self.driver.local_path(src)
+
+
+def adapt(driver: BaseDriver | AsyncDriver) -> AsyncDriver:
+    """Return an async interface to any driver."""
+    return driver if isinstance(driver, AsyncDriver) else ThreadedDriver(driver)
+
+
+def run_held(driver: BaseDriver, action: FileCommand, throttle: Throttle) -> Progress:
+    """Run a command in a thread, as a pipeline worker would."""
+    with throttle.hold(action):
+        progress = pipeline.run_command(driver, action)
+    throttle.transferred(progress.bytes)
+    return progress
+
+
+async def run_command(
+    driver: AsyncDriver, action: FileCommand, throttle: Throttle
+) -> Progress:
+    """Execute a command, catching any error so it can be reported.
+
+    A native driver waits for the transfer on the event loop. Its transfers are
+    limited by the concurrency of copy_all and the bandwidth limit, not by the
+    throttle's per-folder limits which would block the loop.
+    """
+    if isinstance(driver, ThreadedDriver):
+        return await asyncio.to_thread(run_held, driver.driver, action, throttle)
+    started = time.perf_counter()
+    size = 0
+    try:
+        match action:
+            case CopyCommand():
+                size = await driver.copy_file(action.source, action.dest)
+
+            case LinkCommand():
+                await driver.link_file(action.source, action.dest)
+
+            case CompressCommand():
+                await driver.copy_file(action.source, action.raw)
+                size = await asyncio.wrap_future(
+                    compress_file(action.raw, action.dest, remove=True)
+                )
+        await asyncio.to_thread(pipeline.finish, action, driver.local_path)
+    except Exception as e:
+        logging.exception("%s failed", action.description)
+        return Progress(action, error=e, started=started)
+    await asyncio.to_thread(throttle.transferred, size)
+    return Progress(action, size, started=started)
+
+
+async def copy_all(
+    driver: AsyncDriver,
+    commands: Iterable[FileCommand],
+    concurrency: int,
+    callback: ProgressCallback,
+    throttle: Throttle | None = None,
+) -> None:
+    """Run commands with at most `concurrency` transfers in flight at once.
+
+    Commands are taken from the iterable only as there is room for them, and the
+    callback is made on the event loop as each completes.
+    """
+    throttle = throttle or Throttle()
+    queue: asyncio.Queue[FileCommand | None] = asyncio.Queue(concurrency)
+
+    async def worker() -> None:
+        while (command := await queue.get()) is not None:
+            callback(await run_command(driver, command, throttle))
+
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(concurrency):
+            tg.create_task(worker())
+        for command in commands:
+            await queue.put(command)
+        for _ in range(concurrency):
+            await queue.put(None)
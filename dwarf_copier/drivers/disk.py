@@ -1,12 +1,17 @@
 """Driver for photo files accessible via a file path."""
 
+import errno
+import fnmatch
+import logging
+import os
 import re
 import shutil
+import sys
 from datetime import datetime
-from functools import cached_property
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterable
 
+from dwarf_copier import dedup, report
 from dwarf_copier.configuration import BaseDriver, ConfigFormat
 from dwarf_copier.models.destination_directory import DestinationDirectory
 from dwarf_copier.models.shots_info import ShotsInfo
@@ -17,6 +22,122 @@ FOLDER_PATTERN = (
     "<year>-<mon>-<day>-<hour>-<min>-<sec>-<millisec>"
 )
 SHOTS_INFO = "shotsInfo.json"
+CHUNK_SIZE = 8 * 1024 * 1024
+# Smaller files are written in one go, there is nothing to gain preallocating them.
+PREALLOCATE_SIZE = 1024 * 1024
+# sendfile between files and posix_fadvise starting writeback are Linux behaviour.
+SEQUENTIAL_HINTS = sys.platform == "linux"
+
+
+def folder_regex(template: str) -> re.Pattern:
+    """Convert the 'friendly' folder pattern into a regex."""
+    pattern = re.compile(
+        re.sub("<([a-zA-Z0-9]+)>", "(?P<\\1>.*?)", re.escape(template)) + "$"
+    )
+    return pattern
+
+
+FOLDER_REGEX = folder_regex(FOLDER_PATTERN)
+
+
+def make_session(p: Path, shots_info: str | bytes) -> SourceDirectory | None:
+    """Create a session from its folder path and the content of shotsInfo.json.
+
+    Returns None if the folder name is not a Dwarf session folder.
+    """
+    if (m := FOLDER_REGEX.match(p.name)) is None:
+        return None
+    info = ShotsInfo.model_validate_json(shots_info)
+
+    year, mon, day, hour, min, sec, millisec = [
+        int(s) for s in m.group("year", "mon", "day", "hour", "min", "sec", "millisec")
+    ]
+    return SourceDirectory(
+        path=p,
+        info=info,
+        date=datetime(year, mon, day, hour, min, sec, millisec * 1000),
+    )
+
+
+def file_maps(
+    session: DestinationDirectory, names: Iterable[str], target_path: Path
+) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
+    """Build maps of files to be copied or linked, the result of a driver's prepare.
+
+    Args:
+        session: Session being copied, with the format deciding where files go.
+        names: Names of the files in the session folder, however the driver lists
+            them. Hidden files are ignored.
+        target_path: Working directory the session is copied into.
+    """
+    format = session.config_format
+    folder = session.source_directory.path
+    names = sorted(name for name in names if not name.startswith("."))
+    mkdirs = [target_path / d for d in format.directories]
+    links: dict[Path, str] = {}
+    copies: dict[Path, str] = {}
+    # A file goes to the first operation matching it, linking before copying.
+    for ops, found in ((format.link_or_copy, links), (format.copy_only, copies)):
+        for op in ops:
+            for name in fnmatch.filter(names, op.source):
+                p = folder / name
+                if p not in links and p not in copies:
+                    found[p] = session.source_directory.format_filename(
+                        op.destination, name=name
+                    )
+    return mkdirs, links, copies
+
+
+def copy_sequential(src: Path, dest: Path) -> int:
+    """Copy a large file without fragmenting the target or filling the page cache.
+
+    The destination is preallocated at its final size so the filesystem can keep it
+    contiguous. The source is read with sequential read ahead, and each chunk is
+    dropped from the page cache once copied so a night's frames do not evict
+    everything else. Asking to drop written pages also starts their writeback, they
+    are dropped on the next pass once written.
+
+    Returns:
+        Number of bytes copied.
+    """
+    with open(src, "rb") as f_in, open(dest, "wb") as f_out:
+        fd_in, fd_out = f_in.fileno(), f_out.fileno()
+        size = os.fstat(fd_in).st_size
+        os.posix_fadvise(fd_in, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        if size >= PREALLOCATE_SIZE:
+            try:
+                os.posix_fallocate(fd_out, 0, size)
+            except OSError as e:
+                logging.debug("Cannot preallocate %s: %s", dest, e)
+        report.mark("open")
+
+        offset = previous = 0
+        while True:
+            try:
+                sent = os.sendfile(fd_out, fd_in, offset, CHUNK_SIZE)
+            except OSError as e:
+                if offset or e.errno not in (errno.EINVAL, errno.ENOSYS):
+                    raise
+                # Filesystem without sendfile support.
+                f_out.seek(0)
+                shutil.copyfileobj(f_in, f_out, CHUNK_SIZE)
+                offset = f_out.tell()
+                break
+            if sent == 0:
+                break
+            os.posix_fadvise(fd_in, offset, sent, os.POSIX_FADV_DONTNEED)
+            os.posix_fadvise(
+                fd_out, previous, offset + sent - previous, os.POSIX_FADV_DONTNEED
+            )
+            previous = offset
+            offset += sent
+
+        if offset != size:
+            # The source changed size while being copied.
+            os.ftruncate(fd_out, offset)
+        report.mark("transfer")
+    report.mark("close")
+    return offset
 
 
 class Driver(BaseDriver):
@@ -30,42 +151,40 @@ class Driver(BaseDriver):
     def __init__(self, root: Path) -> None:
         self.root = root
 
-    def _folder_regex(self, template: str) -> re.Pattern:
-        """Convert the 'friendly' folder pattern into a regex."""
-        pattern = re.compile(
-            re.sub("<([a-zA-Z0-9]+)>", "(?P<\\1>.*?)", re.escape(template)) + "$"
-        )
-        return pattern
-
-    @cached_property
+    @property
     def pattern(self) -> re.Pattern:
         """Pre-compiled regex to match our template."""
-        return self._folder_regex(FOLDER_PATTERN)
+        return FOLDER_REGEX
 
     def list_dirs(self, callback: Callable[[SourceDirectory | None], None]) -> None:
-        for p in self.root.glob("DWARF_RAW*"):
+        for p in sorted(self.root.glob("DWARF_RAW*")):
             session = self.create_session(p)
             if session is not None:
                 callback(session)
         callback(None)
 
+    def session_stamps(self) -> dict[str, int]:
+        """Modification time of each session folder, from a single directory scan."""
+        with os.scandir(self.root) as entries:
+            return {
+                entry.name: entry.stat().st_mtime_ns
+                for entry in entries
+                if entry.name.startswith("DWARF_RAW") and entry.is_dir()
+            }
+
+    def fingerprint(self, p: Path) -> str:
+        """Fingerprint of a session from its shotsInfo.json and a directory scan."""
+        with os.scandir(p) as entries:
+            sizes = [entry.stat().st_size for entry in entries if entry.is_file()]
+        return dedup.fingerprint(p.name, (p / SHOTS_INFO).read_bytes(), sizes)
+
     def create_session(self, p: Path) -> SourceDirectory | None:
         if (
             p.is_dir()
             and (p / SHOTS_INFO).exists()
-            and (m := self.pattern.match(p.name)) is not None
+            and self.pattern.match(p.name) is not None
         ):
-            info = ShotsInfo.model_validate_json((p / SHOTS_INFO).read_text())
-
-            year, mon, day, hour, min, sec, millisec = [
-                int(s)
-                for s in m.group("year", "mon", "day", "hour", "min", "sec", "millisec")
-            ]
-            return SourceDirectory(
-                path=p,
-                info=info,
-                date=datetime(year, mon, day, hour, min, sec, millisec * 1000),
-            )
+            return make_session(p, (p / SHOTS_INFO).read_text())
         return None
 
     def prepare(
@@ -75,34 +194,29 @@ class Driver(BaseDriver):
         target_path: Path,
     ) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
         """Build maps of files to be copied or linked."""
-        format = session.config_format
-        mkdirs = [target_path / d for d in format.directories]
-        links: dict[Path, str] = {}
-        for op in format.link_or_copy:
-            for p in session.source_directory.path.glob(op.source):
-                if p not in links:
-                    links[p] = session.source_directory.format_filename(
-                        op.destination, name=p.name
-                    )
-
-        copies: dict[Path, str] = {}
-        for op in format.copy_only:
-            for p in session.source_directory.path.glob(op.source):
-                if p not in copies and p not in links:
-                    copies[p] = session.source_directory.format_filename(
-                        op.destination, name=p.name
-                    )
+        with os.scandir(session.source_directory.path) as it:
+            names = [entry.name for entry in it if entry.is_file()]
+        return file_maps(session, names, target_path)
 
-        return mkdirs, links, copies
-
-    def copy_file(self, src: Path, dest: Path) -> None:
+    def copy_file(self, src: Path, dest: Path) -> int:
         """Copy a single file."""
+        if SEQUENTIAL_HINTS:
+            return copy_sequential(src, dest)
         shutil.copyfile(src, dest)
+        return dest.stat().st_size
 
     def link_file(self, src: Path, dest: Path) -> None:
         """Create a link from dest back to src."""
         dest.symlink_to(src)
 
+    def local_path(self, src: Path) -> Path | None:
+        """Files on disk can be read directly."""
+        return src
+
     def match_wildcards(self, base: Path, filename: str) -> list[Path]:
         """Match files in base."""
         return list(base.glob(filename))
+
+    def first_match(self, base: Path, filename: str) -> Path | None:
+        """First match in base, without listing the rest."""
+        return next(base.glob(filename), None)
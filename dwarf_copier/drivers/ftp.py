@@ -0,0 +1,272 @@
+"""Driver for photo files on the Dwarf's FTP server (WiFi Direct or STA mode).
+
+Control connections are kept open in a pool so each copy worker reuses its own
+connection rather than logging in for every file. Sessions are listed with MLSD and
+the parsed shotsInfo.json of each session is cached against the folder's modify time,
+so listing a card again only downloads shotsInfo.json for new or changed sessions.
+"""
+
+import ftplib
+import hashlib
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Callable, Iterator
+
+from dwarf_copier.configuration import BaseDriver, ConfigFormat
+from dwarf_copier.drivers.disk import (
+    FOLDER_REGEX,
+    SHOTS_INFO,
+    file_maps,
+    make_session,
+)
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+
+BLOCK_SIZE = 1024 * 1024
+Facts = dict[str, str]
+
+
+class ConnectionPool:
+    """Pool of logged in FTP control connections.
+
+    Connections are created on demand so the pool grows to the number of threads
+    using it at once, i.e. one per copy worker. A connection that fails is dropped
+    rather than returned to the pool.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 21,
+        user: str = "",
+        password: str = "",
+        timeout: float = 30.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+        self.idle: list[ftplib.FTP] = []
+        self.lock = threading.Lock()
+
+    def connect(self) -> ftplib.FTP:
+        ftp = ftplib.FTP(timeout=self.timeout)
+        ftp.connect(self.host, self.port)
+        ftp.login(self.user, self.password)
+        ftp.voidcmd("TYPE I")
+        return ftp
+
+    @contextmanager
+    def connection(self) -> Iterator[ftplib.FTP]:
+        """Borrow a connection for the duration of the context."""
+        with self.lock:
+            ftp = self.idle.pop() if self.idle else None
+        if ftp is None:
+            ftp = self.connect()
+        healthy = False
+        try:
+            yield ftp
+            healthy = True
+        except ftplib.error_perm:
+            # e.g. file not found, the connection itself is still usable.
+            healthy = True
+            raise
+        finally:
+            if healthy:
+                with self.lock:
+                    self.idle.append(ftp)
+            else:
+                ftp.close()
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for ftp in idle:
+            try:
+                ftp.quit()
+            except ftplib.all_errors:
+                ftp.close()
+
+
+@contextmanager
+def ftp_errors() -> Iterator[None]:
+    """Raise the errors ftplib reports from the server as OSError.
+
+    Callers report an OSError against the file or source rather than failing.
+    """
+    try:
+        yield
+    except OSError:
+        raise
+    except ftplib.all_errors as e:
+        raise OSError(f"FTP error: {e}") from e
+
+
+def parse_mlst(response: str) -> Facts:
+    """Extract the facts from an MLST response."""
+    for line in response.splitlines():
+        if line.startswith(" "):
+            facts, _, _ = line[1:].partition(" ")
+            return {
+                k.lower(): v
+                for k, _, v in (f.partition("=") for f in facts.split(";") if f)
+            }
+    return {}
+
+
+class Driver(BaseDriver):
+    """Class used to access photo files over FTP.
+
+    Paths are the paths on the server, only their posix form is sent to the server.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        host: str,
+        port: int = 21,
+        user: str = "",
+        password: str = "",
+        cache_dir: Path | None = None,
+    ) -> None:
+        self.root = root
+        self.pool = ConnectionPool(host, port, user, password)
+        self.cache_file = (
+            None
+            if cache_dir is None
+            else cache_dir / f"ftp-{hashlib.sha1(host.encode()).hexdigest()}.json"
+        )
+        self._shots: dict[str, str] | None = None
+        self.lock = threading.Lock()
+
+    @property
+    def shots(self) -> dict[str, str]:
+        """Cached shotsInfo.json content keyed by folder path and modify time."""
+        if self._shots is None:
+            self._shots = {}
+            if self.cache_file is not None and self.cache_file.exists():
+                try:
+                    self._shots = json.loads(self.cache_file.read_text())
+                except ValueError:
+                    pass
+        return self._shots
+
+    def save_cache(self) -> None:
+        if self.cache_file is None or self._shots is None:
+            return
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            self.cache_file.write_text(json.dumps(self._shots))
+        except OSError as e:
+            logging.debug("FTP cache not saved: %s", e)
+
+    def mlsd(self, ftp: ftplib.FTP, path: Path) -> list[tuple[str, Facts]]:
+        """List a folder, omitting the '.' and '..' entries."""
+        return [
+            (name, facts)
+            for name, facts in ftp.mlsd(path.as_posix(), facts=["type", "modify"])
+            if facts.get("type") not in ("cdir", "pdir")
+        ]
+
+    def read(self, ftp: ftplib.FTP, path: Path) -> bytes:
+        """Download a small file into memory."""
+        chunks: list[bytes] = []
+        ftp.retrbinary(f"RETR {path.as_posix()}", chunks.append)
+        return b"".join(chunks)
+
+    def load_session(
+        self, ftp: ftplib.FTP, p: Path, modify: str
+    ) -> SourceDirectory | None:
+        """Create session, downloading shotsInfo.json only if it is not cached."""
+        if FOLDER_REGEX.match(p.name) is None:
+            return None
+        key = f"{p.as_posix()}|{modify}"
+        with self.lock:
+            text = self.shots.get(key)
+        if text is None:
+            try:
+                text = self.read(ftp, p / SHOTS_INFO).decode()
+            except ftplib.error_perm:
+                return None
+            with self.lock:
+                self.shots[key] = text
+        return make_session(p, text)
+
+    def list_dirs(self, callback: Callable[[SourceDirectory | None], None]) -> None:
+        with ftp_errors(), self.pool.connection() as ftp:
+            for name, facts in sorted(self.mlsd(ftp, self.root)):
+                if facts.get("type") != "dir" or not name.startswith("DWARF_RAW"):
+                    continue
+                session = self.load_session(
+                    ftp, self.root / name, facts.get("modify", "")
+                )
+                if session is not None:
+                    callback(session)
+        self.save_cache()
+        callback(None)
+
+    def create_session(self, p: Path) -> SourceDirectory | None:
+        with self.pool.connection() as ftp:
+            try:
+                facts = parse_mlst(ftp.sendcmd(f"MLST {p.as_posix()}"))
+            except ftplib.error_perm:
+                return None
+            if facts.get("type") != "dir":
+                return None
+            return self.load_session(ftp, p, facts.get("modify", ""))
+
+    def prepare(
+        self,
+        format: ConfigFormat,
+        session: DestinationDirectory,
+        target_path: Path,
+    ) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
+        """Build maps of files to be copied or linked."""
+        with ftp_errors(), self.pool.connection() as ftp:
+            names = [
+                name
+                for name, facts in self.mlsd(ftp, session.source_directory.path)
+                if facts.get("type") == "file"
+            ]
+        return file_maps(session, names, target_path)
+
+    def copy_file(self, src: Path, dest: Path) -> int:
+        """Copy a single file, streaming it straight to the destination."""
+        size = 0
+        with ftp_errors(), self.pool.connection() as ftp, dest.open("wb") as f:
+
+            def write(data: bytes) -> None:
+                nonlocal size
+                size += len(data)
+                f.write(data)
+
+            ftp.retrbinary(f"RETR {src.as_posix()}", write, blocksize=BLOCK_SIZE)
+        return size
+
+    def link_file(self, src: Path, dest: Path) -> None:
+        """Files on an FTP server cannot be linked so copy instead."""
+        self.copy_file(src, dest)
+
+    def match_wildcards(self, base: Path, filename: str) -> list[Path]:
+        """Match files in base, wildcards may be used in any part of the path."""
+        matches = [base]
+        with self.pool.connection() as ftp:
+            for part in Path(filename).parts:
+                if part == "..":
+                    matches = [p.parent for p in matches]
+                    continue
+                found: list[Path] = []
+                for p in matches:
+                    try:
+                        entries = self.mlsd(ftp, p)
+                    except ftplib.error_perm:
+                        continue
+                    found.extend(p / name for name, _ in entries if fnmatch(name, part))
+                matches = found
+        return sorted(matches)
@@ -0,0 +1,230 @@
+"""Driver for photo files on a device connected over USB using MTP.
+
+MTP addresses objects by handle rather than by path, and every request is a round
+trip over USB, so the driver is written against a small transport interface which
+lists all the objects in a folder with their properties in one request (rather than
+querying each object's properties individually) and streams object content in
+chunks. Folder listings are cached so resolving a path only costs a request for
+folders that have not been seen before.
+
+The device only processes one operation at a time so transport requests are
+serialised by the driver.
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from pathlib import Path, PurePosixPath
+from typing import Callable, Iterator
+
+from dwarf_copier.configuration import BaseDriver, ConfigFormat
+from dwarf_copier.drivers.disk import (
+    FOLDER_REGEX,
+    SHOTS_INFO,
+    file_maps,
+    make_session,
+)
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+
+ROOT = 0xFFFFFFFF
+BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class MTPObject:
+    """An object on the device with the properties returned when listing."""
+
+    handle: int
+    name: str
+    folder: bool
+    size: int
+    modified: float
+
+
+class MTPTransport(ABC):
+    """Requests made to the device."""
+
+    @abstractmethod
+    def list_objects(self, parent: int) -> list[MTPObject]:
+        """List every object in a folder, with its properties, in one request."""
+
+    @abstractmethod
+    def read_object(self, handle: int, chunk_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+        """Stream the content of an object."""
+
+    def close(self) -> None:
+        """Release the device."""
+
+
+class FilesystemTransport(MTPTransport):
+    """Serves a local folder as though it were the storage on an MTP device.
+
+    Used to develop and benchmark without a device. Handles are allocated as objects
+    are listed, as a device would, and `requests` counts the requests made. An
+    optional `latency` in seconds is added to each request to simulate USB round
+    trips.
+    """
+
+    def __init__(self, root: Path, latency: float = 0.0) -> None:
+        self.root = root
+        self.latency = latency
+        self.requests = 0
+        self.paths: dict[int, Path] = {ROOT: root}
+        self.handles: dict[Path, int] = {root: ROOT}
+
+    def request(self) -> None:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def handle(self, p: Path) -> int:
+        if (handle := self.handles.get(p)) is None:
+            handle = self.handles[p] = len(self.handles)
+            self.paths[handle] = p
+        return handle
+
+    def list_objects(self, parent: int) -> list[MTPObject]:
+        self.request()
+        objects: list[MTPObject] = []
+        with os.scandir(self.paths[parent]) as it:
+            for entry in it:
+                st = entry.stat()
+                objects.append(
+                    MTPObject(
+                        handle=self.handle(Path(entry.path)),
+                        name=entry.name,
+                        folder=entry.is_dir(),
+                        size=st.st_size,
+                        modified=st.st_mtime,
+                    )
+                )
+        return objects
+
+    def read_object(self, handle: int, chunk_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+        self.request()
+        with self.paths[handle].open("rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+
+def connect(device: str) -> MTPTransport:
+    """Open the transport for a device.
+
+    No USB transport is bundled, so for now the device must be a local folder holding
+    a copy of the device's storage which is served by `FilesystemTransport`.
+    """
+    path = Path(device).expanduser()
+    if not device or not path.is_dir():
+        raise FileNotFoundError(f"MTP device {device!r} not found")
+    return FilesystemTransport(path)
+
+
+class Driver(BaseDriver):
+    """Class used to access photo files over MTP.
+
+    Paths are paths on the device storage, they are resolved to handles by listing
+    each folder from the storage root.
+    """
+
+    def __init__(self, root: Path, transport: MTPTransport) -> None:
+        self.root = root
+        self.transport = transport
+        self.listings: dict[PurePosixPath, dict[str, MTPObject]] = {}
+        self.lock = threading.RLock()
+
+    def children(self, p: Path, refresh: bool = False) -> dict[str, MTPObject] | None:
+        """Objects in a folder keyed by name, or None if the folder does not exist."""
+        path = PurePosixPath("/", p.as_posix())
+        with self.lock:
+            if not refresh and path in self.listings:
+                return self.listings[path]
+            if path == PurePosixPath("/"):
+                handle = ROOT
+            else:
+                parent = self.children(Path(path.parent))
+                obj = None if parent is None else parent.get(path.name)
+                if obj is None or not obj.folder:
+                    return None
+                handle = obj.handle
+            listing = {o.name: o for o in self.transport.list_objects(handle)}
+            self.listings[path] = listing
+            return listing
+
+    def find(self, p: Path) -> MTPObject | None:
+        parent = self.children(p.parent)
+        return None if parent is None else parent.get(p.name)
+
+    def read(self, obj: MTPObject) -> bytes:
+        with self.lock:
+            return b"".join(self.transport.read_object(obj.handle))
+
+    def load_session(self, p: Path) -> SourceDirectory | None:
+        if FOLDER_REGEX.match(p.name) is None:
+            return None
+        files = self.children(p)
+        if files is None or (info := files.get(SHOTS_INFO)) is None:
+            return None
+        return make_session(p, self.read(info))
+
+    def list_dirs(self, callback: Callable[[SourceDirectory | None], None]) -> None:
+        with self.lock:
+            self.listings.clear()
+        folders = self.children(self.root) or {}
+        for name in sorted(folders):
+            if folders[name].folder and name.startswith("DWARF_RAW"):
+                session = self.load_session(self.root / name)
+                if session is not None:
+                    callback(session)
+        callback(None)
+
+    def create_session(self, p: Path) -> SourceDirectory | None:
+        obj = self.find(p)
+        if obj is None or not obj.folder:
+            return None
+        return self.load_session(p)
+
+    def prepare(
+        self,
+        format: ConfigFormat,
+        session: DestinationDirectory,
+        target_path: Path,
+    ) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
+        """Build maps of files to be copied or linked."""
+        folder = session.source_directory.path
+        listing = self.children(folder, refresh=True) or {}
+        names = [name for name, obj in listing.items() if not obj.folder]
+        return file_maps(session, names, target_path)
+
+    def copy_file(self, src: Path, dest: Path) -> int:
+        """Copy a single file, streaming it straight to the destination."""
+        obj = self.find(src)
+        if obj is None or obj.folder:
+            raise FileNotFoundError(f"{src} not found on device")
+        size = 0
+        with self.lock, dest.open("wb") as f:
+            for chunk in self.transport.read_object(obj.handle):
+                size += len(chunk)
+                f.write(chunk)
+        return size
+
+    def link_file(self, src: Path, dest: Path) -> None:
+        """Files on an MTP device cannot be linked so copy instead."""
+        self.copy_file(src, dest)
+
+    def match_wildcards(self, base: Path, filename: str) -> list[Path]:
+        """Match files in base, wildcards may be used in any part of the path."""
+        matches = [base]
+        for part in Path(filename).parts:
+            if part == "..":
+                matches = [p.parent for p in matches]
+                continue
+            found: list[Path] = []
+            for p in matches:
+                listing = self.children(p) or {}
+                found.extend(p / name for name in listing if fnmatch(name, part))
+            matches = found
+        return sorted(matches)
@@ -0,0 +1,105 @@
+"""Flushing copied sessions to stable storage.
+
+A session is copied into a working directory that is renamed to its destination
+once complete. To survive a crash the files and directories must reach the disk
+before the rename, and the rename itself must reach the disk afterwards. Without
+that a power cut can leave a complete looking session containing empty files.
+
+Calling fsync on each file as it is written makes every copy wait for the disk.
+Syncing the whole session before the rename lets the kernel write back the files
+while others are still being copied, and the remaining flushes are made together
+so the filesystem can combine them into a few journal commits.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from dwarf_copier.configuration import Durability
+
+SYNC_THREADS = 8
+
+
+def fsync_file(path: Path) -> None:
+    """Flush a single file to disk.
+
+    Windows only flushes a file opened for writing, elsewhere reading is enough
+    and works for read only copies.
+    """
+    fd = os.open(path, os.O_RDWR if os.name == "nt" else os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path: Path) -> None:
+    """Flush a directory's entries to disk.
+
+    Not every platform can open a directory, Windows makes its metadata durable
+    without this so failures are ignored.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError as e:
+        logging.debug("Cannot sync %s: %s", path, e)
+        return
+    try:
+        os.fsync(fd)
+    except OSError as e:
+        logging.debug("Cannot sync %s: %s", path, e)
+    finally:
+        os.close(fd)
+
+
+def sync_tree(root: Path, files: bool = True) -> None:
+    """Flush a directory tree, the files first then the directories.
+
+    Args:
+        root: Top of the tree.
+        files: False if each file has already been flushed as it was written, only
+            the directories are then synced.
+    """
+    dirs: list[Path] = []
+    paths: list[Path] = []
+    for folder, _, names in os.walk(root):
+        dirs.append(Path(folder))
+        if files:
+            # Links are recorded in their directory, syncing one would sync the
+            # file it points at.
+            paths.extend(
+                p for name in names if not (p := Path(folder, name)).is_symlink()
+            )
+    with ThreadPoolExecutor(SYNC_THREADS, thread_name_prefix="fsync") as pool:
+        # fsync releases the GIL, flushes in parallel are committed together.
+        list(pool.map(fsync_file, paths))
+        list(pool.map(fsync_dir, reversed(dirs)))
+
+
+def commit(
+    working_path: Path,
+    destination: Path,
+    durability: Durability,
+    before_rename: Callable[[], None] | None = None,
+) -> None:
+    """Rename a completed working directory to its destination.
+
+    Unless durability is none the session is on disk before it is renamed and the
+    rename is on disk before this returns.
+
+    Args:
+        working_path: The completed working directory.
+        destination: Where it is renamed to.
+        durability: What is flushed to disk.
+        before_rename: Called once the session is on disk, to record the intent
+            to rename it.
+    """
+    if durability != Durability.NONE:
+        sync_tree(working_path, files=durability == Durability.SESSION)
+    if before_rename is not None:
+        before_rename()
+    working_path.rename(destination)
+    if durability != Durability.NONE:
+        fsync_dir(destination.parent)
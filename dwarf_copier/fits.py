@@ -0,0 +1,149 @@
+"""Read FITS headers without reading the pixel data.
+
+A FITS header is a sequence of 2880 byte blocks of 80 character cards ending with an
+END card. Only those blocks are read, using positioned reads, so indexing a session
+costs a few KB per frame however large the frames are.
+
+The headers of a session are saved in an index file in the cache directory. A frame
+is only read again if its size or modification time have changed.
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+from dwarf_copier.compress import is_fits
+from dwarf_copier.models.frame_header import FrameHeader, FrameIndex, HeaderValue
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+MAX_BLOCKS = 100
+SKIP = ("", "COMMENT", "HISTORY", "CONTINUE")
+
+Header = dict[str, HeaderValue]
+
+
+def parse_value(text: str) -> HeaderValue:
+    """Convert the value field of a card."""
+    text = text.strip()
+    if text.startswith("'"):
+        # Quotes in a string are doubled, the value stops at a lone quote.
+        chars: list[str] = []
+        i = 1
+        while i < len(text):
+            if text[i] == "'":
+                if text[i + 1 : i + 2] != "'":
+                    break
+                i += 1
+            chars.append(text[i])
+            i += 1
+        return "".join(chars).rstrip()
+    value = text.partition("/")[0].strip()
+    if value in ("T", "F"):
+        return value == "T"
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value.replace("D", "E"))
+    except ValueError:
+        return value
+
+
+def parse_block(block: bytes, header: Header) -> bool:
+    """Add the cards in a block to the header, returns True at the END card."""
+    for i in range(0, len(block), CARD_SIZE):
+        card = block[i : i + CARD_SIZE].decode("ascii", errors="replace")
+        keyword = card[:8].rstrip()
+        if keyword == "END":
+            return True
+        if keyword in SKIP or card[8:10] != "= ":
+            continue
+        header[keyword] = parse_value(card[10:])
+    return False
+
+
+def read_header(fd: int) -> Header:
+    """Read the primary header of an open file, empty if it is not a FITS file."""
+    header: Header = {}
+    for n in range(MAX_BLOCKS):
+        block = os.pread(fd, BLOCK_SIZE, n * BLOCK_SIZE)
+        if n == 0 and not block.startswith(b"SIMPLE  ="):
+            return {}
+        if parse_block(block, header) or len(block) < BLOCK_SIZE:
+            break
+    return header
+
+
+def read_file_header(path: str) -> Header:
+    """Read the primary header of a file, empty if it is not a FITS file."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return read_header(fd)
+    finally:
+        os.close(fd)
+
+
+def index_file(cache: Path, folder: Path) -> Path:
+    """Index file for a session folder."""
+    key = hashlib.sha1(str(folder).encode()).hexdigest()
+    return cache / "frames" / f"{key}.json"
+
+
+def load_index(path: Path | None, folder: Path) -> dict[str, FrameHeader]:
+    """Frames previously indexed keyed by file name, empty if there is no index."""
+    if path is None:
+        return {}
+    try:
+        index = FrameIndex.model_validate_json(path.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    if index.path != str(folder):
+        return {}
+    return {frame.name: frame for frame in index.frames}
+
+
+def index_session(folder: Path, cache: Path | None) -> list[FrameHeader]:
+    """Headers of the FITS files in a session folder, sorted by file name.
+
+    Returns an empty list if the folder cannot be read.
+    """
+    folder = folder.resolve()
+    path = None if cache is None else index_file(cache, folder)
+    known = load_index(path, folder)
+    frames: list[FrameHeader] = []
+    changed = False
+    try:
+        entries = sorted(
+            (e for e in os.scandir(folder) if e.is_file() and is_fits(e.name)),
+            key=lambda e: e.name,
+        )
+    except OSError:
+        return []
+    for entry in entries:
+        st = entry.stat()
+        frame = known.get(entry.name)
+        stamp = (st.st_size, st.st_mtime_ns)
+        if frame is None or (frame.size, frame.mtime_ns) != stamp:
+            try:
+                header = read_file_header(entry.path)
+            except OSError as e:
+                logging.debug("Header not read: %s", e)
+                continue
+            frame = FrameHeader(
+                name=entry.name, size=st.st_size, mtime_ns=st.st_mtime_ns, header=header
+            )
+            changed = True
+        frames.append(frame)
+
+    if path is not None and (changed or len(frames) != len(known)):
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(
+                FrameIndex(path=str(folder), frames=frames).model_dump_json()
+            )
+        except OSError as e:
+            logging.debug("Frame index not saved: %s", e)
+    return frames
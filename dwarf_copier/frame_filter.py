@@ -0,0 +1,177 @@
+"""Exclude individual frames of a session before they are copied.
+
+Frames may be excluded by frame number, by a list of frames rejected by Siril, or
+by criteria on their FITS headers. A frame is only excluded on evidence: if a
+header is not available or lacks the keyword, the frame is kept.
+"""
+
+import logging
+import operator
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from dwarf_copier.compress import is_fits
+from dwarf_copier.configuration import BaseDriver
+from dwarf_copier.fits import parse_value
+from dwarf_copier.models.frame_header import FrameHeader, HeaderValue
+from dwarf_copier.models.source_directory import SourceDirectory
+
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "<=": operator.le,
+    ">=": operator.ge,
+    "!=": operator.ne,
+    "<": operator.lt,
+    ">": operator.gt,
+    "=": operator.eq,
+}
+STACKED_PREFIX = "stacked"
+CRITERION_REGEX = re.compile(
+    r"^\s*([A-Za-z0-9_-]+)\s*(" + "|".join(map(re.escape, OPERATORS)) + r")(.*)$"
+)
+
+
+def frame_number(name: str) -> int | None:
+    """Number of a frame from its file name, e.g. 12 for 0012.fits."""
+    stem = name.partition(".")[0]
+    return int(stem) if stem.isdigit() else None
+
+
+def parse_ranges(text: str) -> list[tuple[int, int | None]]:
+    """Parse frame ranges such as '0-99,120,150-', the end of a range is included."""
+    ranges: list[tuple[int, int | None]] = []
+    for part in text.split(","):
+        start, dash, end = part.strip().partition("-")
+        if not start.isdigit() or (end and not end.isdigit()):
+            raise ValueError(f"Invalid frame range {part!r}")
+        if not dash:
+            ranges.append((int(start), int(start)))
+        else:
+            ranges.append((int(start), int(end) if end else None))
+    return ranges
+
+
+@dataclass(frozen=True)
+class Criterion:
+    """Comparison of a header keyword with a value, e.g. CCD-TEMP<20."""
+
+    keyword: str
+    op: str
+    value: HeaderValue
+
+    @classmethod
+    def parse(cls, text: str) -> "Criterion":
+        if (m := CRITERION_REGEX.match(text)) is None:
+            raise ValueError(f"Invalid header criterion {text!r}")
+        keyword, op, value = m.groups()
+        return cls(keyword.upper(), op, parse_value(value))
+
+    def test(self, header: FrameHeader) -> bool | None:
+        """Result of the comparison, None if it cannot be made."""
+        actual = header.get(self.keyword)
+        if actual is None:
+            return None
+        value = self.value
+        numeric = (int, float)
+        if isinstance(actual, numeric) != isinstance(value, numeric):
+            # e.g. a date compared as text.
+            actual, value = str(actual), str(value)
+        return OPERATORS[self.op](actual, value)
+
+
+@dataclass
+class FrameFilter:
+    """Selects the frames of a session to copy."""
+
+    ranges: list[tuple[int, int | None]] = field(default_factory=list)
+    criteria: list[Criterion] = field(default_factory=list)
+    rejected_names: set[str] = field(default_factory=set)
+    rejected_numbers: set[int] = field(default_factory=set)
+    # Positions counting from 1 in name order, as Siril numbers frames.
+    rejected_positions: set[int] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        """True if the filter excludes anything."""
+        return bool(
+            self.ranges
+            or self.criteria
+            or self.rejected_names
+            or self.rejected_numbers
+            or self.rejected_positions
+        )
+
+    def read_reject_list(self, path: Path) -> None:
+        """Add the frames rejected in a Siril sequence file or a list of frames.
+
+        In a Siril .seq file images marked as excluded are rejected, they are
+        numbered from 1 in the order of the session's file names as Siril's convert
+        numbers them. Otherwise each line is a file name or frame number. Either
+        way the list belongs to a single session.
+        """
+        text = path.read_text()
+        if path.suffix.lower() == ".seq":
+            for line in text.splitlines():
+                fields = line.split()
+                if len(fields) >= 3 and fields[0] == "I" and fields[2] == "0":
+                    self.rejected_positions.add(int(fields[1]))
+            return
+        for line in text.splitlines():
+            entry = line.split("#", 1)[0].strip()
+            if entry.isdigit():
+                self.rejected_numbers.add(int(entry))
+            elif entry:
+                self.rejected_names.add(Path(entry).name)
+
+    def in_ranges(self, name: str) -> bool:
+        number = frame_number(name)
+        if not self.ranges or number is None:
+            return True
+        return any(
+            start <= number and (end is None or number <= end)
+            for start, end in self.ranges
+        )
+
+    def accepts(self, name: str, position: int, header: FrameHeader | None) -> bool:
+        """True if a frame should be copied."""
+        if name in self.rejected_names or position in self.rejected_positions:
+            return False
+        if frame_number(name) in self.rejected_numbers:
+            return False
+        if not self.in_ranges(name):
+            return False
+        if header is not None and header.header:
+            return all(c.test(header) is not False for c in self.criteria)
+        return True
+
+    def excluded(
+        self, session: SourceDirectory, files: Iterable[Path], driver: BaseDriver
+    ) -> set[Path]:
+        """Frames of a session, out of the files to be copied, that are excluded.
+
+        Args:
+            session: The session being copied.
+            files: Files of the session to be copied or linked.
+            driver: Driver of the session's source, headers are only read from
+                sources it can read directly.
+        """
+        if not self:
+            return set()
+        # The Dwarf's stacked images are not frames and are not numbered.
+        frames = sorted(
+            {
+                p
+                for p in files
+                if is_fits(p.name) and not p.name.startswith(STACKED_PREFIX)
+            },
+            key=lambda p: p.name,
+        )
+        headers = {f.name: f for f in session.frames(driver)} if self.criteria else {}
+        excluded = {
+            p
+            for position, p in enumerate(frames, 1)
+            if not self.accepts(p.name, position, headers.get(p.name))
+        }
+        if excluded:
+            logging.info("%s: %d frames excluded", session.path.name, len(excluded))
+        return excluded
@@ -0,0 +1,195 @@
+"""Journal of session copies in progress, to recover after a crash.
+
+Each session is copied into a working directory beside its destination, named after
+the destination so a later copy of the same session finds it again. Before the
+working directory is created, before it is renamed and once it is gone an entry is
+appended to a small journal in the cache directory.
+
+On startup the journal is replayed, touching only the directories it names:
+
+- a session whose files were all copied is renamed into place,
+- a copy that was interrupted is left for the next copy of the session to resume,
+  unless it is older than STALE_AFTER when it is removed,
+- anything else is forgotten.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import asdict, dataclass
+from enum import StrEnum
+from pathlib import Path
+
+from dwarf_copier import durability
+
+JOURNAL_FILE = "journal.jsonl"
+WORKING_PREFIX = ".dwarf-copy-"
+# Seconds before an interrupted copy that wasn't resumed is removed.
+STALE_AFTER = 24 * 60 * 60
+
+
+class Step(StrEnum):
+    """What a journal entry records."""
+
+    COPYING = "copying"
+    COMMITTING = "committing"
+    DONE = "done"
+
+
+@dataclass
+class Entry:
+    """The last step recorded for a working directory."""
+
+    step: Step
+    working: str
+    destination: str
+    time: float
+
+
+@dataclass
+class Recovery:
+    """What replaying the journal did."""
+
+    completed: int = 0
+    removed: int = 0
+    resumable: int = 0
+
+
+def working_path(destination: Path) -> Path:
+    """Working directory used while copying a session to its destination."""
+    return destination.with_name(f"{WORKING_PREFIX}{destination.name}")
+
+
+def mark_copied(source: Path | None, dest: Path) -> None:
+    """Give a completed copy the modification time of its source.
+
+    A copy cut short may already have its final size, the destination is
+    preallocated, so the time shows which files a resumed copy can keep.
+    """
+    if source is not None:
+        st = source.stat()
+        os.utime(dest, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def is_copied(source: Path | None, dest: Path, compressed: bool = False) -> bool:
+    """Whether dest is a completed copy of source, see mark_copied.
+
+    A compressed copy never has the size of its source, only the time is compared.
+    """
+    if source is None:
+        return False
+    try:
+        src, dst = source.stat(), dest.stat()
+    except OSError:
+        return False
+    if not compressed and src.st_size != dst.st_size:
+        return False
+    return src.st_mtime_ns == dst.st_mtime_ns
+
+
+class Journal:
+    """Append only log of session copies, disabled when path is None."""
+
+    def __init__(self, path: Path | None) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+
+    def record(self, step: Step, working: Path, destination: Path) -> None:
+        """Append an entry, on disk before this returns."""
+        if self.path is None:
+            return
+        entry = Entry(step, str(working), str(destination), time.time())
+        line = json.dumps(asdict(entry)) + "\n"
+        with self.lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a") as f:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError as e:
+                logging.warning("Journal not written: %s", e)
+
+    def begin(self, working: Path, destination: Path) -> None:
+        self.record(Step.COPYING, working, destination)
+
+    def committing(self, working: Path, destination: Path) -> None:
+        self.record(Step.COMMITTING, working, destination)
+
+    def done(self, working: Path, destination: Path) -> None:
+        self.record(Step.DONE, working, destination)
+
+    def pending(self) -> dict[str, Entry]:
+        """The last entry for each working directory not yet done."""
+        entries: dict[str, Entry] = {}
+        if self.path is None:
+            return entries
+        try:
+            lines = self.path.read_text().splitlines()
+        except FileNotFoundError:
+            return entries
+        for line in lines:
+            try:
+                entry = Entry(**json.loads(line))
+                entry.step = Step(entry.step)
+            except (ValueError, TypeError):
+                # A line cut short by a crash.
+                continue
+            entries[entry.working] = entry
+        return {k: e for k, e in entries.items() if e.step != Step.DONE}
+
+    def recover(self, now: float | None = None) -> Recovery:
+        """Finish or clean up copies that were interrupted, see the module docs."""
+        now = time.time() if now is None else now
+        recovery = Recovery()
+        keep: list[Entry] = []
+        with self.lock:
+            for entry in self.pending().values():
+                working = Path(entry.working)
+                destination = Path(entry.destination)
+                try:
+                    if not working.exists():
+                        continue
+                    if entry.step == Step.COMMITTING and not destination.exists():
+                        working.rename(destination)
+                        durability.fsync_dir(destination.parent)
+                        recovery.completed += 1
+                    elif entry.step == Step.COPYING and now - entry.time < STALE_AFTER:
+                        keep.append(entry)
+                        recovery.resumable += 1
+                    else:
+                        shutil.rmtree(working)
+                        recovery.removed += 1
+                except OSError as e:
+                    logging.warning("Cannot recover %s: %s", working, e)
+                    keep.append(entry)
+            self.rewrite(keep)
+        return recovery
+
+    def rewrite(self, entries: list[Entry]) -> None:
+        """Replace the journal with just these entries."""
+        if self.path is None or not self.path.exists():
+            return
+        temp = self.path.with_suffix(".tmp")
+        try:
+            temp.write_text("".join(json.dumps(asdict(e)) + "\n" for e in entries))
+            temp.replace(self.path)
+        except OSError as e:
+            logging.warning("Journal not compacted: %s", e)
+
+
+_journals: dict[Path | None, Journal] = {}
+
+
+def journal() -> Journal:
+    """The journal in the cache directory, disabled if caching is."""
+    from dwarf_copier.configuration import cache_dir
+
+    cache = cache_dir()
+    path = None if cache is None else cache / JOURNAL_FILE
+    if path not in _journals:
+        _journals[path] = Journal(path)
+    return _journals[path]
@@ -1,5 +1,6 @@
 """Data models."""
 
+import time
 from dataclasses import dataclass, field
 from functools import cached_property
 from pathlib import Path
@@ -8,6 +9,7 @@ from typing import Self
 
 from pydantic import BaseModel
 
+from dwarf_copier import profiling
 from dwarf_copier.configuration import (
     ConfigFormat,
     ConfigSource,
@@ -44,8 +46,9 @@ class Specials:
         masks = [self.session.format_filename(template) for template in self.templates]
         candidates: set[Path] = set()
         driver = self.source.driver
-        for m in masks:
-            candidates |= set(driver.match_wildcards(self.source.path, m))
+        with profiling.phase("specials"):
+            for m in masks:
+                candidates |= set(driver.match_wildcards(self.source.path, m))
 
         return candidates
 
@@ -59,10 +62,10 @@ class Specials:
         """
         masks = [self.session.format_filename(template) for template in self.templates]
         driver = self.source.driver
-        for m in masks:
-            candidates = list(driver.match_wildcards(self.source.path, m))
-            if candidates:
-                return candidates[0]
+        with profiling.phase("specials"):
+            for m in masks:
+                if (candidate := driver.first_match(self.source.path, m)) is not None:
+                    return candidate
         return None
 
 
@@ -137,6 +140,7 @@ class CopyOrLinkBase(BaseModel):
     dest: Path
     source_folder: Path
     working_folder: Path
+    fsync: bool = False
 
     @property
     def source_relative(self) -> Path:
@@ -167,6 +171,45 @@ class LinkCommand(CopyOrLinkBase):
         return f"[b]Link[/b] {self.source_relative} -> {self.dest_relative}"
 
 
-BaseCommand = QuitCommand | CopyCommand | LinkCommand
-CommandQueue = Queue[BaseCommand]
+class CompressCommand(CopyOrLinkBase):
+    """Copy a single file, compressing it."""
+
+    @property
+    def description(self) -> str:
+        """Progress tracking."""
+        return f"[b]Compress[/b] {self.source_relative} -> {self.dest_relative}"
+
+    @property
+    def raw(self) -> Path:
+        """Temporary uncompressed copy, used if the source cannot be read directly."""
+        return self.dest.with_suffix("")
+
+
+BaseCommand = QuitCommand | CopyCommand | LinkCommand | CompressCommand
+
+
+class CommandQueue(Queue[BaseCommand]):
+    """Queue of commands for the copy workers, noting when each was queued."""
+
+    def _init(self, maxsize: int) -> None:
+        super()._init(maxsize)
+        self.queued: dict[int, float] = {}
+
+    def _put(self, item: BaseCommand) -> None:
+        self.queued[id(item)] = time.perf_counter()
+        super()._put(item)
+
+    def _get(self) -> BaseCommand:
+        item = super()._get()
+        if isinstance(item, QuitCommand):
+            # Workers stop without asking how long it waited.
+            self.queued.pop(id(item), None)
+        return item
+
+    def waited(self, item: BaseCommand) -> float:
+        """Seconds a command spent in the queue, call once after getting it."""
+        queued = self.queued.pop(id(item), None)
+        return 0.0 if queued is None else time.perf_counter() - queued
+
+
 QUIT_COMMAND = QuitCommand()
@@ -0,0 +1,56 @@
+"""Model for the FITS header of a single frame in a session."""
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+HeaderValue = str | int | float | bool
+
+
+class FrameHeader(BaseModel):
+    """Header cards of one .fits file.
+
+    The file's size and modification time are kept so the index can tell when the
+    file has to be read again.
+    """
+
+    name: str = Field(description="File name within the session")
+    size: int
+    mtime_ns: int
+    header: dict[str, HeaderValue] = Field(
+        default_factory=dict, description="Header keywords, empty if not a FITS file"
+    )
+
+    def get(self, *keys: str) -> HeaderValue | None:
+        """Value of the first of the keywords present in the header."""
+        for key in keys:
+            if key in self.header:
+                return self.header[key]
+        return None
+
+    @property
+    def date_obs(self) -> datetime | None:
+        """Time the exposure started."""
+        value = self.get("DATE-OBS")
+        try:
+            return datetime.fromisoformat(value) if isinstance(value, str) else None
+        except ValueError:
+            return None
+
+    @property
+    def exposure(self) -> float | None:
+        """Exposure time in seconds."""
+        value = self.get("EXPTIME", "EXPOSURE")
+        return float(value) if isinstance(value, int | float) else None
+
+    @property
+    def temperature(self) -> float | None:
+        """Sensor temperature in degrees C."""
+        value = self.get("CCD-TEMP", "TEMP", "TEMPERAT")
+        return float(value) if isinstance(value, int | float) else None
+
+
+class FrameIndex(BaseModel):
+    """Headers of every frame in a session, saved in the cache directory."""
+
+    path: str
+    frames: list[FrameHeader] = []
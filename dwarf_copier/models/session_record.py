@@ -0,0 +1,83 @@
+"""Compact record of a session, kept for each row when listing a source."""
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from fractions import Fraction
+from pathlib import Path
+
+from dwarf_copier.models.shots_info import ShotsInfo
+from dwarf_copier.models.source_directory import SourceDirectory
+
+
+@dataclass(frozen=True, slots=True)
+class SessionRecord:
+    """A listed session, a fraction of the size of a SourceDirectory.
+
+    An archive of several years holds tens of thousands of sessions. Only these
+    records are kept while listing, the full SourceDirectory is made again for the
+    sessions selected. Strings repeated across sessions are interned.
+    """
+
+    path: str
+    date: datetime
+    target: str
+    exp: str
+    gain: int
+    ir: str
+    binning: str
+    format: str
+    dec: float
+    ra: float
+    stacked: int
+    taken: int
+    to_take: int
+
+    @classmethod
+    def from_session(cls, session: SourceDirectory) -> "SessionRecord":
+        info = session.info
+        intern = sys.intern
+        return cls(
+            path=str(session.path),
+            date=session.date,
+            target=intern(info.target),
+            exp=intern(info.exp),
+            gain=info.gain,
+            ir=intern(info.ir),
+            binning=intern(info.binning),
+            format=intern(info.format),
+            dec=info.dec,
+            ra=info.ra,
+            stacked=info.shotsStacked,
+            taken=info.shotsTaken,
+            to_take=info.shotsToTake,
+        )
+
+    @property
+    def name(self) -> str:
+        """Name of the session folder."""
+        return os.path.basename(self.path)
+
+    @property
+    def exp_fraction(self) -> Fraction:
+        return Fraction(self.exp)
+
+    def session(self) -> SourceDirectory:
+        """Full session, equal to the one the record was made from."""
+        return SourceDirectory(
+            path=Path(self.path),
+            date=self.date,
+            info=ShotsInfo(
+                DEC=self.dec,
+                RA=self.ra,
+                binning=self.binning,
+                exp=self.exp,
+                format=self.format,
+                gain=self.gain,
+                ir=self.ir,
+                shotsStacked=self.stacked,
+                shotsTaken=self.taken,
+                shotsToTake=self.to_take,
+                target=self.target,
+            ),
+        )
@@ -2,11 +2,16 @@
 from datetime import datetime
 from pathlib import Path
 from string import Template
+from typing import TYPE_CHECKING
 
 from pydantic import BaseModel, Field
 
+from dwarf_copier.models.frame_header import FrameHeader
 from dwarf_copier.models.shots_info import ShotsInfo
 
+if TYPE_CHECKING:
+    from dwarf_copier.configuration import BaseDriver
+
 
 class SourceDirectory(BaseModel):
     """Data for a single photo session.
@@ -29,6 +34,19 @@ class SourceDirectory(BaseModel):
         default=None, description="Flats (optional, must be taken manually)"
     )
 
+    def frames(self, driver: "BaseDriver") -> list[FrameHeader]:
+        """FITS headers of the frames in the session, from the index in the cache.
+
+        Headers are only read from sessions the driver can read directly, for
+        other sources the list is empty.
+        """
+        from dwarf_copier.configuration import cache_dir
+        from dwarf_copier.fits import index_session
+
+        if (path := driver.local_path(self.path)) is None:
+            return []
+        return index_session(path, cache_dir())
+
     def format_filename(self, template: Template, name: str = "") -> str:
         # TODO: make this lazier
         d = {
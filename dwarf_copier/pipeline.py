@@ -0,0 +1,621 @@
+"""Copy pipeline shared by the Textual screens and the command line.
+
+Nothing in here may import Textual: the headless command line mode uses this module
+directly to copy sessions without starting the user interface.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import TracebackType
+from typing import Callable, Iterable, Self, Sequence
+
+from dwarf_copier import durability, journal, profiling, report
+from dwarf_copier.compress import compress_file, is_fits
+from dwarf_copier.configuration import (
+    BaseDriver,
+    Compression,
+    ConfigSource,
+    Durability,
+)
+from dwarf_copier.drivers import disk
+from dwarf_copier.frame_filter import FrameFilter
+from dwarf_copier.model import (
+    QUIT_COMMAND,
+    BaseCommand,
+    CommandQueue,
+    CompressCommand,
+    CopyCommand,
+    LinkCommand,
+    QuitCommand,
+)
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.throttle import Throttle
+
+FileCommand = CopyCommand | LinkCommand | CompressCommand
+
+
+@dataclass
+class Progress:
+    """Result of a single command executed by a worker."""
+
+    action: FileCommand
+    bytes: int = 0
+    error: Exception | None = None
+    # When the command was started, from time.perf_counter.
+    started: float = field(default_factory=time.perf_counter)
+    timing: report.FileTiming = field(default_factory=report.FileTiming)
+
+
+ProgressCallback = Callable[[Progress], None]
+# Most directories created at once, each is a round trip on a NAS.
+MKDIR_THREADS = 8
+
+
+def execute(driver: BaseDriver, action: FileCommand) -> Progress:
+    """Perform a single copy or link."""
+    match action:
+        case CopyCommand():
+            return Progress(action, driver.copy_file(action.source, action.dest))
+
+        case LinkCommand():
+            driver.link_file(action.source, action.dest)
+            return Progress(action)
+
+        case CompressCommand():
+            if (local := driver.local_path(action.source)) is not None:
+                size = compress_file(local, action.dest).result()
+            else:
+                driver.copy_file(action.source, action.raw)
+                size = compress_file(action.raw, action.dest, remove=True).result()
+            return Progress(action, size)
+
+
+def make_skeleton(directories: Iterable[Path]) -> None:
+    """Create every directory the commands for one or more sessions write into.
+
+    Done once before any command is queued so workers never create or check a
+    parent directory. Directories that contain others are created first, in order,
+    then the rest in parallel as each only needs its parent to exist.
+    """
+    wanted = set(directories)
+    parents = {parent for path in wanted for parent in path.parents}
+    for path in sorted(wanted & parents):
+        path.mkdir(parents=True, exist_ok=True)
+    leaves = sorted(wanted - parents)
+    if len(leaves) < 2:
+        for path in leaves:
+            path.mkdir(parents=True, exist_ok=True)
+        return
+    with ThreadPoolExecutor(MKDIR_THREADS, thread_name_prefix="mkdir") as pool:
+        list(pool.map(lambda path: path.mkdir(parents=True, exist_ok=True), leaves))
+
+
+def make_links(links: Sequence[LinkCommand]) -> list[Progress]:
+    """Create the symlinks of a session together, rather than one command each.
+
+    A Siril session links every frame into lights, queueing each as a command costs
+    more than making the link. Links are made relative to the folder holding them
+    when it is on the same filesystem as the file linked to, so they still work
+    after the tree holding both is moved. Each folder is opened once and the links
+    made within it by name.
+    """
+    results: list[Progress] = []
+    if not links:
+        return results
+    folders: dict[str, list[LinkCommand]] = {}
+    for link in links:
+        folder = os.path.dirname(link.dest)
+        folders.setdefault(folder, []).append(link)
+    with profiling.phase("link"):
+        for folder, group in folders.items():
+            results.extend(_link_folder(folder, group))
+    return results
+
+
+def _device(path: str) -> int | None:
+    """Device holding a path, or the folder it will be made in."""
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+
+def _link_folder(folder: str, links: list[LinkCommand]) -> list[Progress]:
+    """Create links within a single folder, see make_links."""
+    started = time.perf_counter()
+    try:
+        device = os.stat(folder).st_dev
+        fd = (
+            os.open(folder, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+            if os.symlink in os.supports_dir_fd
+            else None
+        )
+    except OSError as e:
+        return [Progress(link, error=e, started=started) for link in links]
+    # How each folder linked to is reached, the whole session is usually in one.
+    prefixes: dict[str, str] = {}
+    results: list[Progress] = []
+    try:
+        for link in links:
+            started = time.perf_counter()
+            source_folder, name = os.path.split(link.source)
+            if (prefix := prefixes.get(source_folder)) is None:
+                prefix = prefixes[source_folder] = (
+                    os.path.relpath(source_folder, folder)
+                    if _device(source_folder) == device
+                    else source_folder
+                )
+            try:
+                if fd is None:
+                    os.symlink(os.path.join(prefix, name), link.dest)
+                else:
+                    os.symlink(
+                        os.path.join(prefix, name),
+                        os.path.basename(link.dest),
+                        dir_fd=fd,
+                    )
+                progress = Progress(link, started=started)
+            except OSError as e:
+                logging.exception("%s failed", link.description)
+                progress = Progress(link, error=e, started=started)
+            progress.timing.transfer = time.perf_counter() - started
+            results.append(progress)
+    finally:
+        if fd is not None:
+            os.close(fd)
+    return results
+
+
+def finish(action: FileCommand, local_path: Callable[[Path], Path | None]) -> None:
+    """Mark a file as completely copied for a resumed copy, flush it if asked."""
+    if isinstance(action, CopyCommand | CompressCommand):
+        journal.mark_copied(local_path(action.source), action.dest)
+    if action.fsync and not isinstance(action, LinkCommand):
+        durability.fsync_file(action.dest)
+
+
+def run_command(driver: BaseDriver, action: FileCommand) -> Progress:
+    """Execute a command, catching any error so it can be reported.
+
+    Not only OSError, a worker that let an error escape would stop taking commands
+    and the file would never be recorded as failed.
+    """
+    started = time.perf_counter()
+    with profiling.phase("copy"), report.timed() as timing:
+        try:
+            progress = execute(driver, action)
+            finish(action, driver.local_path)
+        except Exception as e:
+            logging.exception("%s failed", action.description)
+            progress = Progress(action, error=e)
+    progress.started = started
+    progress.timing = timing
+    return progress
+
+
+@dataclass
+class SessionCopy:
+    """Copy of a single session.
+
+    Files are copied into a working directory beside the destination which is only
+    renamed to the final destination once every file has been copied. The target's
+    durability setting decides what is flushed to disk before the rename. Each step is
+    recorded in the journal, and files left by an interrupted copy of the session are
+    kept if they are complete.
+    """
+
+    session: DestinationDirectory
+    source: ConfigSource
+    frame_filter: FrameFilter = field(default_factory=FrameFilter)
+    working_path: Path | None = field(default=None, init=False)
+    # Files read from the source and copied unchanged, keyed by source path.
+    copied: dict[Path, CopyCommand] = field(default_factory=dict, init=False)
+    # Directories the commands write into, see make_skeleton.
+    directories: set[Path] = field(default_factory=set, init=False)
+    # Links on the local disk, made together by make_links rather than queued.
+    links: list[LinkCommand] = field(default_factory=list, init=False)
+    log: journal.Journal = field(
+        default_factory=journal.journal, init=False, repr=False
+    )
+
+    @property
+    def destination(self) -> Path:
+        """Final destination of the session."""
+        return self.session.destination
+
+    @property
+    def durability(self) -> Durability:
+        return Durability(self.session.config_destination.durability)
+
+    def start(self, primary: "SessionCopy | None" = None) -> list[FileCommand]:
+        """Create the working directory and return the commands to fill it.
+
+        Args:
+            primary: Copy of the same session to another target. Files it copies
+                unchanged are copied, or linked, from its working directory rather
+                than read from the source a second time.
+        """
+        commands = self.plan(primary)
+        with profiling.phase("prepare"):
+            make_skeleton(self.directories)
+        return commands
+
+    def plan(self, primary: "SessionCopy | None" = None) -> list[FileCommand]:
+        """Return the commands to fill the working directory, see start.
+
+        The directories they need are left in directories for the caller to create.
+        """
+        working_path = self.working_path = journal.working_path(self.destination)
+        self.log.begin(working_path, self.destination)
+        with profiling.phase("prepare"):
+            mkdirs, links, copies = self.source.driver.prepare(
+                self.session.config_format, self.session, working_path
+            )
+        # Excluded frames are dropped here so they are never transferred.
+        excluded = self.frame_filter.excluded(
+            self.session.source_directory, [*links, *copies], self.source.driver
+        )
+        links = {p: name for p, name in links.items() if p not in excluded}
+        copies = {p: name for p, name in copies.items() if p not in excluded}
+
+        # Links are only made when both source and target allow them.
+        link = self.source.link and self.session.config_destination.link
+        commands: list[FileCommand] = []
+        for ln, name in links.items():
+            if link:
+                # Made in bulk, the paths need no validation.
+                commands.append(
+                    LinkCommand.model_construct(
+                        source=ln,
+                        dest=working_path / name,
+                        source_folder=self.source.path,
+                        working_folder=working_path,
+                        fsync=self.durability == Durability.FILE,
+                    )
+                )
+            else:
+                commands.append(self.copy_or_reuse(ln, working_path, name, primary))
+        for cp, name in copies.items():
+            commands.append(self.copy_or_reuse(cp, working_path, name, primary))
+        self.copied = {
+            command.source: command
+            for command in commands
+            if type(command) is CopyCommand
+            and command.source_folder == self.source.path
+        }
+        self.directories = {
+            working_path,
+            *mkdirs,
+            *(command.dest.parent for command in commands),
+        }
+        remaining: list[FileCommand] = []
+        self.links = []
+        for command in self.resume(commands):
+            if isinstance(command, LinkCommand) and self.local_link(command):
+                self.links.append(command)
+            else:
+                remaining.append(command)
+        return remaining
+
+    def local_link(self, command: LinkCommand) -> bool:
+        """Whether a link can be made directly rather than by the source driver."""
+        return (
+            command.source_folder != self.source.path
+            or self.source.driver.local_path(command.source) is not None
+        )
+
+    def resume(self, commands: list[FileCommand]) -> list[FileCommand]:
+        """Drop commands an interrupted copy of the session completed."""
+        remaining: list[FileCommand] = []
+        for command in commands:
+            dest = command.dest
+            if not (dest.exists() or dest.is_symlink()):
+                remaining.append(command)
+                continue
+            source = (
+                self.source.driver.local_path(command.source)
+                if command.source_folder == self.source.path
+                else command.source
+            )
+            if not isinstance(command, LinkCommand) and journal.is_copied(
+                source, dest, compressed=isinstance(command, CompressCommand)
+            ):
+                if command.fsync:
+                    durability.fsync_file(dest)
+                continue
+            dest.unlink()
+            remaining.append(command)
+        return remaining
+
+    def copy_or_reuse(
+        self, source: Path, working_path: Path, name: str, primary: "SessionCopy | None"
+    ) -> FileCommand:
+        """Copy a file from the source unless the primary copy already has it."""
+        if primary is None or (first := primary.copied.get(source)) is None:
+            return self.copy_command(source, working_path, name)
+        if (
+            primary.session.config_destination.link
+            and self.session.config_destination.link
+        ):
+            # Points at where the file will be once the primary is committed.
+            return LinkCommand.model_construct(
+                source=primary.destination / first.dest_relative,
+                dest=working_path / name,
+                source_folder=primary.destination,
+                working_folder=working_path,
+                fsync=self.durability == Durability.FILE,
+            )
+        return self.copy_command(first.dest, working_path, name, first.working_folder)
+
+    def copy_command(
+        self,
+        source: Path,
+        working_path: Path,
+        name: str,
+        source_folder: Path | None = None,
+    ) -> CopyCommand | CompressCommand:
+        """Copy a file, compressing FITS files if the format asks for it."""
+        format = self.session.config_format
+        fsync = self.durability == Durability.FILE
+        source_folder = source_folder or self.source.path
+        if format.compress == Compression.GZIP and is_fits(name):
+            return CompressCommand(
+                source=source,
+                dest=working_path / f"{name}.gz",
+                source_folder=source_folder,
+                working_folder=working_path,
+                fsync=fsync,
+            )
+        return CopyCommand(
+            source=source,
+            dest=working_path / name,
+            source_folder=source_folder,
+            working_folder=working_path,
+            fsync=fsync,
+        )
+
+    def commit(self) -> None:
+        """Move the completed working directory to the destination."""
+        if self.working_path is not None:
+            working_path = self.working_path
+            durability.commit(
+                working_path,
+                self.destination,
+                self.durability,
+                lambda: self.log.committing(working_path, self.destination),
+            )
+            self.log.done(working_path, self.destination)
+            self.working_path = None
+
+    def cleanup(self) -> None:
+        """Remove anything left behind by a failed copy."""
+        if self.working_path is not None:
+            shutil.rmtree(self.working_path, ignore_errors=True)
+            self.log.done(self.working_path, self.destination)
+            self.working_path = None
+
+
+class WorkerPool:
+    """Pool of threads executing commands from a queue.
+
+    Callbacks are made from the worker threads so they must be thread-safe.
+    """
+
+    def __init__(
+        self,
+        driver: BaseDriver,
+        queue: CommandQueue,
+        num_workers: int,
+        callback: ProgressCallback,
+        throttle: Throttle | None = None,
+    ) -> None:
+        self.driver = driver
+        self.queue = queue
+        self.num_workers = num_workers
+        self.callback = callback
+        self.throttle = throttle or Throttle()
+        self.threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        if self.threads:
+            return
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self.worker, name=f"copy_{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def worker(self) -> None:
+        action: BaseCommand
+        self.throttle.start_worker()
+        while True:
+            action = self.queue.get()
+            try:
+                match action:
+                    case QuitCommand():
+                        break
+
+                    case CopyCommand() | LinkCommand() | CompressCommand():
+                        with self.throttle.hold(action):
+                            # Includes any wait for a transfer slot.
+                            wait = self.queue.waited(action)
+                            progress = run_command(self.driver, action)
+                        progress.timing.wait = wait
+                        self.callback(progress)
+                        self.throttle.transferred(progress.bytes)
+            finally:
+                self.queue.task_done()
+
+    def shutdown(self) -> None:
+        for _ in self.threads:
+            self.queue.put(QUIT_COMMAND)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+class SessionRunner:
+    """Copy sessions one at a time without the user interface.
+
+    A session may be copied to several targets at once, see fan_out.
+
+    With transfers set the files are read from the source on an event loop, up to
+    that many at once, instead of by the worker threads. See drivers.aio.copy_all.
+
+    Use as a context manager to start and stop the worker threads.
+    """
+
+    def __init__(
+        self,
+        source: ConfigSource,
+        num_workers: int,
+        callback: ProgressCallback,
+        frame_filter: FrameFilter | None = None,
+        throttle: Throttle | None = None,
+        run_report: report.RunReport | None = None,
+        transfers: int = 0,
+    ) -> None:
+        self.source = source
+        self.callback = callback
+        self.transfers = transfers
+        self.throttle = throttle or Throttle()
+        self.frame_filter = frame_filter or FrameFilter()
+        self.queue = CommandQueue()
+        # Runners reading from different sources may share a report.
+        self.report = run_report or report.RunReport()
+        self.failed: list[Progress] = []
+        self.pool = WorkerPool(
+            source.driver, self.queue, num_workers, self.progress, self.throttle
+        )
+        # Copies between targets, only started when a session is fanned out.
+        self.local_queue = CommandQueue()
+        self.local = WorkerPool(
+            disk.Driver(Path("/")),
+            self.local_queue,
+            num_workers,
+            self.progress,
+            self.throttle,
+        )
+
+    def __enter__(self) -> Self:
+        """Start the workers."""
+        if not self.transfers:
+            self.pool.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        """Stop the workers."""
+        self.pool.shutdown()
+        self.local.shutdown()
+
+    def progress(self, progress: Progress) -> None:
+        self.report.record(progress)
+        if progress.error is not None:
+            self.failed.append(progress)
+        self.callback(progress)
+
+    def copy(self, session: DestinationDirectory) -> bool:
+        """Copy a single session, returns False if any file failed."""
+        return self.fan_out([session])[0]
+
+    def fan_out(self, sessions: Sequence[DestinationDirectory]) -> list[bool]:
+        """Copy a session to several targets, reading each source file once.
+
+        The first target is copied from the source. The other targets then copy, or
+        link, the files they share from its working directory, only reading from the
+        source what the first target does not copy unchanged.
+
+        Returns:
+            For each target, False if any of its files failed.
+        """
+        primary, *others = jobs = [
+            SessionCopy(session, self.source, self.frame_filter) for session in sessions
+        ]
+        try:
+            commands = primary.plan()
+            later: list[FileCommand] = []
+            for job in others:
+                for command in job.plan(primary):
+                    if command.source_folder in (
+                        primary.working_path,
+                        primary.destination,
+                    ):
+                        later.append(command)
+                    else:
+                        commands.append(command)
+            # The directories of every target at once, before any file is copied.
+            with profiling.phase("prepare"):
+                make_skeleton(set().union(*(job.directories for job in jobs)))
+            links = [link for job in jobs for link in job.links]
+            later_links = [
+                link for link in links if link.source_folder == primary.destination
+            ]
+            for progress in make_links(
+                [link for link in links if link.source_folder != primary.destination]
+            ):
+                self.progress(progress)
+            self.run(commands)
+
+            ok = [not self.job_failed(job) for job in jobs]
+            if (later or later_links) and ok[0]:
+                if later:
+                    self.local.start()
+                    for command in later:
+                        self.local_queue.put(command)
+                    self.local_queue.join()
+                for progress in make_links(later_links):
+                    self.progress(progress)
+                ok = [not self.job_failed(job) for job in jobs]
+            elif later or later_links:
+                # Nothing to copy from.
+                waiting = {command.working_folder for command in [*later, *later_links]}
+                ok = [
+                    job_ok and job.working_path not in waiting
+                    for job, job_ok in zip(jobs, ok)
+                ]
+
+            # The primary first, other targets may link to it.
+            for job, job_ok in zip(jobs, ok):
+                if job_ok:
+                    job.commit()
+            return ok
+        finally:
+            for job in jobs:
+                job.cleanup()
+
+    def run(self, commands: list[FileCommand]) -> None:
+        """Execute commands reading from the source, wait until all are done."""
+        if self.transfers:
+            from dwarf_copier.drivers import aio
+
+            asyncio.run(
+                aio.copy_all(
+                    aio.adapt(self.source.driver),
+                    commands,
+                    self.transfers,
+                    self.progress,
+                    self.throttle,
+                )
+            )
+            return
+        for command in commands:
+            self.queue.put(command)
+        self.queue.join()
+
+    def job_failed(self, job: SessionCopy) -> bool:
+        return any(f.action.working_folder == job.working_path for f in self.failed)
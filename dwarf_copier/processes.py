@@ -0,0 +1,41 @@
+"""Process pool stage for CPU-bound work on copied files.
+
+Copy workers are threads, which is fine while they wait for I/O, but work such as
+compression would be serialised by the GIL. Instead the copy worker submits the work
+to a pool of processes and waits for the result, passing only file names so content
+is never pickled between processes.
+
+This module is imported by the pool processes so must stay free of heavy imports.
+"""
+
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ProcessStage:
+    """Pool of processes running CPU-bound work on files as they are copied."""
+
+    def __init__(self, workers: int | None = None) -> None:
+        # Copy workers are threads so avoid forking a multi-threaded process.
+        self.pool = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def close(self) -> None:
+        self.pool.shutdown()
+
+
+_stage: ProcessStage | None = None
+_lock = threading.Lock()
+
+
+def stage() -> ProcessStage:
+    """Process stage shared by all copies, created on first use."""
+    global _stage
+    with _lock:
+        if _stage is None:
+            _stage = ProcessStage()
+            atexit.register(_stage.close)
+        return _stage
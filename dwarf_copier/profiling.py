@@ -0,0 +1,155 @@
+"""Opt-in profiling of scanning sessions and copying files.
+
+Enabled with `--profile DIR` or the DWARF_COPY_PROFILE environment variable. Each
+phase of the work (listing sessions, preparing a copy, finding darks, flats and
+biases, copying files) is profiled with cProfile and the peak memory traced by
+tracemalloc is recorded. When the program exits a `<phase>.prof` file, readable
+with pstats or snakeviz, is written for each phase together with `summary.txt`.
+
+Only one cProfile profiler may be active at a time and it sees every thread. A
+phase that starts while another is being profiled is timed but its calls are
+included in the other phase's profile. Concurrent copy workers share one profile.
+"""
+
+import io
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    import cProfile
+
+SUMMARY_FILE = "summary.txt"
+TOP_FUNCTIONS = 20
+TOP_ALLOCATIONS = 10
+
+
+@dataclass
+class PhaseStats:
+    """Totals for a phase, seconds are summed over concurrent calls."""
+
+    calls: int = 0
+    seconds: float = 0.0
+    peak_memory: int = 0
+
+
+class Profiler:
+    """Profiles for each phase, written when profiling stops."""
+
+    def __init__(self, folder: Path) -> None:
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.profiles: dict[str, "cProfile.Profile"] = {}
+        self.stats: dict[str, PhaseStats] = {}
+        self.active: str | None = None
+        self.depth = 0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        import cProfile
+
+        with self.lock:
+            if self.active is None:
+                try:
+                    self.profiles.setdefault(name, cProfile.Profile()).enable()
+                except ValueError as e:
+                    # Another tool is profiling, e.g. a debugger or coverage.
+                    logging.debug("Cannot profile %s: %s", name, e)
+                else:
+                    self.active = name
+                    tracemalloc.reset_peak()
+            profiled = self.active == name
+            self.depth += profiled
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                stats = self.stats.setdefault(name, PhaseStats())
+                stats.calls += 1
+                stats.seconds += elapsed
+                self.depth -= profiled
+                if profiled and self.depth == 0:
+                    # The last of any concurrent calls, e.g. copy workers.
+                    self.profiles[name].disable()
+                    _, peak = tracemalloc.get_traced_memory()
+                    stats.peak_memory = max(stats.peak_memory, peak)
+                    self.active = None
+
+    def summary(self) -> str:
+        import pstats
+
+        out = io.StringIO()
+        for name, stats in self.stats.items():
+            out.write(
+                f"{name}: {stats.calls} calls, {stats.seconds:.3f}s, "
+                f"peak memory {stats.peak_memory / 1024:.0f} KiB\n"
+            )
+        for name, profile in self.profiles.items():
+            out.write(f"\n=== {name} ===\n")
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(
+                TOP_FUNCTIONS
+            )
+        if tracemalloc.is_tracing():
+            out.write("\n=== Largest allocations still held ===\n")
+            snapshot = tracemalloc.take_snapshot()
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                out.write(f"{stat}\n")
+        return out.getvalue()
+
+    def save(self) -> None:
+        """Write a profile for each phase and the summary."""
+        with self.lock:
+            if self.active is not None:
+                self.profiles[self.active].disable()
+                self.active = None
+        self.folder.mkdir(parents=True, exist_ok=True)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(self.folder / f"{name}.prof")
+        (self.folder / SUMMARY_FILE).write_text(self.summary())
+
+
+_profiler: Profiler | None = None
+_not_profiling = nullcontext()
+
+
+def phase(name: str) -> AbstractContextManager[None]:
+    """Profile the code within as part of a phase, does nothing unless profiling."""
+    return _not_profiling if _profiler is None else _profiler.phase(name)
+
+
+def configured() -> Path | None:
+    """Profile folder from the environment, None if not profiling."""
+    from dwarf_copier.settings import Settings
+
+    folder = Settings().profile
+    return Path(folder).expanduser() if folder else None
+
+
+def start(folder: Path) -> None:
+    """Start profiling, the results are written to folder by stop."""
+    global _profiler
+    tracemalloc.start()
+    _profiler = Profiler(folder)
+
+
+def stop() -> Path | None:
+    """Stop profiling and write the results, returns the folder written."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is None:
+        return None
+    try:
+        profiler.save()
+    except OSError as e:
+        logging.warning("Profile not saved: %s", e)
+        return None
+    finally:
+        tracemalloc.stop()
+    return profiler.folder
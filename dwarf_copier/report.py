@@ -0,0 +1,280 @@
+"""Timings of a copy run, saved as a JSON report.
+
+Each file copied records how long it waited in the queue and how long was spent
+opening, transferring and closing it. Drivers mark the end of each phase with
+`mark`; time a driver doesn't account for counts as transfer, or as closing once a
+phase has been marked. Together with the busy time of each worker and the overall
+throughput this shows whether the card reader, the CPU or the target is holding a
+copy back: long transfers with idle workers point at the source, long closes at
+the target.
+
+The report may also be written in the Prometheus text format, for the node
+exporter's textfile collector.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+
+if TYPE_CHECKING:
+    from dwarf_copier.pipeline import Progress
+
+PHASES = ("wait", "open", "transfer", "close")
+PROMETHEUS_FILE = "dwarf-copy.prom"
+# Named after the start of the run, with a count when runs start in the same second.
+REPORT_NAME = re.compile(r"(\d{4}-\d\d-\d\dT\d\d-\d\d-\d\d)(?:-(\d+))?\.json")
+
+_local = threading.local()
+
+
+@dataclass
+class FileTiming:
+    """Seconds spent in each phase of copying a file."""
+
+    wait: float = 0.0
+    open: float = 0.0
+    transfer: float = 0.0
+    close: float = 0.0
+
+    @property
+    def busy(self) -> float:
+        """Time a worker spent on the file."""
+        return self.open + self.transfer + self.close
+
+
+@contextmanager
+def timed() -> Iterator[FileTiming]:
+    """Time the phases marked by the code within, on the current thread."""
+    timing = FileTiming()
+    _local.timing = timing
+    _local.last = time.perf_counter()
+    _local.marked = False
+    try:
+        yield timing
+    finally:
+        rest = time.perf_counter() - _local.last
+        if _local.marked:
+            timing.close += rest
+        else:
+            timing.transfer += rest
+        _local.timing = None
+
+
+def mark(phase: str) -> None:
+    """End a phase of copying the current file, a no-op unless timed."""
+    timing: FileTiming | None = getattr(_local, "timing", None)
+    if timing is None:
+        return
+    now = time.perf_counter()
+    setattr(timing, phase, getattr(timing, phase) + now - _local.last)
+    _local.last = now
+    _local.marked = True
+
+
+@dataclass
+class FileRecord:
+    """One file in the report."""
+
+    source: str
+    dest: str
+    action: str
+    bytes: int
+    worker: str
+    # Seconds from the start of the run.
+    started: float
+    timing: FileTiming
+    error: str | None = None
+
+
+@dataclass
+class RunReport:
+    """Everything copied in a run, records may be added from any thread."""
+
+    started: datetime = field(default_factory=datetime.now)
+    start: float = field(default_factory=time.perf_counter)
+    end: float | None = None
+    files: list[FileRecord] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, progress: "Progress") -> None:
+        """Add a completed command, called from the worker that ran it."""
+        action = progress.action
+        record = FileRecord(
+            source=str(action.source),
+            dest=str(action.dest),
+            action=type(action).__name__.removesuffix("Command").lower(),
+            bytes=progress.bytes,
+            worker=threading.current_thread().name,
+            started=progress.started - self.start,
+            timing=progress.timing,
+            error=None if progress.error is None else str(progress.error),
+        )
+        with self.lock:
+            self.files.append(record)
+
+    def finish(self) -> None:
+        self.end = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def summary(self) -> dict[str, Any]:
+        """Totals for the run."""
+        with self.lock:
+            files = list(self.files)
+        duration = self.duration
+        total = sum(f.bytes for f in files)
+        busy: dict[str, float] = {}
+        for f in files:
+            busy[f.worker] = busy.get(f.worker, 0.0) + f.timing.busy
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "duration": duration,
+            "files": len(files),
+            "errors": sum(f.error is not None for f in files),
+            "bytes": total,
+            "throughput": total / duration if duration else 0.0,
+            "phases": {
+                phase: sum(getattr(f.timing, phase) for f in files) for phase in PHASES
+            },
+            "workers": {
+                worker: {
+                    "busy": seconds,
+                    "utilisation": seconds / duration if duration else 0.0,
+                }
+                for worker, seconds in sorted(busy.items())
+            },
+        }
+
+    def to_json(self) -> str:
+        with self.lock:
+            files = [asdict(f) for f in self.files]
+        return json.dumps({"summary": self.summary(), "files": files}, indent=2)
+
+    def prometheus(self) -> str:
+        """Totals in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines: list[str] = []
+
+        def metric(name: str, help: str, values: dict[str, float]) -> None:
+            lines.append(f"# HELP dwarf_copy_{name} {help}")
+            lines.append(f"# TYPE dwarf_copy_{name} gauge")
+            for labels, value in values.items():
+                lines.append(f"dwarf_copy_{name}{labels} {value:g}")
+
+        metric(
+            "last_run_timestamp_seconds",
+            "Time the last run started.",
+            {"": self.started.timestamp()},
+        )
+        metric(
+            "duration_seconds", "Duration of the last run.", {"": summary["duration"]}
+        )
+        metric("bytes", "Bytes copied in the last run.", {"": summary["bytes"]})
+        metric(
+            "files",
+            "Files copied in the last run.",
+            {
+                '{status="ok"}': summary["files"] - summary["errors"],
+                '{status="error"}': summary["errors"],
+            },
+        )
+        metric(
+            "throughput_bytes_per_second",
+            "Average rate of copying in the last run.",
+            {"": summary["throughput"]},
+        )
+        metric(
+            "phase_seconds",
+            "Time spent in each phase of copying files, summed over files.",
+            {f'{{phase="{p}"}}': s for p, s in summary["phases"].items()},
+        )
+        metric(
+            "worker_utilisation",
+            "Fraction of the last run each worker was busy.",
+            {
+                f'{{worker="{w}"}}': v["utilisation"]
+                for w, v in summary["workers"].items()
+            },
+        )
+        return "\n".join(lines) + "\n"
+
+    def save(
+        self, folder: Path | None, prometheus: bool = False, keep: int = 0
+    ) -> Path | None:
+        """Write the report into a folder, returns its path.
+
+        The file is named after the time the run started, with a count added if
+        another run started in the same second. The Prometheus text is always
+        written to the same file so a collector picks up the latest run, it is
+        replaced in one step so a collector never reads half of it.
+
+        Args:
+            folder: Where reports are written, None to not write one.
+            prometheus: Also write the Prometheus text.
+            keep: Most reports left in the folder, older ones are removed. 0 keeps
+                them all.
+        """
+        if folder is None:
+            return None
+        self.finish()
+        try:
+            folder.mkdir(parents=True, exist_ok=True)
+            path = self._create(folder)
+            if prometheus:
+                # The collector only reads files ending .prom.
+                temp = folder / f"{PROMETHEUS_FILE}.{os.getpid()}.tmp"
+                temp.write_text(self.prometheus())
+                temp.replace(folder / PROMETHEUS_FILE)
+        except OSError as e:
+            logging.warning("Report not saved: %s", e)
+            return None
+        if keep > 0:
+            prune(folder, keep)
+        return path
+
+    def _create(self, folder: Path) -> Path:
+        """Write the JSON to a new file, never one from another run."""
+        name = f"{self.started:%Y-%m-%dT%H-%M-%S}"
+        text = self.to_json()
+        for count in range(1000):
+            path = folder / (f"{name}-{count}.json" if count else f"{name}.json")
+            try:
+                with path.open("x") as f:
+                    f.write(text)
+            except FileExistsError:
+                continue
+            return path
+        raise FileExistsError(f"Too many reports named {name}")
+
+
+def prune(folder: Path, keep: int) -> None:
+    """Remove all but the newest keep reports from a folder."""
+    reports: list[tuple[str, int, Path]] = []
+    for path in folder.iterdir():
+        if match := REPORT_NAME.fullmatch(path.name):
+            reports.append((match[1], int(match[2] or 0), path))
+    # Names are the start time so sort oldest first.
+    for *_, old in sorted(reports)[:-keep]:
+        try:
+            old.unlink()
+        except OSError as e:
+            logging.warning("Old report not removed: %s", e)
+
+
+def save(report: RunReport) -> Path | None:
+    """Save the report of a copy run where the settings ask, returns its path."""
+    from dwarf_copier.settings import Settings
+
+    settings = Settings()
+    folder = Path(settings.report_path).expanduser() if settings.report_path else None
+    return report.save(folder, settings.report_prometheus, settings.report_keep)
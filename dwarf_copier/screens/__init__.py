@@ -1,6 +1,25 @@
-from .dashboard import DashboardScreen
-from .help import HelpScreen
-from .quit import QuitScreen
-from .settings import SettingsScreen
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .dashboard import DashboardScreen
+    from .help import HelpScreen
+    from .quit import QuitScreen
+    from .settings import SettingsScreen
 
 __all__ = ["DashboardScreen", "HelpScreen", "SettingsScreen", "QuitScreen"]
+
+_MODULES = {
+    "DashboardScreen": "dashboard",
+    "HelpScreen": "help",
+    "QuitScreen": "quit",
+    "SettingsScreen": "settings",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """Import screens on first use."""
+    if name in _MODULES:
+        from importlib import import_module
+
+        return getattr(import_module(f".{_MODULES[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
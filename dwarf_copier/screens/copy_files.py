@@ -1,28 +1,27 @@
 """Screen showing progress as files are copied/linked."""
 
-import shutil
 from dataclasses import replace
-from pathlib import Path
-from queue import Queue
-from tempfile import mkdtemp
 
+import anyio
 from textual import work
 from textual.app import ComposeResult
 from textual.screen import Screen
 from textual.widgets import Footer, Header, Log
 from textual.worker import Worker
 
+from dwarf_copier import configuration, report
 from dwarf_copier.configuration import (
     BaseDriver,
     ConfigFormat,
     ConfigSource,
     ConfigTarget,
     ConfigurationModel,
-    config,
 )
-from dwarf_copier.model import CommandQueue, CopyCommand, LinkCommand, State
+from dwarf_copier.model import CommandQueue, State
 from dwarf_copier.models.destination_directory import DestinationDirectory
 from dwarf_copier.models.source_directory import SourceDirectory
+from dwarf_copier.pipeline import SessionCopy, make_links
+from dwarf_copier.throttle import Throttle
 from dwarf_copier.widgets.copier import Copier, CopyGroup
 from dwarf_copier.widgets.prev_next import PrevNext
 
@@ -48,14 +47,21 @@ class CopyFiles(Screen[State]):
         self.target = state.target
         self.selected = state.selected
         self.format = state.format
-        self.queue = Queue()
+        self.queue = CommandQueue()
+        self.throttle = Throttle.from_config(
+            configuration.config.general, self.source, self.target
+        )
         super().__init__()
 
     def compose(self) -> ComposeResult:
         """Create our widgets."""
         yield Header()
         yield CopyGroup(
-            config.general.workers, self.source.driver, self.queue, id="copier"
+            self.throttle.workers(configuration.config.general.workers),
+            self.source.driver,
+            self.queue,
+            self.throttle,
+            id="copier",
         )
         self.log_widget = Log()
         yield self.log_widget
@@ -87,6 +93,8 @@ class CopyFiles(Screen[State]):
             await self.copy_controller_impl(sessions, source, format)
         finally:
             await copier.shutdown()
+            if (path := report.save(copier.report)) is not None:
+                self.trace(f"Report saved to {path}")
         self.dismiss(replace(self.state, ok=True))
 
     async def copy_controller_impl(
@@ -109,45 +117,36 @@ class CopyFiles(Screen[State]):
         Returns:
             None
         """
+        copier = self.query_one("#copier", CopyGroup)
         for session in source_directories:
             self.trace("")
-            destination_path = session.destination
-            destination_path.parent.mkdir(exist_ok=True, parents=True)
-            self.trace(f"Final destination {destination_path}")
-            working_path = Path(mkdtemp(dir=str(destination_path.parent)))
+            job = SessionCopy(session, source)
+            self.trace(f"Final destination {job.destination}")
             try:
-                mkdirs, links, copies = source.driver.prepare(
-                    format, session, working_path
-                )
-                for md in mkdirs:
-                    self.trace(f"mkdir {md}")
-                for ln in links:
-                    self.trace(f"link {ln} -> {links[ln]}")
-                    self.queue.put(
-                        LinkCommand(
-                            source=ln,
-                            dest=working_path / links[ln],
-                            source_folder=source.path,
-                            working_folder=working_path,
-                        )
-                    )
-                for cp in copies:
-                    self.trace(f"copy {cp} -> {copies[cp]}")
-                    self.queue.put(
-                        CopyCommand(
-                            source=cp,
-                            dest=working_path / copies[cp],
-                            source_folder=source.path,
-                            working_folder=working_path,
+                commands = job.start()
+                for progress in await anyio.to_thread.run_sync(make_links, job.links):
+                    copier.report.record(progress)
+                    if progress.error is not None:
+                        copier.failed.append(progress.action)
+                        self.trace(
+                            f"[b red]Failed[/] {progress.action.description}: "
+                            f"{progress.error}"
                         )
-                    )
-
-                await self.query_one("#copier", CopyGroup).shutdown()
-
-                self.trace(f"move {working_path} {destination_path}")
-                working_path.rename(destination_path)
+                if job.links:
+                    self.trace(f"[b]Linked[/b] {len(job.links)} files")
+                for command in commands:
+                    self.trace(command.description)
+                    self.queue.put(command)
+
+                await anyio.to_thread.run_sync(self.queue.join)
+
+                if any(f.working_folder == job.working_path for f in copier.failed):
+                    self.trace(f"[b red]Not copied[/] {job.destination}")
+                    continue
+                self.trace(f"move {job.working_path} {job.destination}")
+                job.commit()
             finally:
-                shutil.rmtree(working_path, ignore_errors=True)
+                job.cleanup()
 
     async def on_copier_progress(self, event: Copier.Progress) -> None:
         self.trace(event.text)
@@ -10,7 +10,7 @@ from textual.screen import Screen
 from textual.widgets import Footer, Header
 from textual.worker import Worker
 
-from dwarf_copier.configuration import config
+from dwarf_copier import configuration
 from dwarf_copier.model import PartialState, State
 from dwarf_copier.screens.copy_files import CopyFiles
 from dwarf_copier.screens.pre_copy import PreCopy
@@ -91,7 +91,7 @@ class DashboardScreen(Screen):
         if new_state.source is not None and new_state.target is not None:
             self.state = replace(
                 new_state,
-                format=config.get_format(new_state.target.format),
+                format=configuration.config.get_format(new_state.target.format),
             )
             return self.when_select_sessions
         return self.when_select_source
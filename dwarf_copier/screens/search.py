@@ -0,0 +1,97 @@
+"""Search the catalogue of sessions on every source."""
+
+from textual import on, work
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.screen import Screen
+from textual.widgets import DataTable, Footer, Header, Input, Label
+
+from dwarf_copier import configuration
+from dwarf_copier.catalogue import Catalogue, Found, open_catalogue, parse_query
+from dwarf_copier.screens.show_sessions import Shots
+from dwarf_copier.widgets.sortable_table import SortableDataTable
+
+
+class SearchScreen(Screen):
+    """Find sessions by target, date, exposure and gain across every source."""
+
+    BINDINGS = [Binding("escape", "app.pop_screen", description="Done")]
+
+    DEFAULT_CSS = """
+    SearchScreen #status { height: 1; padding: 0 1; color: $text-muted; }
+    """
+
+    catalogue: Catalogue | None
+
+    def __init__(self) -> None:
+        self.catalogue = None
+        super().__init__()
+
+    def compose(self) -> ComposeResult:
+        yield Header()
+        yield Input(placeholder="M42 2024-03 exp:15 gain:80 at:Backup missing:Siril")
+        yield Label("Updating catalogue...", id="status")
+        data = SortableDataTable[str | float | Shots]()
+        data.add_columns(
+            "Target", "Date", "Exp", "Gain", "Shots", "Source", "Copied to", "Directory"
+        )
+        data.cursor_type = "row"
+        yield data
+        yield Footer()
+
+    def on_mount(self) -> None:
+        self.catalogue = open_catalogue()
+        if self.catalogue is None:
+            self.query_one("#status", Label).update(
+                "The catalogue is kept in the cache directory, which is disabled"
+            )
+            return
+        self.search(self.query_one(Input).value)
+        self.update_catalogue(self.catalogue)
+
+    def on_unmount(self) -> None:
+        if self.catalogue is not None:
+            self.catalogue.close()
+
+    @work(thread=True, exclusive=True, group="catalogue")
+    def update_catalogue(self, catalogue: Catalogue) -> None:
+        read = catalogue.update_all(configuration.config)
+        self.app.call_from_thread(self.catalogue_updated, read)
+
+    def catalogue_updated(self, read: int) -> None:
+        assert self.catalogue is not None
+        self.query_one("#status", Label).update(
+            f"{self.catalogue.count()} sessions, {read} read since last time"
+        )
+        self.search(self.query_one(Input).value)
+
+    @on(Input.Changed)
+    def query_changed(self, event: Input.Changed) -> None:
+        event.stop()
+        self.search(event.value)
+
+    def search(self, text: str) -> None:
+        if self.catalogue is None:
+            return
+        try:
+            query = parse_query(text)
+        except ValueError:
+            return
+        self.show(self.catalogue.search(query))
+
+    def show(self, found: list[Found]) -> None:
+        data = self.query_one(DataTable)
+        data.clear()
+        for item in found:
+            record = item.record
+            data.add_row(
+                record.target,
+                record.date.strftime("%y/%m/%d %H:%M"),
+                record.exp_fraction,
+                record.gain,
+                Shots(record.stacked, record.taken),
+                item.source,
+                ", ".join(item.copied_to),
+                record.name,
+                key=f"{item.source}/{record.name}",
+            )
@@ -1,29 +1,36 @@
 """Model dialog to confirm leaving the app."""
 
 from dataclasses import dataclass, field, replace
-from typing import Callable
 
+from rich.style import Style
 from rich.text import Text
 from textual import on, work
 from textual.app import ComposeResult
+from textual.containers import Horizontal
 from textual.message import Message
 from textual.screen import Screen
 from textual.widgets import DataTable, Footer, Header
 from textual.widgets.data_table import ColumnKey, RowKey
+from textual.worker import Worker, get_current_worker
 
-from dwarf_copier.configuration import ConfigSource, config
-from dwarf_copier.drivers import disk
+from dwarf_copier import configuration
+from dwarf_copier.configuration import ConfigSource
+from dwarf_copier.drivers import aio
 from dwarf_copier.model import State
 from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.session_record import SessionRecord
 from dwarf_copier.models.source_directory import SourceDirectory
+from dwarf_copier.thumbnails import Thumbnail, ThumbnailCache, preview
 from dwarf_copier.widgets.prev_next import PrevNext
+from dwarf_copier.widgets.preview import SessionPreview
 from dwarf_copier.widgets.sortable_table import SortableDataTable
 
 
 class Toggle:
     """Rich renderable checkable box."""
 
-    value: bool = False
+    __slots__ = ("value",)
+    value: bool
 
     def __init__(self, v: bool) -> None:
         self.value = v
@@ -36,7 +43,7 @@ class Toggle:
         return "\N{Ballot Box with Check}" if self.value else "\N{Ballot Box}"
 
 
-@dataclass(order=True, frozen=True)
+@dataclass(order=True, frozen=True, slots=True)
 class Shots:
     """Rich renderable renders with custom separator."""
 
@@ -60,6 +67,22 @@ class Shots:
         return Text(s, style=color)
 
 
+@dataclass(order=True, frozen=True, slots=True)
+class Directory:
+    """Rich renderable folder name, lighter to keep in every row than a Text."""
+
+    name: str
+    style: Style = field(compare=False)
+
+    def __str__(self) -> str:
+        """String for display."""
+        return self.name
+
+    def __rich__(self) -> Text:
+        """Render the name in the row's style."""
+        return Text(self.name, style=self.style)
+
+
 class ShowSessions(Screen[State]):
     """Screen to display sessions present on a source."""
 
@@ -79,7 +102,7 @@ class ShowSessions(Screen[State]):
 
     state: State
     selected_keys: set[RowKey]
-    sessions: dict[RowKey, SourceDirectory]
+    sessions: dict[RowKey, SessionRecord]
     column_keys: list[ColumnKey]
 
     @dataclass
@@ -106,13 +129,15 @@ class ShowSessions(Screen[State]):
     def compose(self) -> ComposeResult:
         """Create our widgets."""
         yield Header()
-        data = SortableDataTable[str | int | float | Shots | Toggle]()
+        data = SortableDataTable[str | int | float | Shots | Toggle | Directory]()
         self.column_keys = data.add_columns(
             "", "Target", "Date", "Exp", "Gain", "IR", "Bin", "Shots", "Directory"
         )
         data.loading = True
         data.cursor_type = "row"
-        yield data
+        with Horizontal():
+            yield data
+            yield SessionPreview("No preview")
         yield PrevNext()
         yield Footer()
 
@@ -121,22 +146,38 @@ class ShowSessions(Screen[State]):
         self.populate()
 
     def populate(self) -> None:
-        def callback(session: SourceDirectory | None) -> None:
-            self.post_message(self.SessionFound(session))
-
-        self.list_dirs(self.source, callback)
+        self.list_dirs(self.source)
 
     @property
     def selected(self) -> list[SourceDirectory]:
-        return [self.sessions[k] for k in self.selected_keys]
+        return [self.sessions[k].session() for k in self.selected_keys]
 
-    @work(thread=True)
-    def list_dirs(
-        self, source: ConfigSource, callback: Callable[[SourceDirectory | None], None]
-    ) -> None:
-        driver = disk.Driver(source.path)
-        driver.list_dirs(callback=callback)
-        return
+    @work
+    async def list_dirs(self, source: ConfigSource) -> None:
+        async for session in aio.adapt(source.driver).list_sessions():
+            self.post_message(self.SessionFound(session))
+        self.post_message(self.SessionFound(None))
+
+    @on(DataTable.RowHighlighted)
+    def row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        event.stop()
+        if event.row_key is not None and event.row_key in self.sessions:
+            self.load_preview(self.sessions[event.row_key])
+
+    @work(thread=True, exclusive=True, group="preview")
+    def load_preview(self, record: SessionRecord) -> None:
+        cache_path = configuration.cache_dir()
+        cache = None if cache_path is None else ThumbnailCache(cache_path / "thumbs")
+        thumbnail = preview(record.session(), self.source.driver, cache)
+        worker = get_current_worker()
+        if not worker.is_cancelled:
+            self.app.call_from_thread(self.show_preview, worker, thumbnail)
+
+    def show_preview(self, worker: Worker[None], thumbnail: Thumbnail | None) -> None:
+        # Cancelled on this thread when another row is highlighted, so checking here
+        # can't race with it.
+        if not worker.is_cancelled:
+            self.query_one(SessionPreview).show(thumbnail)
 
     @on(DataTable.RowSelected)
     def row_selected(self, event: DataTable.RowSelected) -> None:
@@ -158,7 +199,7 @@ class ShowSessions(Screen[State]):
     def check_form_valid(self) -> None:
         """Form is valid only when both source and target have been selected."""
         button_bar = self.query_one("PrevNext", PrevNext)
-        button_bar.valid = bool(self.selected)
+        button_bar.valid = bool(self.selected_keys)
 
     @on(PrevNext.Prev)
     def prev_pressed(self) -> None:
@@ -191,46 +232,39 @@ class ShowSessions(Screen[State]):
         else:
             session = msg.session
             self.log(f"Session: {session.path.name}")
-            info = session.info
             fmt = self.target.format
-            format = config.get_format(fmt)
+            format = configuration.config.get_format(fmt)
             copy_session = DestinationDirectory(
                 session,
                 self.target,
                 format,
             )
+            # Only the compact record is kept, the message holds the only reference
+            # to the full session.
+            record = SessionRecord.from_session(session)
+            checkbox: Toggle | str
             if copy_session.destination.exists():
                 style = self.get_component_rich_style(
                     "sessions--existing", partial=True
                 )
-
-                directory = Text(
-                    session.path.name,
-                    style=style,
-                )
                 self.log.info(f"sessions--existing={style}")
-                checkbox: Toggle | str = ""
+                checkbox = ""
             else:
                 style = self.get_component_rich_style(
                     "sessions--new-folder", partial=True
                 )
-
-                directory = Text(
-                    session.path.name,
-                    style=style,
-                )
                 self.log.info(f"sessions--new-folder={style}")
                 checkbox = Toggle(False)
             key = data.add_row(
                 checkbox,
-                info.target,
-                session.date.strftime("%y/%m/%d %H:%M"),
-                info.exp_fraction,
-                info.gain,
-                info.ir,
-                info.binning,
-                Shots(info.shotsStacked, info.shotsTaken),
-                directory,
-                key=session.path.name,
+                record.target,
+                record.date.strftime("%y/%m/%d %H:%M"),
+                record.exp_fraction,
+                record.gain,
+                record.ir,
+                record.binning,
+                Shots(record.stacked, record.taken),
+                Directory(record.name, style),
+                key=record.name,
             )
-            self.sessions[key] = session
+            self.sessions[key] = record
@@ -7,10 +7,10 @@ from textual.containers import Container
 from textual.screen import Screen
 from textual.widgets import Footer, Header, Label, RadioButton, RadioSet
 
+from dwarf_copier import configuration
 from dwarf_copier.configuration import (
     ConfigSource,
     ConfigTarget,
-    config,
 )
 from dwarf_copier.model import PartialState
 from dwarf_copier.widgets.prev_next import PrevNext
@@ -39,7 +39,7 @@ class SelectSourceTarget(Screen[PartialState]):
             yield Label("Select source and destination for image copy:", id="top_text")
             with RadioSet(id="sources") as rs:
                 rs.border_title = "Source"
-                for src in config.sources:
+                for src in configuration.config.sources:
                     logging.info(
                         "Selected: %s, src %r, self.source %r",
                         src == self.source,
@@ -50,7 +50,7 @@ class SelectSourceTarget(Screen[PartialState]):
 
             with RadioSet(id="targets") as rs:
                 rs.border_title = "Destination"
-                for target in config.targets:
+                for target in configuration.config.targets:
                     yield RadioButton(target.name, value=target == self.target)
 
             yield Label(id="current_source")
@@ -67,13 +67,13 @@ class SelectSourceTarget(Screen[PartialState]):
     @on(RadioSet.Changed, "#sources")
     def source_change(self, event: RadioSet.Changed) -> None:
         """User selected a source."""
-        self.source = config.sources[event.radio_set.pressed_index]
+        self.source = configuration.config.sources[event.radio_set.pressed_index]
         self.form_is_valid()
 
     @on(RadioSet.Changed, "#targets")
     def target_changed(self, event: RadioSet.Changed) -> None:
         """User selected a target."""
-        self.target = config.targets[event.radio_set.pressed_index]
+        self.target = configuration.config.targets[event.radio_set.pressed_index]
         self.form_is_valid()
 
     def form_is_valid(self) -> None:
@@ -83,7 +83,7 @@ class SelectSourceTarget(Screen[PartialState]):
 
         if self.target is not None:
             self.query_one("#current_target", Label).update(
-                config.describe_target(self.target)
+                configuration.config.describe_target(self.target)
             )
 
         button_bar = self.query_one("PrevNext", PrevNext)
@@ -93,6 +93,4 @@ class SelectSourceTarget(Screen[PartialState]):
     def next_pressed(self) -> None:
         """Pressing 'next' dismisses this screen."""
         if self.source is not None and self.target is not None:
-            self.dismiss(
-                PartialState(source=self.source, target=self.target)
-            )
+            self.dismiss(PartialState(source=self.source, target=self.target))
@@ -0,0 +1,65 @@
+"""dwarf-copy global settings.
+
+Settings come from the environment (prefix ``DWARF_COPY_``) rather than the
+configuration file. They live in their own module so that pydantic-settings is only
+imported when a configuration file is actually being loaded.
+"""
+
+import os
+from typing import Annotated
+
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Global settings."""
+
+    model_config = SettingsConfigDict(env_prefix="dwarf_copy_")
+
+    config_filename: str = "dwarf-copy.yml"
+    config_path: Annotated[
+        str,
+        Field(
+            default="~/AppData/dwarf-copy",
+            description=f"Search path for config files (use '{os.pathsep
+                                                          }' to separate elements)",
+        ),
+    ]
+    cache_path: Annotated[
+        str,
+        Field(
+            default="~/.cache/dwarf-copy",
+            description="Directory for cached data, empty to disable caching",
+        ),
+    ]
+    report_path: Annotated[
+        str,
+        Field(
+            default="~/AppData/dwarf-copy/reports",
+            description="Directory for a JSON report of each copy, empty to disable",
+        ),
+    ]
+    report_keep: Annotated[
+        int,
+        Field(
+            default=100,
+            ge=0,
+            description="Most reports kept, older ones are removed, 0 keeps all",
+        ),
+    ]
+    report_prometheus: Annotated[
+        bool,
+        Field(
+            default=False,
+            description="Also write the latest report as Prometheus text",
+        ),
+    ]
+    profile: Annotated[
+        str,
+        Field(
+            default="",
+            description="Directory for profiles of listing and copying, empty to "
+            "disable profiling",
+        ),
+    ]
@@ -0,0 +1,165 @@
+"""Keep copies in the background so they don't starve interactive work.
+
+A token bucket shared by every copy worker caps the average rate of copying. Files
+are copied whole by the drivers, so each worker takes its tokens after copying a
+file and sleeps off any debt before starting the next one. The rate over a few files
+is held to the limit even though a single file still copies at full speed.
+
+Sources and targets may limit how many files are copied from or to them at once, an
+SD card is slower with more than one or two reads in flight while a NAS wants many
+writes. A semaphore for each end of the copy is held while a file is copied.
+
+Copy workers may also lower their own CPU and I/O priority. This is only done on
+Linux, where both are set per thread, so only the workers are affected. Elsewhere
+they would apply to the whole process, interface included. The I/O priority only has
+an effect with an I/O scheduler that supports it, such as BFQ.
+"""
+
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator
+
+from dwarf_copier.configuration import ConfigGeneral, ConfigSource, ConfigTarget
+from dwarf_copier.model import CopyOrLinkBase
+
+MEGABYTE = 1024 * 1024
+NICE = 10
+# ioprio_set isn't wrapped by Python or glibc.
+IOPRIO_SET = {"x86_64": 251, "aarch64": 30, "i686": 289, "armv7l": 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+
+
+class TokenBucket:
+    """Rate limit shared between threads.
+
+    Tokens are bytes. A consumer may overdraw the bucket, it then waits until the
+    debt would have been refilled, and later consumers wait for their share after
+    it.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.last = clock()
+        self.lock = threading.Lock()
+
+    def consume(self, amount: int) -> float:
+        """Take tokens, returns the time waited."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+def lower_priority() -> None:
+    """Lower the CPU and I/O priority of the calling thread.
+
+    Does nothing except on Linux, which is the only platform taking a thread id in
+    place of a process id.
+    """
+    if sys.platform != "linux":
+        return
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, NICE)
+    except OSError as e:
+        logging.debug("Cannot lower priority: %s", e)
+    syscall = IOPRIO_SET.get(platform.machine())
+    if syscall is None:
+        return
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    ioprio = IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT
+    if libc.syscall(syscall, IOPRIO_WHO_PROCESS, tid, ioprio) != 0:
+        logging.debug("Cannot set I/O priority: %s", os.strerror(ctypes.get_errno()))
+
+
+@dataclass
+class Throttle:
+    """Limits shared by the copy workers."""
+
+    bucket: TokenBucket | None = None
+    background: bool = False
+    # Limits on concurrent copies keyed by the folder of a source or target.
+    limits: dict[Path, int] = field(default_factory=dict)
+    slots: dict[Path, threading.BoundedSemaphore] = field(
+        default_factory=dict, init=False
+    )
+
+    @classmethod
+    def from_config(
+        cls,
+        general: ConfigGeneral,
+        source: ConfigSource | None = None,
+        *targets: ConfigTarget,
+    ) -> "Throttle":
+        bucket = None
+        if general.bandwidth:
+            bucket = TokenBucket(general.bandwidth * MEGABYTE)
+        throttle = cls(bucket, general.background)
+        if source is not None:
+            throttle.limit(source.path, source.max_transfers)
+        for target in targets:
+            throttle.limit(target.path, target.max_transfers)
+        return throttle
+
+    def limit(self, folder: Path, limit: int | None) -> None:
+        """Limit the files copied at once from or to a folder."""
+        if limit is not None and folder not in self.slots:
+            self.limits[folder] = limit
+            self.slots[folder] = threading.BoundedSemaphore(limit)
+
+    def workers(self, default: int) -> int:
+        """Number of copy workers, enough for the largest limit.
+
+        The semaphores hold each end of the copy to its own limit so only the end
+        with the larger limit uses every worker.
+        """
+        return max([default, *self.limits.values()])
+
+    @contextmanager
+    def hold(self, action: CopyOrLinkBase) -> Iterator[None]:
+        """Wait for a slot at each end of a copy, hold them until it completes."""
+        with ExitStack() as stack:
+            # Always in the same order, so workers can't deadlock each other.
+            for folder, slot in self.slots.items():
+                if (
+                    action.source_folder == folder
+                    or action.working_folder.is_relative_to(folder)
+                ):
+                    stack.enter_context(slot)
+            yield
+
+    def start_worker(self) -> None:
+        """Called by each copy worker thread as it starts."""
+        if self.background:
+            lower_priority()
+
+    def transferred(self, size: int) -> None:
+        """Called after copying, blocks while over the bandwidth limit."""
+        if self.bucket is not None and size:
+            self.bucket.consume(size)
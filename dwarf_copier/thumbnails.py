@@ -0,0 +1,177 @@
+"""Small previews of a session's stacked image, cached on disk.
+
+Decoding a multi-MB JPEG from a slow card every time a session is highlighted would
+make browsing sessions sluggish, so each image is downscaled once and the result is
+saved in the cache directory as a tiny PPM file. Cache entries are keyed by the
+image path and its modification time and the least recently used entries are
+removed once the cache exceeds its size limit.
+
+Downscaling uses Pillow, which is optional: without it previews that are already
+cached are still shown but no new ones are created.
+"""
+
+import hashlib
+import importlib.util
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING
+
+from dwarf_copier.configuration import BaseDriver
+from dwarf_copier.models.source_directory import SourceDirectory
+
+if TYPE_CHECKING:
+    import rich.text
+
+# Smallest first, the Dwarf writes a thumbnail alongside the full size image.
+PREVIEW_FILES = ("stacked_thumbnail.jpg", "stacked.jpg", "stacked.png")
+WIDTH = 48
+HEIGHT = 32
+CACHE_SIZE = 20 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    """Downscaled RGB image."""
+
+    width: int
+    height: int
+    pixels: bytes
+
+    def to_ppm(self) -> bytes:
+        return f"P6 {self.width} {self.height} 255\n".encode() + self.pixels
+
+    @classmethod
+    def from_ppm(cls, data: bytes) -> "Thumbnail":
+        header, _, pixels = data.partition(b"\n")
+        magic, width, height, maxval = header.split()
+        if magic != b"P6" or maxval != b"255":
+            raise ValueError("Unsupported thumbnail")
+        if len(pixels) != int(width) * int(height) * 3:
+            raise ValueError("Truncated thumbnail")
+        return cls(int(width), int(height), pixels)
+
+    def pixel(self, x: int, y: int) -> tuple[int, int, int]:
+        i = (y * self.width + x) * 3
+        r, g, b = self.pixels[i : i + 3]
+        return r, g, b
+
+    def render(self) -> "rich.text.Text":
+        """Render using half blocks, each character shows two rows of pixels."""
+        import rich.text
+
+        text = rich.text.Text(no_wrap=True)
+        for y in range(0, self.height, 2):
+            for x in range(self.width):
+                top = "rgb({},{},{})".format(*self.pixel(x, y))
+                if y + 1 < self.height:
+                    bottom = "rgb({},{},{})".format(*self.pixel(x, y + 1))
+                    text.append("\N{UPPER HALF BLOCK}", style=f"{top} on {bottom}")
+                else:
+                    text.append("\N{UPPER HALF BLOCK}", style=top)
+            if y + 2 < self.height:
+                text.append("\n")
+        return text
+
+
+def make_thumbnail(image: Path, width: int = WIDTH, height: int = HEIGHT) -> Thumbnail:
+    """Downscale an image, raises ImportError if Pillow is not installed."""
+    from PIL import Image  # type: ignore[import-not-found]
+
+    with Image.open(image) as img:
+        # Lets the JPEG decoder downscale as it decodes, much faster than full size.
+        img.draft("RGB", (width * 2, height * 2))
+        rgb = img.convert("RGB")
+        rgb.thumbnail((width, height))
+        return Thumbnail(rgb.width, rgb.height, rgb.tobytes())
+
+
+class ThumbnailCache:
+    """Directory of thumbnails with least recently used eviction.
+
+    The modification time of each cached file records when it was last used.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = CACHE_SIZE) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{hashlib.sha1(key.encode()).hexdigest()}.ppm"
+
+    def get(self, key: str) -> Thumbnail | None:
+        path = self.path(key)
+        try:
+            thumbnail = Thumbnail.from_ppm(path.read_bytes())
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return thumbnail
+
+    def put(self, key: str, thumbnail: Thumbnail) -> None:
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self.path(key).write_bytes(thumbnail.to_ppm())
+            self.evict()
+        except OSError as e:
+            logging.debug("Thumbnail not cached: %s", e)
+
+    def evict(self) -> None:
+        """Remove least recently used thumbnails until the cache fits its limit."""
+        entries = []
+        total = 0
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.endswith(".ppm"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                    total += st.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def preview(
+    session: SourceDirectory, driver: BaseDriver, cache: ThumbnailCache | None
+) -> Thumbnail | None:
+    """Thumbnail of the session's stacked image, None if there isn't one."""
+    for name in PREVIEW_FILES:
+        image = session.path / name
+        local = driver.local_path(image)
+        if local is not None:
+            try:
+                st = local.stat()
+            except OSError:
+                continue
+            key = f"{local.resolve()}|{st.st_mtime_ns}|{st.st_size}"
+        elif driver.match_wildcards(session.path, name):
+            # Sessions don't change once written, so the path is enough.
+            key = image.as_posix()
+        else:
+            continue
+
+        if cache is not None and (thumbnail := cache.get(key)) is not None:
+            return thumbnail
+        if importlib.util.find_spec("PIL") is None:
+            return None
+        try:
+            if local is not None:
+                thumbnail = make_thumbnail(local)
+            else:
+                with TemporaryDirectory() as tmp:
+                    driver.copy_file(image, Path(tmp) / name)
+                    thumbnail = make_thumbnail(Path(tmp) / name)
+        except (OSError, ValueError) as e:
+            logging.debug("No preview from %s: %s", image, e)
+            continue
+        if cache is not None:
+            cache.put(key, thumbnail)
+        return thumbnail
+    return None
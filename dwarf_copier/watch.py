@@ -0,0 +1,105 @@
+"""Watch a source for new sessions.
+
+The source is polled rather than rescanned: the root folder is only listed again when
+its mtime changes, and only sessions which have not yet been copied are checked. A
+session is ready once its directory and shotsInfo.json have stopped changing. A
+session that cannot be read yet, or fails to copy, is tried again once it has been
+unchanged for another settle period.
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from dwarf_copier.drivers.disk import SHOTS_INFO, Driver
+from dwarf_copier.models.source_directory import SourceDirectory
+
+Stamp = tuple[int, int, int]
+
+
+@dataclass
+class Pending:
+    """A session folder that is not yet ready to copy."""
+
+    stamp: Stamp | None = None
+    since: float = 0.0
+
+
+@dataclass
+class SessionWatcher:
+    """Poll a disk source for sessions which have finished being written."""
+
+    driver: Driver
+    settle: float = 30.0
+    """Seconds a session must be unchanged before it is copied."""
+
+    root_mtime: int | None = field(default=None, init=False)
+    seen: set[str] = field(default_factory=set, init=False)
+    pending: dict[str, Pending] = field(default_factory=dict, init=False)
+
+    def scan(self) -> None:
+        """List the root folder, adding any new sessions to pending."""
+        with os.scandir(self.driver.root) as it:
+            names = {
+                entry.name
+                for entry in it
+                if entry.name.startswith("DWARF_RAW") and entry.is_dir()
+            }
+        for name in names - self.seen:
+            self.pending[name] = Pending()
+        # Folders which have gone away (e.g. card removed) can be seen again later.
+        for name in self.seen - names:
+            self.pending.pop(name, None)
+        self.seen = names
+
+    def stamp(self, path: Path) -> Stamp | None:
+        """Summarise the state of a session folder, None if it is incomplete."""
+        try:
+            info = (path / SHOTS_INFO).stat()
+            folder = path.stat()
+        except FileNotFoundError:
+            return None
+        return folder.st_mtime_ns, info.st_mtime_ns, info.st_size
+
+    def poll(self, now: float | None = None) -> list[SourceDirectory]:
+        """Check for changes, return sessions which have become ready."""
+        now = time.monotonic() if now is None else now
+        try:
+            mtime = self.driver.root.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self.root_mtime:
+            self.root_mtime = mtime
+            if mtime is None:
+                self.seen.clear()
+                self.pending.clear()
+            else:
+                self.scan()
+
+        ready: list[SourceDirectory] = []
+        for name, pending in list(self.pending.items()):
+            path = self.driver.root / name
+            stamp = self.stamp(path)
+            if stamp is None or stamp != pending.stamp:
+                pending.stamp, pending.since = stamp, now
+            elif now - pending.since >= self.settle:
+                # Tried again after another settle period unless it is read.
+                pending.since = now
+                try:
+                    session = self.driver.create_session(path)
+                except (OSError, ValueError) as e:
+                    # e.g. shotsInfo.json only partly written.
+                    logging.warning("Cannot read session %s: %s", name, e)
+                    continue
+                if session is not None:
+                    del self.pending[name]
+                    ready.append(session)
+        return sorted(ready, key=lambda s: s.path)
+
+    def retry(self, session: SourceDirectory) -> None:
+        """Report a session again once it settles, e.g. after it failed to copy."""
+        name = session.path.name
+        if name in self.seen:
+            self.pending[name] = Pending()
@@ -16,10 +16,11 @@ from dwarf_copier.model import (
     QUIT_COMMAND,
     BaseCommand,
     CommandQueue,
-    CopyCommand,
-    LinkCommand,
     QuitCommand,
 )
+from dwarf_copier.pipeline import FileCommand, run_command
+from dwarf_copier.report import RunReport
+from dwarf_copier.throttle import Throttle
 
 
 class Copier(Horizontal):
@@ -44,10 +45,19 @@ class Copier(Horizontal):
     valid = reactive(False)
 
     def __init__(
-        self, driver: BaseDriver, queue: CommandQueue, id: str | None = None
+        self,
+        driver: BaseDriver,
+        queue: CommandQueue,
+        failed: list[FileCommand],
+        throttle: Throttle,
+        report: RunReport,
+        id: str | None = None,
     ) -> None:
         self.driver = driver
         self.queue = queue
+        self.failed = failed
+        self.throttle = throttle
+        self.report = report
         super().__init__(id=id)
 
     def compose(self) -> ComposeResult:
@@ -64,24 +74,31 @@ class Copier(Horizontal):
         action: BaseCommand
         bytes: int = 0
         worker = get_current_worker()
+        self.throttle.start_worker()
 
-        for action in iter(self.queue.get, QUIT_COMMAND):
-            if worker.is_cancelled:
-                break
-            match action:
-                case CopyCommand():
-                    self.post_message(Copier.Progress(action.description, bytes))
-                    bytes = action.source.stat().st_size
-                    self.driver.copy_file(action.source, action.dest)
-
-                case LinkCommand():
-                    self.post_message(Copier.Progress(action.description, bytes))
-                    bytes = 0
-                    self.driver.link_file(action.source, action.dest)
-
-                # Here for type checking, the for loop will just break on receiving QUIT
-                case QuitCommand():
+        while True:
+            action = self.queue.get()
+            try:
+                if worker.is_cancelled or isinstance(action, QuitCommand):
                     break
+                self.post_message(Copier.Progress(action.description, bytes))
+                with self.throttle.hold(action):
+                    wait = self.queue.waited(action)
+                    progress = run_command(self.driver, action)
+                progress.timing.wait = wait
+                self.report.record(progress)
+                bytes = progress.bytes
+                if progress.error is not None:
+                    self.failed.append(action)
+                    self.post_message(
+                        Copier.Progress(
+                            f"[b red]Failed[/] {action.description}: {progress.error}",
+                            0,
+                        )
+                    )
+                self.throttle.transferred(bytes)
+            finally:
+                self.queue.task_done()
 
         if not worker.is_cancelled:
             self.post_message(Copier.Progress("Finished", bytes))
@@ -94,25 +111,39 @@ class CopyGroup(Vertical):
     queue: CommandQueue
     copiers: list[Copier]
     copy_workers: list[Worker[None]]
+    failed: list[FileCommand]
+    throttle: Throttle
+    report: RunReport
 
     def __init__(
         self,
         num_workers: int,
         driver: BaseDriver,
         queue: CommandQueue,
+        throttle: Throttle | None = None,
         id: str | None = None,
     ) -> None:
         self.num_workers = num_workers
         self.driver = driver
         self.queue = queue
+        self.throttle = throttle or Throttle()
+        self.report = RunReport()
         self.copiers = []
         self.copy_workers = []
+        self.failed = []
         super().__init__(id=id)
 
     def compose(self) -> ComposeResult:
         """Create our widgets."""
         for i in range(self.num_workers):
-            copier = Copier(self.driver, self.queue, id=f"copy_{i}")
+            copier = Copier(
+                self.driver,
+                self.queue,
+                self.failed,
+                self.throttle,
+                self.report,
+                id=f"copy_{i}",
+            )
             self.copiers.append(copier)
             yield copier
 
@@ -0,0 +1,25 @@
+"""Preview of a session's stacked image."""
+
+from textual.widgets import Static
+
+from dwarf_copier.thumbnails import HEIGHT, WIDTH, Thumbnail
+
+
+class SessionPreview(Static):
+    """Shows a thumbnail of the highlighted session."""
+
+    DEFAULT_CSS = f"""
+        SessionPreview {{
+            width: {WIDTH + 2};
+            height: {HEIGHT // 2 + 2};
+            border: round $accent;
+            content-align: center middle;
+        }}
+        """
+
+    def show(self, thumbnail: Thumbnail | None) -> None:
+        """Display a thumbnail, or a message if there isn't one."""
+        if thumbnail is None:
+            self.update("No preview")
+        else:
+            self.update(thumbnail.render())
@@ -0,0 +1,150 @@
+"""Generate a synthetic Dwarf II card for benchmarks.
+
+The card has the layout the telescope writes: session folders named after the
+target, exposure, gain and time each holding FITS frames with realistic headers,
+shotsInfo.json and the stacked images, plus DWARF_DARK folders of darks for each
+exposure and gain used. Some exposures also have a session of darks taken by
+hand, which the telescope names without a target. Frames are filled with random
+data so they don't compress.
+
+The size is set by environment variables so the same benchmarks can be run at the
+scale of a real night's imaging:
+
+- DWARF_COPY_BENCH_SESSIONS - number of sessions (default 12)
+- DWARF_COPY_BENCH_FRAMES - frames per session (default 10)
+- DWARF_COPY_BENCH_FRAME_SIZE - bytes of pixel data per frame (default 64 KiB, a
+  real frame is about 4 MiB)
+"""
+import json
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from dwarf_copier.models.frame_header import HeaderValue
+from tests.fits_files import header_bytes
+
+TARGETS = ["M1", "M31", "M42", "M45", "NGC7000", "IC1805", "Moon"]
+# Exposure as written in folder names, and gain.
+EXPOSURES = [("15", 80), ("10", 80), ("5", 60), ("30", 100), ("0.0025", 0)]
+STACKED = {"stacked.jpg": 300_000, "stacked_thumbnail.jpg": 8_000, "stacked-16.png": 0}
+DARK_FRAMES = 3
+
+
+@dataclass(frozen=True)
+class CardSpec:
+    """Size of a synthetic card."""
+
+    sessions: int = 12
+    frames: int = 10
+    frame_size: int = 64 * 1024
+    darks: bool = True
+
+    @classmethod
+    def from_env(cls) -> "CardSpec":
+        default = cls()
+        return cls(
+            sessions=int(os.environ.get("DWARF_COPY_BENCH_SESSIONS", default.sessions)),
+            frames=int(os.environ.get("DWARF_COPY_BENCH_FRAMES", default.frames)),
+            frame_size=int(
+                os.environ.get("DWARF_COPY_BENCH_FRAME_SIZE", default.frame_size)
+            ),
+        )
+
+    @property
+    def total_bytes(self) -> int:
+        """Approximate size of the frames in all sessions."""
+        return self.sessions * self.frames * self.frame_size
+
+
+def session_name(target: str, exp: str, gain: int, when: datetime) -> str:
+    """Folder name of a session, manual darks have no target."""
+    prefix = f"DWARF_RAW_{target}_" if target else "DWARF_RAW_"
+    return (
+        f"{prefix}EXP_{exp}_GAIN_{gain}_"
+        f"{when:%Y-%m-%d-%H-%M-%S}-{when.microsecond // 1000:03}"
+    )
+
+
+def shots_info(
+    target: str, exp: str, gain: int, frames: int, rng: random.Random
+) -> dict[str, Any]:
+    return {
+        "DEC": round(rng.uniform(-30, 80), 8),
+        "RA": round(rng.uniform(0, 24), 9),
+        "binning": "1*1",
+        "exp": exp,
+        "format": "FITS",
+        "gain": gain,
+        "ir": rng.choice(["PASS", "CUT"]),
+        "shotsStacked": max(frames - rng.randrange(3), 0),
+        "shotsTaken": frames,
+        "shotsToTake": frames + rng.randrange(20),
+        "target": target,
+    }
+
+
+def write_frame(
+    path: Path,
+    target: str,
+    exp: str,
+    gain: int,
+    when: datetime,
+    pixels: bytes,
+    rng: random.Random,
+) -> None:
+    cards: dict[str, HeaderValue] = {
+        "OBJECT": target or "Unknown",
+        "DATE-OBS": when.isoformat(timespec="milliseconds"),
+        "EXPTIME": float(exp),
+        "GAIN": gain,
+        "CCD-TEMP": round(rng.uniform(8, 25), 1),
+        "INSTRUME": "DWARFII",
+    }
+    path.write_bytes(header_bytes(cards) + pixels)
+
+
+def make_card(root: Path, spec: CardSpec, seed: int = 0) -> Path:
+    """Write a card under root, returns the path of its Astronomy folder."""
+    rng = random.Random(seed)
+    astronomy = root / "Astronomy"
+    pixels = rng.randbytes(spec.frame_size)
+    start = datetime(2024, 1, 1, 20, 0)
+    for i in range(spec.sessions):
+        target = TARGETS[i % len(TARGETS)]
+        exp, gain = EXPOSURES[i % len(EXPOSURES)]
+        # A few sessions a night.
+        when = start + timedelta(
+            days=i // 3, hours=i % 3, milliseconds=rng.randrange(60_000)
+        )
+        folder = astronomy / session_name(target, exp, gain, when)
+        folder.mkdir(parents=True)
+        info = shots_info(target, exp, gain, spec.frames, rng)
+        (folder / "shotsInfo.json").write_text(json.dumps(info, indent=4))
+        for n in range(spec.frames):
+            frame_time = when + timedelta(seconds=n * float(exp))
+            write_frame(
+                folder / f"{n:04}.fits", target, exp, gain, frame_time, pixels, rng
+            )
+        for name, size in STACKED.items():
+            (folder / name).write_bytes(rng.randbytes(size or spec.frame_size))
+
+    if spec.darks:
+        for exp, gain in EXPOSURES[::2]:
+            folder = astronomy / session_name("", exp, gain, start)
+            folder.mkdir(parents=True)
+            for n in range(DARK_FRAMES):
+                write_frame(folder / f"{n:04}.fits", "", exp, gain, start, pixels, rng)
+        for exp, gain in EXPOSURES:
+            for binning in (1, 2):
+                folder = (
+                    astronomy / "DWARF_DARK" / f"exp_{exp}_gain_{gain}_bin_{binning}"
+                )
+                folder.mkdir(parents=True)
+                for n in range(DARK_FRAMES):
+                    write_frame(
+                        folder / f"{n:04}.fits", "", exp, gain, start, pixels, rng
+                    )
+    return astronomy
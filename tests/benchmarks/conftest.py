@@ -0,0 +1,63 @@
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pytest
+
+from tests.benchmarks import results
+
+
+@pytest.fixture(scope="session")
+def bench_results() -> Iterator[dict[str, float]]:
+    """Measurements from every benchmark in the run.
+
+    They are appended to the file named by DWARF_COPY_BENCH_RESULTS when the run
+    ends, to compare against other versions with `python -m tests.benchmarks.results`.
+    """
+    measured: dict[str, float] = {}
+    yield measured
+    if (path := os.environ.get(results.RESULTS_ENV)) and measured:
+        results.append(Path(path), measured)
+
+
+@pytest.fixture
+def record_result(
+    record_property: Callable[[str, object], None],
+    bench_results: dict[str, float],
+    request: pytest.FixtureRequest,
+) -> Callable[[str, float], None]:
+    """Record a measurement in the junit xml report and the results file."""
+
+    def record(name: str, value: float) -> None:
+        record_property(name, value)
+        bench_results[f"{request.node.name}::{name}"] = value
+
+    return record
+
+
+@pytest.fixture
+def timer(
+    record_result: Callable[[str, float], None],
+) -> Callable[[str], "Timer"]:
+    """Time a block of code, the result is recorded in the junit xml report."""
+
+    def make(name: str) -> Timer:
+        return Timer(name, record_result)
+
+    return make
+
+
+class Timer:
+    def __init__(self, name: str, record: Callable[[str, float], None]) -> None:
+        self.name = name
+        self.record = record
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.elapsed = time.perf_counter() - self.start
+        self.record(self.name, self.elapsed)
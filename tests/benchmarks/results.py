@@ -0,0 +1,101 @@
+"""Benchmark results kept across versions.
+
+Run the benchmarks with DWARF_COPY_BENCH_RESULTS set to a file and each run appends
+one JSON line holding the version, commit, card size and every measurement. Compare
+the latest run with the one before, or with the last run of a given version:
+
+    DWARF_COPY_BENCH_RESULTS=bench.jsonl pytest -m benchmark tests/benchmarks
+    python -m tests.benchmarks.results bench.jsonl [--baseline VERSION]
+"""
+import argparse
+import json
+import platform
+import subprocess
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Sequence
+
+import dwarf_copier
+from tests.benchmarks.card import CardSpec
+
+RESULTS_ENV = "DWARF_COPY_BENCH_RESULTS"
+
+
+def commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def append(path: Path, measured: dict[str, float]) -> None:
+    """Append a run to the results file."""
+    run = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "version": dwarf_copier.__version__,
+        "commit": commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "card": asdict(CardSpec.from_env()),
+        "results": measured,
+    }
+    with path.open("a") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+def load(path: Path) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text().splitlines() if line]
+
+
+def compare(baseline: dict[str, Any], latest: dict[str, Any]) -> list[str]:
+    """Lines of a table of measurements in both runs and the change."""
+    lines = [f"{'measurement':<50} {'baseline':>12} {'latest':>12} {'change':>8}"]
+    before, after = baseline["results"], latest["results"]
+    for name in sorted(before.keys() & after.keys()):
+        change = (after[name] - before[name]) / before[name] if before[name] else 0.0
+        lines.append(
+            f"{name:<50} {before[name]:>12.4g} {after[name]:>12.4g} {change:>+8.1%}"
+        )
+    if baseline["card"] != latest["card"]:
+        lines.append(f"Card sizes differ: {baseline['card']} {latest['card']}")
+    return lines
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("results", type=Path, help="results file")
+    parser.add_argument(
+        "--baseline", help="compare with the last run of this version (or commit)"
+    )
+    args = parser.parse_args(argv)
+
+    runs = load(args.results)
+    if len(runs) < 2:
+        parser.error("need at least two runs to compare")
+    latest = runs[-1]
+    earlier = runs[:-1]
+    if args.baseline:
+        earlier = [
+            run for run in earlier if args.baseline in (run["version"], run["commit"])
+        ]
+        if not earlier:
+            parser.error(f"no runs of {args.baseline}")
+    baseline = earlier[-1]
+    print(
+        f"{baseline['version']} ({baseline['commit']}) -> "
+        f"{latest['version']} ({latest['commit']})"
+    )
+    print("\n".join(compare(baseline, latest)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
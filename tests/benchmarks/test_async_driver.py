@@ -0,0 +1,127 @@
+"""Thread-per-transfer against async transfers from a simulated high-latency source."""
+import asyncio
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable
+
+import pytest
+
+from dwarf_copier.configuration import BaseDriver, ConfigFormat
+from dwarf_copier.drivers import aio
+from dwarf_copier.model import CommandQueue, CopyCommand
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+from dwarf_copier.pipeline import Progress, WorkerPool
+from tests.benchmarks.conftest import Timer
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.anyio]
+
+LATENCY = 0.01
+TRANSFERS = 256
+PAYLOAD = b"x" * 4096
+
+
+class LatencyDriver(BaseDriver):
+    """Each transfer waits for the network before writing a small file."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def list_dirs(self, callback: Callable[[SourceDirectory | None], None]) -> None:
+        callback(None)
+
+    def prepare(
+        self, format: ConfigFormat, session: DestinationDirectory, target_path: Path
+    ) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
+        return [], {}, {}
+
+    def copy_file(self, src: Path, dest: Path) -> int:
+        time.sleep(LATENCY)
+        dest.write_bytes(PAYLOAD)
+        return len(PAYLOAD)
+
+    def link_file(self, src: Path, dest: Path) -> None:
+        self.copy_file(src, dest)
+
+    def match_wildcards(self, base: Path, filename: str) -> list[Path]:
+        return []
+
+    def create_session(self, p: Path) -> SourceDirectory | None:
+        return None
+
+
+class AsyncLatencyDriver(aio.AsyncDriver):
+    """Native async transfers: waiting for the network does not hold a thread."""
+
+    async def list_sessions(self) -> AsyncIterator[SourceDirectory]:
+        sessions: list[SourceDirectory] = []
+        for session in sessions:
+            yield session
+
+    async def create_session(self, p: Path) -> SourceDirectory | None:
+        return None
+
+    async def prepare(
+        self, format: ConfigFormat, session: DestinationDirectory, target_path: Path
+    ) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
+        return [], {}, {}
+
+    async def copy_file(self, src: Path, dest: Path) -> int:
+        await asyncio.sleep(LATENCY)
+        dest.write_bytes(PAYLOAD)
+        return len(PAYLOAD)
+
+    async def link_file(self, src: Path, dest: Path) -> None:
+        await self.copy_file(src, dest)
+
+    async def match_wildcards(self, base: Path, filename: str) -> list[Path]:
+        return []
+
+
+def commands(tmp_path: Path) -> list[CopyCommand]:
+    return [
+        CopyCommand(
+            source=Path(f"/remote/{i:04}.fits"),
+            dest=tmp_path / f"{i:04}.fits",
+            source_folder=Path("/remote"),
+            working_folder=tmp_path,
+        )
+        for i in range(TRANSFERS)
+    ]
+
+
+def run_threads(tmp_path: Path, workers: int) -> list[Progress]:
+    queue = CommandQueue()
+    results: list[Progress] = []
+    pool = WorkerPool(LatencyDriver(tmp_path), queue, workers, results.append)
+    pool.start()
+    for command in commands(tmp_path):
+        queue.put(command)
+    queue.join()
+    pool.shutdown()
+    return results
+
+
+@pytest.mark.parametrize("workers", [4, 64])
+def test_thread_per_transfer(
+    tmp_path: Path, workers: int, timer: Callable[[str], Timer]
+) -> None:
+    with timer(f"threads_{workers}") as t:
+        results = run_threads(tmp_path, workers)
+    assert len(results) == TRANSFERS
+    # Can never beat one round trip per transfer per thread.
+    assert t.elapsed >= TRANSFERS * LATENCY / workers
+
+
+@pytest.mark.parametrize("concurrency", [64])
+async def test_async_transfers(
+    tmp_path: Path, concurrency: int, timer: Callable[[str], Timer]
+) -> None:
+    results: list[Progress] = []
+    driver = AsyncLatencyDriver()
+    with timer(f"async_{concurrency}") as t:
+        await aio.copy_all(driver, commands(tmp_path), concurrency, results.append)
+    assert len(results) == TRANSFERS
+
+    # Far quicker than the default pool of 4 threads, using only one thread.
+    assert t.elapsed < TRANSFERS * LATENCY / 4
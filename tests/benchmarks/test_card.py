@@ -0,0 +1,101 @@
+"""Scanning, preparing and copying a synthetic card.
+
+The card size is set with the environment variables described in card.py, the
+defaults keep these quick enough to run with the rest of the tests.
+"""
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from dwarf_copier.configuration import ConfigurationModel
+from dwarf_copier.model import Specials
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+from dwarf_copier.pipeline import SessionRunner
+from tests.benchmarks.card import CardSpec, make_card
+from tests.benchmarks.conftest import Timer
+
+pytestmark = pytest.mark.benchmark
+
+SPEC = CardSpec.from_env()
+
+
+@pytest.fixture(scope="module")
+def card(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    return make_card(tmp_path_factory.mktemp("card"), SPEC)
+
+
+@pytest.fixture
+def astronomy_source(card: Path) -> Path:
+    return card
+
+
+def list_sessions(config: ConfigurationModel) -> list[SourceDirectory]:
+    sessions: list[SourceDirectory] = []
+    config.get_source("TestEnv").driver.list_dirs(
+        lambda s: sessions.append(s) if s is not None else None
+    )
+    return sessions
+
+
+def session_destinations(
+    config: ConfigurationModel, target: str
+) -> list[DestinationDirectory]:
+    return [
+        DestinationDirectory(
+            session, config.get_target(target), config.get_format(target)
+        )
+        for session in list_sessions(config)
+    ]
+
+
+def test_scan(config_dummy: ConfigurationModel, timer: Callable[[str], Timer]) -> None:
+    with timer("scan"):
+        sessions = list_sessions(config_dummy)
+    assert len(sessions) == SPEC.sessions
+
+
+def test_prepare(
+    config_dummy: ConfigurationModel, tmp_path: Path, timer: Callable[[str], Timer]
+) -> None:
+    driver = config_dummy.get_source("TestEnv").driver
+    destinations = session_destinations(config_dummy, "Siril")
+    with timer("prepare"):
+        prepared = [
+            driver.prepare(session.config_format, session, tmp_path)
+            for session in destinations
+        ]
+    for _, links, _ in prepared:
+        assert len(links) == SPEC.frames + 4
+
+
+def test_specials(
+    config_dummy: ConfigurationModel, timer: Callable[[str], Timer]
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    destinations = session_destinations(config_dummy, "Siril")
+    with timer("specials"):
+        darks = [
+            Specials(session, source, source.darks).best_candidate
+            for session in destinations
+        ]
+    assert all(darks)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_copy(
+    config_dummy: ConfigurationModel,
+    workers: int,
+    timer: Callable[[str], Timer],
+    record_result: Callable[[str, float], None],
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    destinations = session_destinations(config_dummy, "Backup")
+    with SessionRunner(source, workers, lambda p: None) as runner:
+        with timer("copy"):
+            assert all(runner.copy(session) for session in destinations)
+    summary = runner.report.summary()
+    record_result("throughput", summary["throughput"])
+    assert summary["files"] == SPEC.sessions * (SPEC.frames + 4)
+    assert summary["bytes"] >= SPEC.total_bytes
@@ -0,0 +1,76 @@
+"""Compressing while copying, in the copy threads or in the process stage."""
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from dwarf_copier.compress import gzip_file
+from dwarf_copier.processes import ProcessStage
+from tests.benchmarks.conftest import Timer
+
+pytestmark = pytest.mark.benchmark
+
+FILES = 32
+FRAME_SIZE = 4 * 1024 * 1024  # About the size of a Dwarf II frame.
+# Noisy low bits like a dark sky frame, so the data compresses a little.
+NOISE = bytes(range(16)) * 16
+
+
+@pytest.fixture(scope="module")
+def frames(tmp_path_factory: pytest.TempPathFactory) -> list[Path]:
+    root = tmp_path_factory.mktemp("frames")
+    paths = [root / f"{i:04}.fits" for i in range(FILES)]
+    for path in paths:
+        path.write_bytes(os.urandom(FRAME_SIZE).translate(NOISE))
+    return paths
+
+
+def compress_all(
+    frames: list[Path], dest: Path, workers: int, compress: Callable[[Path, Path], int]
+) -> None:
+    with ThreadPoolExecutor(workers) as pool:
+        sizes = list(pool.map(lambda p: compress(p, dest / f"{p.name}.gz"), frames))
+    assert sizes == [FRAME_SIZE] * FILES
+    with gzip.open(dest / f"{frames[0].name}.gz") as f:
+        assert f.read() == frames[0].read_bytes()
+
+
+def thread_compress(src: Path, dest: Path) -> int:
+    return gzip_file(str(src), str(dest), remove=False)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_compress_in_threads(
+    frames: list[Path],
+    tmp_path: Path,
+    workers: int,
+    timer: Callable[[str], Timer],
+) -> None:
+    with timer(f"threads_{workers}"):
+        compress_all(frames, tmp_path, workers, thread_compress)
+
+
+def test_compress_in_processes(
+    frames: list[Path], tmp_path: Path, timer: Callable[[str], Timer]
+) -> None:
+    elapsed: dict[int, float] = {}
+    for workers in (1, 2, 4):
+        stage = ProcessStage(workers)
+        try:
+            # Start the processes before timing.
+            list(stage.pool.map(abs, range(workers)))
+
+            def compress(src: Path, dest: Path) -> int:
+                return stage.pool.submit(gzip_file, str(src), str(dest), False).result()
+
+            with timer(f"processes_{workers}") as t:
+                compress_all(frames, tmp_path, workers, compress)
+            elapsed[workers] = t.elapsed
+        finally:
+            stage.close()
+
+    if (os.cpu_count() or 1) >= 4:
+        assert elapsed[4] < elapsed[1] * 0.75
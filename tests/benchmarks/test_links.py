@@ -0,0 +1,71 @@
+"""Linking the frames of a session into a Siril layout.
+
+Set DWARF_COPY_BENCH_LINK_FRAMES to change the number of frames linked.
+"""
+import os
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from dwarf_copier.drivers import disk
+from dwarf_copier.model import LinkCommand
+from dwarf_copier.pipeline import make_links, run_command
+from tests.benchmarks.conftest import Timer
+
+pytestmark = pytest.mark.benchmark
+
+FRAMES = int(os.environ.get("DWARF_COPY_BENCH_LINK_FRAMES", "10000"))
+
+
+@pytest.fixture(scope="module")
+def session(tmp_path_factory: pytest.TempPathFactory) -> list[Path]:
+    root = tmp_path_factory.mktemp("session")
+    frames = [root / f"{i:05}.fits" for i in range(FRAMES)]
+    for frame in frames:
+        frame.touch()
+    return frames
+
+
+def lights(tmp_path: Path, name: str) -> Path:
+    working = tmp_path / name
+    (working / "lights").mkdir(parents=True)
+    return working
+
+
+def test_queued_links(
+    session: list[Path], tmp_path: Path, timer: Callable[[str], Timer]
+) -> None:
+    working = lights(tmp_path, "queued")
+    driver = disk.Driver(Path("/"))
+    with timer("queued"):
+        for frame in session:
+            command = LinkCommand(
+                source=frame,
+                dest=working / "lights" / frame.name,
+                source_folder=frame.parent,
+                working_folder=working,
+            )
+            assert run_command(driver, command).error is None
+    assert len(list((working / "lights").iterdir())) == FRAMES
+
+
+def test_link_farm(
+    session: list[Path], tmp_path: Path, timer: Callable[[str], Timer]
+) -> None:
+    working = lights(tmp_path, "farm")
+    with timer("farm"):
+        commands = [
+            LinkCommand.model_construct(
+                source=frame,
+                dest=working / "lights" / frame.name,
+                source_folder=frame.parent,
+                working_folder=working,
+            )
+            for frame in session
+        ]
+        progress = make_links(commands)
+    assert not [p for p in progress if p.error is not None]
+    link = working / "lights" / session[0].name
+    assert not Path(os.readlink(link)).is_absolute()
+    assert link.resolve() == session[0]
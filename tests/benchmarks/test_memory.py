@@ -0,0 +1,83 @@
+"""Memory held while listing an archive, by number of sessions.
+
+Each count is measured in a fresh interpreter so its peak RSS isn't hidden by an
+earlier, larger run. Sessions are parsed from shotsInfo.json as a driver would and
+either kept whole or as the compact records the session list keeps.
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from dwarf_copier.drivers.disk import make_session
+from dwarf_copier.models.session_record import SessionRecord
+from tests.benchmarks.card import EXPOSURES, TARGETS, session_name, shots_info
+
+pytestmark = pytest.mark.benchmark
+
+SESSIONS = [
+    int(n)
+    for n in os.environ.get("DWARF_COPY_BENCH_MEMORY_SESSIONS", "1000,10000").split(",")
+]
+
+
+def measure(count: int, compact: bool) -> dict[str, int]:
+    """List count sessions, returns the memory held and the peak RSS in KiB."""
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1, 20, 0)
+    tracemalloc.start()
+    kept: list[object] = []
+    for i in range(count):
+        target = TARGETS[i % len(TARGETS)]
+        exp, gain = EXPOSURES[i % len(EXPOSURES)]
+        when = start + timedelta(hours=i, milliseconds=rng.randrange(1000))
+        path = Path("/card/Astronomy") / session_name(target, exp, gain, when)
+        info = json.dumps(shots_info(target, exp, gain, 300, rng))
+        session = make_session(path, info)
+        assert session is not None
+        kept.append(SessionRecord.from_session(session) if compact else session)
+    held, _ = tracemalloc.get_traced_memory()
+    return {
+        "held": held // 1024,
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_measure(count: int, compact: bool) -> dict[str, int]:
+    code = (
+        "import json, sys; from tests.benchmarks.test_memory import measure; "
+        "print(json.dumps(measure(int(sys.argv[1]), sys.argv[2] == 'compact')))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, str(count), "compact" if compact else "full"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parents[2],
+    )
+    measured: dict[str, int] = json.loads(result.stdout)
+    return measured
+
+
+@pytest.mark.parametrize("count", SESSIONS)
+def test_session_list_memory(
+    count: int, record_result: Callable[[str, float], None]
+) -> None:
+    full = run_measure(count, compact=False)
+    compact = run_measure(count, compact=True)
+    for name, value in {
+        "full_held_kib": full["held"],
+        "compact_held_kib": compact["held"],
+        "full_peak_rss_kib": full["peak_rss"],
+        "compact_peak_rss_kib": compact["peak_rss"],
+    }.items():
+        record_result(name, value)
+    assert compact["held"] * 3 < full["held"]
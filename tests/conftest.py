@@ -2,6 +2,7 @@ from datetime import datetime
 from pathlib import Path
 
 import pytest
+import yaml
 
 from dwarf_copier.configuration import (
     ConfigCopy,
@@ -17,6 +18,22 @@ from dwarf_copier.models.shots_info import ShotsInfo
 from dwarf_copier.models.source_directory import SourceDirectory
 
 
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Stop tests writing to the user's cache directory."""
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("DWARF_COPY_CACHE_PATH", str(cache))
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def report_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Stop tests writing reports to the user's directory."""
+    reports = tmp_path / "reports"
+    monkeypatch.setenv("DWARF_COPY_REPORT_PATH", str(reports))
+    return reports
+
+
 @pytest.fixture
 def anyio_backend() -> str:
     return "asyncio"
@@ -154,3 +171,10 @@ def state_dummy(
         format=format,
     )
     return state
+
+
+@pytest.fixture
+def config_file(tmp_path: Path, config_dummy: ConfigurationModel) -> Path:
+    path = tmp_path / "dwarf-copy.yml"
+    path.write_text(yaml.safe_dump(config_dummy.model_dump(mode="json")))
+    return path
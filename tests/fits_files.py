@@ -0,0 +1,32 @@
+"""Write small FITS files with chosen header cards for tests."""
+from pathlib import Path
+
+from dwarf_copier.models.frame_header import HeaderValue
+
+
+def card(keyword: str, value: HeaderValue, comment: str = "") -> str:
+    if isinstance(value, bool):
+        text = f"{'T' if value else 'F':>20}"
+    elif isinstance(value, str):
+        text = "'" + value.replace("'", "''").ljust(8) + "'"
+    else:
+        text = f"{value:>20}"
+    line = f"{keyword:<8}= {text}"
+    if comment:
+        line += f" / {comment}"
+    return f"{line:<80}"[:80]
+
+
+def header_bytes(cards: dict[str, HeaderValue]) -> bytes:
+    lines = [card("SIMPLE", True), card("BITPIX", 16), card("NAXIS", 2)]
+    lines += [card(k, v) for k, v in cards.items()]
+    lines.append(f"{'END':<80}")
+    text = "".join(lines)
+    return text.ljust(-(-len(text) // 2880) * 2880).encode("ascii")
+
+
+def write_fits(path: Path, cards: dict[str, HeaderValue], data_size: int = 0) -> None:
+    """Write a header followed by data_size bytes of pixel data."""
+    with path.open("wb") as f:
+        f.write(header_bytes(cards))
+        f.write(b"\0" * data_size)
@@ -0,0 +1,153 @@
+"""Minimal FTP server serving a local directory, stands in for the Dwarf in tests.
+
+Only the commands used by ftplib and the FTP driver are implemented. Every command
+received is recorded so tests can check how many round trips were made.
+"""
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path, PurePosixPath
+from typing import Iterator, Self
+
+
+def facts(path: Path) -> str:
+    st = path.stat()
+    modify = time.strftime("%Y%m%d%H%M%S", time.gmtime(st.st_mtime))
+    modify += f".{st.st_mtime_ns // 1_000_000 % 1000:03}"
+    kind = "dir" if path.is_dir() else "file"
+    return f"type={kind};size={st.st_size};modify={modify};"
+
+
+class Handler(socketserver.StreamRequestHandler):
+    server: "FTPServer"
+    cwd = PurePosixPath("/")
+    passive: socket.socket | None = None
+
+    def reply(self, text: str) -> None:
+        self.wfile.write(f"{text}\r\n".encode())
+
+    def local(self, arg: str) -> Path:
+        path = PurePosixPath("/") / self.cwd / arg
+        parts = [p for p in path.parts[1:] if p not in ("", ".")]
+        resolved: list[str] = []
+        for p in parts:
+            if p == "..":
+                if resolved:
+                    resolved.pop()
+            else:
+                resolved.append(p)
+        return self.server.root.joinpath(*resolved)
+
+    def data(self) -> Iterator[socket.socket]:
+        assert self.passive is not None
+        self.reply("150 Opening data connection")
+        conn, _ = self.passive.accept()
+        self.passive.close()
+        self.passive = None
+        with conn:
+            yield conn
+        self.reply("226 Transfer complete")
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        self.reply("220 Dwarf stand-in")
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            cmd, _, arg = line.partition(" ")
+            cmd = cmd.upper()
+            self.server.commands.append(line)
+            handler = getattr(self, f"cmd_{cmd.lower()}", None)
+            if handler is None:
+                self.reply(f"502 {cmd} not implemented")
+            elif handler(arg):
+                break
+
+    def cmd_user(self, arg: str) -> None:
+        self.reply("331 Password required")
+
+    def cmd_pass(self, arg: str) -> None:
+        self.reply("230 Logged in")
+
+    def cmd_type(self, arg: str) -> None:
+        self.reply("200 Type set")
+
+    def cmd_opts(self, arg: str) -> None:
+        self.reply("200 OK")
+
+    def cmd_noop(self, arg: str) -> None:
+        self.reply("200 OK")
+
+    def cmd_pwd(self, arg: str) -> None:
+        self.reply(f'257 "{self.cwd}"')
+
+    def cmd_cwd(self, arg: str) -> None:
+        if self.local(arg).is_dir():
+            self.cwd = PurePosixPath("/") / self.cwd / arg
+            self.reply("250 OK")
+        else:
+            self.reply("550 No such directory")
+
+    def cmd_pasv(self, arg: str) -> None:
+        self.passive = passive = socket.create_server(("127.0.0.1", 0))
+        host, port = passive.getsockname()
+        address = ",".join(host.split(".") + [str(port >> 8), str(port & 0xFF)])
+        self.reply(f"227 Entering Passive Mode ({address})")
+
+    def cmd_mlst(self, arg: str) -> None:
+        path = self.local(arg)
+        if not path.exists():
+            self.reply("550 No such file")
+            return
+        self.reply(f"250-Listing {arg}")
+        self.reply(f" {facts(path)} {arg}")
+        self.reply("250 End")
+
+    def cmd_mlsd(self, arg: str) -> None:
+        path = self.local(arg)
+        if not path.is_dir():
+            self.reply("550 No such directory")
+            return
+        for conn in self.data():
+            for p in sorted(path.iterdir()):
+                conn.sendall(f"{facts(p)} {p.name}\r\n".encode())
+
+    def cmd_retr(self, arg: str) -> None:
+        path = self.local(arg)
+        if not path.is_file():
+            self.reply("550 No such file")
+            return
+        self.server.retrieved.append(arg)
+        for conn in self.data():
+            with path.open("rb") as f:
+                while chunk := f.read(65536):
+                    conn.sendall(chunk)
+
+    def cmd_quit(self, arg: str) -> bool:
+        self.reply("221 Bye")
+        return True
+
+
+class FTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.commands: list[str] = []
+        self.retrieved: list[str] = []
+        self.connections = 0
+        super().__init__(("127.0.0.1", 0), Handler)
+
+    @property
+    def port(self) -> int:
+        port: int = self.server_address[1]
+        return port
+
+    def __enter__(self) -> Self:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.shutdown()
+        self.server_close()
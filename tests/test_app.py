@@ -39,3 +39,14 @@ async def test_app_run(mock_config: ConfigurationModel) -> None:
         assert isinstance(app_test.screen, QuitScreen)
         await pilot.press("q")
         assert app_test._exit
+
+
+async def test_search_screen(mock_config: ConfigurationModel) -> None:
+    from dwarf_copier.screens.search import SearchScreen
+
+    app_test = app.DwarfCopyApp()
+    async with app_test.run_test() as pilot:
+        await pilot.press("f")
+        assert isinstance(app_test.screen, SearchScreen)
+        await pilot.press("escape")
+        assert not isinstance(app_test.screen, SearchScreen)
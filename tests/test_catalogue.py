@@ -0,0 +1,129 @@
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from dwarf_copier.catalogue import Catalogue, Query, parse_query, select
+from dwarf_copier.configuration import ConfigurationModel
+from dwarf_copier.models.destination_directory import DestinationDirectory
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+@pytest.fixture
+def astronomy_source(test_folder: Path, tmp_path: Path) -> Path:
+    """A copy of the test data, so folders can be changed."""
+    path = tmp_path / "Astronomy"
+    shutil.copytree(test_folder / "data" / "Astronomy", path, symlinks=True)
+    return path
+
+
+@pytest.fixture
+def catalogue(config_dummy: ConfigurationModel, tmp_path: Path) -> Catalogue:
+    catalogue = Catalogue(tmp_path / "catalogue.sqlite")
+    assert catalogue.update_all(config_dummy) == 3
+    return catalogue
+
+
+def folders(catalogue: Catalogue, text: str) -> list[str]:
+    return [found.record.name for found in catalogue.search(parse_query(text))]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("m42", Query(target="m42")),
+        (
+            "2024-03",
+            Query(since=datetime(2024, 3, 1), before=datetime(2024, 4, 1)),
+        ),
+        (
+            "NGC 7000 2023-12-31",
+            Query(
+                target="NGC 7000",
+                since=datetime(2023, 12, 31),
+                before=datetime(2024, 1, 1),
+            ),
+        ),
+        ("2024-12", Query(since=datetime(2024, 12, 1), before=datetime(2025, 1, 1))),
+        ("exp:1/2 gain:80", Query(exp="1/2", gain=80)),
+        (
+            "at:Backup missing:Siril source:Card",
+            Query(source="Card", copied_to=["Backup"], missing_from=["Siril"]),
+        ),
+    ],
+)
+def test_parse_query(text: str, expected: Query) -> None:
+    assert parse_query(text) == expected
+
+
+@pytest.mark.parametrize("text", ["gain:high", "exp:long", "2024-13"])
+def test_parse_query_invalid(text: str) -> None:
+    with pytest.raises(ValueError):
+        parse_query(text)
+
+
+def test_search(catalogue: Catalogue) -> None:
+    assert folders(catalogue, "M1") == [M1]
+    assert folders(catalogue, "m4?") == [
+        "DWARF_RAW_M43_EXP_5_GAIN_60_2024-01-22-19-04-10-409"
+    ]
+    assert folders(catalogue, "exp:15 gain:80") == [M1]
+    assert folders(catalogue, "2024-01-16") == [
+        "DWARF_RAW_Moon_EXP_0.0025_GAIN_0_2024-01-16-15-02-35-270"
+    ]
+    assert folders(catalogue, "Moon 2024-02") == []
+    assert catalogue.search(parse_query(""), limit=2)[0].source == "TestEnv"
+
+
+def test_update_changed_only(
+    catalogue: Catalogue, config_dummy: ConfigurationModel, astronomy_source: Path
+) -> None:
+    assert catalogue.update_all(config_dummy) == 0
+
+    os.utime(astronomy_source / M1, ns=(0, 0))
+    shutil.rmtree(
+        astronomy_source / "DWARF_RAW_M43_EXP_5_GAIN_60_2024-01-22-19-04-10-409"
+    )
+    assert catalogue.update_all(config_dummy) == 1
+    assert catalogue.count() == 2
+
+
+def test_unavailable_source_kept(
+    catalogue: Catalogue, config_dummy: ConfigurationModel, tmp_path: Path
+) -> None:
+    config_dummy.sources[0].path = tmp_path / "not-inserted"
+    assert catalogue.update_all(config_dummy) == 0
+    assert catalogue.count() == 3
+
+
+def test_copies(catalogue: Catalogue, config_dummy: ConfigurationModel) -> None:
+    found = catalogue.search(parse_query("M1 exp:15"))[0]
+    backup = config_dummy.get_target("Backup")
+    session = DestinationDirectory(
+        found.record.session(), backup, config_dummy.get_format("Backup")
+    )
+    session.destination.mkdir(parents=True)
+    assert found.copied_to == ()
+
+    catalogue.update_all(config_dummy)
+    assert folders(catalogue, "at:Backup") == [M1]
+    assert folders(catalogue, "at:Backup missing:Siril") == [M1]
+    assert M1 not in folders(catalogue, "missing:Backup")
+    assert catalogue.search(parse_query("M1 exp:15"))[0].copied_to == ("Backup",)
+
+
+@pytest.mark.parametrize(
+    "text,index",
+    [
+        ("M42", "sessions_target"),
+        ("2024-03", "sessions_date"),
+        ("exp:15 gain:80", "sessions_exp_gain"),
+    ],
+)
+def test_search_uses_index(catalogue: Catalogue, text: str, index: str) -> None:
+    sql, params = select(parse_query(text))
+    plan = catalogue.db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    assert any(index in row[-1] for row in plan)
@@ -0,0 +1,206 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier import cli, pipeline
+from dwarf_copier.configuration import ConfigurationModel
+from dwarf_copier.drivers import aio, disk
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+def events(output: str) -> list[dict]:
+    return [json.loads(line) for line in output.splitlines()]
+
+
+def test_copy(
+    config_file: Path,
+    config_dummy: ConfigurationModel,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    result = cli.main(args + ["--target", "Backup", "--select", "M1"])
+
+    assert result == 0
+    output = events(capsys.readouterr().out)
+    assert output[0] == {
+        "event": "start",
+        "source": "TestEnv",
+        "target": "Backup",
+        "sessions": 1,
+    }
+    assert output[-1] == {"event": "finished", "sessions": 1, "errors": 0}
+    assert [e["status"] for e in output if e["event"] == "session"] == [
+        "start",
+        "done",
+    ]
+    target = config_dummy.get_target("Backup").path
+    session = target / "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+    assert (session / "0000.fits").exists()
+    assert (session / "shotsInfo.json").exists()
+
+    # A second run skips the session that has already been copied.
+    assert cli.main(args + ["--target", "Backup", "--select", "M1"]) == 0
+    assert events(capsys.readouterr().out)[0]["sessions"] == 0
+
+
+def test_copy_since_siril(
+    config_file: Path,
+    config_dummy: ConfigurationModel,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    assert cli.main(args + ["--target", "Siril", "--since", "2024-01-20"]) == 0
+
+    output = events(capsys.readouterr().out)
+    assert output[0]["sessions"] == 1
+    siril = config_dummy.get_target("Siril").path
+    assert (siril / "_EXP_5_GAIN_60_2024_01_22" / "lights" / "0000.fits").exists()
+    assert (siril / "_EXP_5_GAIN_60_2024_01_22" / "darks").is_dir()
+
+
+def test_copy_without_textual(config_file: Path) -> None:
+    code = (
+        "import sys; from dwarf_copier import cli; "
+        f"cli.main(['--config', {str(config_file)!r}, 'copy', '--source', 'TestEnv',"
+        " '--target', 'Backup']); "
+        "assert not [m for m in sys.modules if m.startswith('textual')]"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert events(result.stdout)[-1]["errors"] == 0
+
+
+def test_copy_frames(
+    config_file: Path,
+    config_dummy: ConfigurationModel,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    reject = tmp_path / "reject.txt"
+    reject.write_text("0000.fits\n")
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    args += ["--target", "Backup", "--select", "M1", "--reject", str(reject)]
+    assert cli.main(args) == 0
+
+    target = config_dummy.get_target("Backup").path
+    session = target / "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+    assert not (session / "0000.fits").exists()
+    assert (session / "0001.fits").exists()
+    assert (session / "shotsInfo.json").exists()
+
+    with pytest.raises(SystemExit):
+        cli.main(args + ["--frames", "x"])
+
+    # A reject list belongs to one session, M43 and Moon are still to be copied.
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    args += ["--target", "Backup", "--reject", str(reject)]
+    with pytest.raises(SystemExit, match="2 selected"):
+        cli.main(args)
+    args[2] = "watch"
+    with pytest.raises(SystemExit):
+        cli.main(args)
+
+
+def test_watch_error(
+    config_file: Path,
+    config_dummy: ConfigurationModel,
+    mocker: MockFixture,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    make_skeleton = mocker.patch.object(
+        pipeline, "make_skeleton", side_effect=OSError(28, "No space left on device")
+    )
+    # Poll four times: the session settles, fails, settles again and fails again.
+    mocker.patch.object(
+        cli.time, "sleep", side_effect=[None, None, None, KeyboardInterrupt]
+    )
+    args = ["--config", str(config_file), "watch", "--source", "TestEnv"]
+    args += ["--target", "Backup", "--select", "M1", "--settle", "0"]
+    assert cli.main(args) == 1
+
+    assert make_skeleton.call_count == 2
+    output = events(capsys.readouterr().out)
+    errors = [e for e in output if e["event"] == "error"]
+    assert [Path(e["source"]).name for e in errors] == [M1, M1]
+    assert "No space left" in errors[0]["error"]
+    assert output[-1] == {"event": "finished", "errors": 2}
+    assert not (config_dummy.get_target("Backup").path / M1).exists()
+
+
+def test_copy_fan_out(
+    config_file: Path,
+    config_dummy: ConfigurationModel,
+    astronomy_source: Path,
+    mocker: MockFixture,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    copy_file = mocker.spy(disk.Driver, "copy_file")
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    args += ["--target", "Backup", "--target", "Siril", "--select", "M1"]
+    assert cli.main(args) == 0
+
+    output = events(capsys.readouterr().out)
+    assert output[0]["target"] == "Backup,Siril"
+    assert [e["status"] for e in output if e["event"] == "session"] == [
+        "start",
+        "done",
+        "done",
+    ]
+    backup = config_dummy.get_target("Backup").path / M1
+    siril = config_dummy.get_target("Siril").path / "_EXP_15_GAIN_80_2024_01_18"
+    assert (siril / "lights" / "0000.fits").read_bytes() == (
+        backup / "0000.fits"
+    ).read_bytes()
+    # Each source file was read once, Siril was copied from the backup.
+    sources = [c.args[1] for c in copy_file.call_args_list]
+    from_card = [p for p in sources if p.is_relative_to(astronomy_source)]
+    assert sorted(p.name for p in from_card) == sorted(p.name for p in backup.iterdir())
+    assert len(sources) > len(from_card)
+
+
+def test_copy_transfers(
+    config_file: Path,
+    config_dummy: ConfigurationModel,
+    astronomy_source: Path,
+    mocker: MockFixture,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    copy_all = mocker.spy(aio, "copy_all")
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    args += ["--target", "Backup", "--select", "M1", "--transfers", "3"]
+    assert cli.main(args) == 0
+
+    assert copy_all.call_count == 1
+    assert copy_all.call_args.args[2] == 3
+    assert events(capsys.readouterr().out)[-1]["errors"] == 0
+    backup = config_dummy.get_target("Backup").path / M1
+    for frame in (astronomy_source / M1).glob("*.fits"):
+        assert (backup / frame.name).read_bytes() == frame.read_bytes()
+
+
+def test_search(
+    config_file: Path,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    mocker: MockFixture,
+) -> None:
+    recover = mocker.spy(cli, "recover")
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    assert cli.main(args + ["--target", "Backup", "--select", "M1"]) == 0
+    capsys.readouterr()
+    assert recover.call_count == 1
+
+    args = ["--config", str(config_file), "search", "m1", "2024-01"]
+    assert cli.main(args + ["--catalogue", str(tmp_path / "catalogue.sqlite")]) == 0
+    (found,) = events(capsys.readouterr().out)
+    assert found["event"] == "found"
+    assert Path(found["path"]).name == M1
+    assert found["copied_to"] == ["Backup"]
+    # Searching never touches interrupted copies.
+    assert recover.call_count == 1
@@ -0,0 +1,60 @@
+import gzip
+from pathlib import Path
+
+import pytest
+
+from dwarf_copier.configuration import (
+    Compression,
+    ConfigSource,
+    ConfigSourceMTP,
+    ConfigurationModel,
+)
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.pipeline import Progress, SessionRunner
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+def copy_m1(source: ConfigSource, config: ConfigurationModel) -> tuple[Path, bool]:
+    format = config.get_format("Backup")
+    format.compress = Compression.GZIP
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    destination = DestinationDirectory(session, config.get_target("Backup"), format)
+    progress: list[Progress] = []
+    with SessionRunner(source, 2, progress.append) as runner:
+        ok = runner.copy(destination)
+    assert [p.error for p in progress if p.error is not None] == []
+    return destination.destination, ok
+
+
+@pytest.mark.parametrize("remote", [False, True])
+def test_compress_fits(
+    config_dummy: ConfigurationModel,
+    astronomy_source: Path,
+    test_folder: Path,
+    remote: bool,
+) -> None:
+    source: ConfigSource = config_dummy.get_source("TestEnv")
+    if remote:
+        # Files that cannot be read directly are copied and then compressed.
+        source = ConfigSourceMTP(
+            name="USB", device=str(test_folder / "data"), path=Path("/Astronomy")
+        )
+    destination, ok = copy_m1(source, config_dummy)
+
+    assert ok
+    assert sorted(p.name for p in destination.iterdir()) == [
+        "0000.fits.gz",
+        "0001.fits.gz",
+        "shotsInfo.json",
+        "stacked-16.png",
+        "stacked.jpg",
+        "stacked_thumbnail.jpg",
+    ]
+    for name in ("0000.fits", "0001.fits"):
+        original = (astronomy_source / M1 / name).read_bytes()
+        assert gzip.decompress((destination / f"{name}.gz").read_bytes()) == original
+    assert (destination / "shotsInfo.json").read_bytes() == (
+        astronomy_source / M1 / "shotsInfo.json"
+    ).read_bytes()
@@ -1,5 +1,8 @@
 # pylint: disable=redefined-outer-name,missing-module-docstring,missing-function-docstring
 import json
+import os
+import subprocess
+import sys
 from pathlib import Path
 from string import Template
 
@@ -43,3 +46,29 @@ def test_save_config(config_file: Path, config_json: dict) -> None:
     config = load_config(name=config_file.name, search_path=[str(config_file.parent)])
     actual = config.model_dump_json(exclude_unset=True)
     assert json.loads(actual.replace("\\", "/")) == expected
+
+
+def test_config_cache(config_file: Path, cache_path: Path) -> None:
+    config = load_config(name=config_file.name, search_path=[str(config_file.parent)])
+    cached = list(cache_path.glob("config-*.json"))
+    assert len(cached) == 1
+
+    # A stale cache entry is ignored once the file changes.
+    text = config_file.read_text().replace('"theme":"dark"', '"theme":"light"')
+    config_file.write_text(text)
+    os.utime(config_file, ns=(1, 1))
+    reloaded = load_config(name=config_file.name, search_path=[str(config_file.parent)])
+    assert config.general.theme == "dark"
+    assert reloaded.general.theme == "light"
+
+
+def test_config_is_lazy(config_file: Path) -> None:
+    """Importing the module must not load the configuration."""
+    config_file.write_text("general: [not, valid]")
+    env = dict(
+        os.environ,
+        DWARF_COPY_CONFIG_PATH=str(config_file.parent),
+        DWARF_COPY_CONFIG_FILENAME=config_file.name,
+    )
+    code = "import dwarf_copier.configuration as c; assert 'config' not in vars(c)"
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
@@ -0,0 +1,160 @@
+import json
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+import yaml
+from pytest_mock import MockFixture
+
+from dwarf_copier import cli
+from dwarf_copier.catalogue import CATALOGUE_FILE, Catalogue
+from dwarf_copier.configuration import ConfigSourceDrive, ConfigurationModel
+from dwarf_copier.dedup import SourceChooser, stream_throughput
+from dwarf_copier.report import FileRecord, FileTiming, RunReport
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+@pytest.fixture
+def mirror(config_dummy: ConfigurationModel, tmp_path: Path) -> ConfigSourceDrive:
+    """A second source holding a copy of the test sessions."""
+    path = tmp_path / "mirror" / "Astronomy"
+    shutil.copytree(config_dummy.get_source("TestEnv").path, path, symlinks=True)
+    source = ConfigSourceDrive(name="Mirror", path=path)
+    config_dummy.sources.append(source)
+    return source
+
+
+@pytest.fixture
+def catalogue(
+    config_dummy: ConfigurationModel, mirror: ConfigSourceDrive, cache_path: Path
+) -> Catalogue:
+    catalogue = Catalogue(cache_path / CATALOGUE_FILE)
+    catalogue.update_all(config_dummy)
+    return catalogue
+
+
+def test_fingerprint(
+    config_dummy: ConfigurationModel, mirror: ConfigSourceDrive
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    original = source.driver.fingerprint(source.path / M1)
+    assert mirror.driver.fingerprint(mirror.path / M1) == original
+
+    (mirror.path / M1 / "extra.fits").write_bytes(b"x")
+    assert mirror.driver.fingerprint(mirror.path / M1) != original
+
+
+def test_stream_throughput() -> None:
+    run = RunReport()
+    for source, size, busy in [("/card/a", 100, 2.0), ("/card/b", 300, 2.0)]:
+        timing = FileTiming(transfer=busy)
+        run.files.append(FileRecord(source, "/dest", "copy", size, "w", 0.0, timing))
+    run.files.append(
+        FileRecord("/nas/c", "/dest", "copy", 1000, "w", 0.0, FileTiming(transfer=1))
+    )
+    assert stream_throughput(run, Path("/card")) == 100.0
+    assert stream_throughput(run, Path("/usb")) is None
+
+
+def test_choose_fastest(
+    config_dummy: ConfigurationModel, mirror: ConfigSourceDrive, catalogue: Catalogue
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    chooser = SourceChooser(catalogue, config_dummy.sources)
+
+    catalogue.record_throughput("TestEnv", 20e6)
+    catalogue.record_throughput("Mirror", 100e6)
+    chosen, chosen_session = chooser.choose(source, session)
+    assert chosen is mirror
+    assert chosen_session.path == mirror.path / M1
+    assert chosen_session.info == session.info
+
+    # The copy is checked again before it is used.
+    (mirror.path / M1 / "0000.fits").unlink()
+    assert chooser.choose(source, session)[0] is source
+
+
+def test_choose_unmeasured(
+    config_dummy: ConfigurationModel,
+    mirror: ConfigSourceDrive,
+    catalogue: Catalogue,
+    mocker: MockFixture,
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    copy_file = source.driver.copy_file
+
+    def slow_card(src: Path, dest: Path) -> int:
+        time.sleep(0.05)
+        return copy_file(src, dest)
+
+    mocker.patch.object(source.driver, "copy_file", slow_card)
+    chooser = SourceChooser(catalogue, config_dummy.sources)
+
+    # Neither source was read before, each is timed reading a frame.
+    assert chooser.choose(source, session)[0] is mirror
+    card, backup = catalogue.throughput("TestEnv"), catalogue.throughput("Mirror")
+    assert card is not None and backup is not None
+    assert card < backup
+    # Only probed once.
+    assert chooser.choose(source, session)[0] is mirror
+    assert catalogue.throughput("TestEnv") == card
+
+
+def test_record_throughput_average(catalogue: Catalogue) -> None:
+    catalogue.record_throughput("Mirror", 100.0)
+    catalogue.record_throughput("Mirror", 50.0)
+    assert catalogue.throughput("Mirror") == 75.0
+    assert catalogue.throughput("TestEnv") is None
+
+
+def test_copy_reads_fastest_source(
+    config_dummy: ConfigurationModel,
+    mirror: ConfigSourceDrive,
+    catalogue: Catalogue,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    catalogue.record_throughput("Mirror", 100e6)
+    catalogue.close()
+    config_file = tmp_path / "dwarf-copy.yml"
+    config_file.write_text(yaml.safe_dump(config_dummy.model_dump(mode="json")))
+
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv", "--dedup"]
+    assert cli.main(args + ["--target", "Backup", "--select", "M1"]) == 0
+
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert {"event": "dedup", "session": M1, "source": "Mirror"} in events
+    backup = config_dummy.get_target("Backup").path / M1
+    assert (backup / "0000.fits").read_bytes() == (
+        mirror.path / M1 / "0000.fits"
+    ).read_bytes()
+    with Catalogue(tmp_path / "cache" / CATALOGUE_FILE) as catalogue:
+        # The measurement from this copy is averaged in.
+        assert catalogue.throughput("Mirror") != 100e6
+
+
+def test_copy_without_dedup(
+    config_dummy: ConfigurationModel,
+    mirror: ConfigSourceDrive,
+    catalogue: Catalogue,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    catalogue.record_throughput("Mirror", 100e6)
+    catalogue.close()
+    config_file = tmp_path / "dwarf-copy.yml"
+    config_file.write_text(yaml.safe_dump(config_dummy.model_dump(mode="json")))
+
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    assert cli.main(args + ["--target", "Backup", "--select", "M1"]) == 0
+    assert '"dedup"' not in capsys.readouterr().out
+    with Catalogue(tmp_path / "cache" / CATALOGUE_FILE) as catalogue:
+        # Nothing was measured.
+        assert catalogue.throughput("Mirror") == 100e6
+        assert catalogue.throughput("TestEnv") is None
@@ -0,0 +1,128 @@
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier import journal
+from dwarf_copier.configuration import ConfigFormat
+from dwarf_copier.drivers import aio, disk
+from dwarf_copier.model import CopyCommand
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+from dwarf_copier.pipeline import FileCommand, Progress
+
+pytestmark = pytest.mark.anyio
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+async def test_list_sessions(
+    astronomy_source: Path, source_directories: list[SourceDirectory]
+) -> None:
+    driver = aio.adapt(disk.Driver(astronomy_source))
+    sessions = [s async for s in driver.list_sessions()]
+    assert sessions == source_directories
+
+
+async def test_list_sessions_stop_early(astronomy_source: Path) -> None:
+    driver = aio.ThreadedDriver(disk.Driver(astronomy_source), buffer=1)
+    async for session in driver.list_sessions():
+        break
+    assert session.info.target == "M1"
+
+
+async def test_list_sessions_error(astronomy_source: Path, mocker: MockFixture) -> None:
+    sync_driver = disk.Driver(astronomy_source)
+    mocker.patch.object(sync_driver, "create_session", side_effect=PermissionError)
+    with pytest.raises(PermissionError):
+        [s async for s in aio.adapt(sync_driver).list_sessions()]
+
+
+async def test_copy_file(astronomy_source: Path, tmp_path: Path) -> None:
+    driver = aio.adapt(disk.Driver(astronomy_source))
+    source = next(astronomy_source.glob("*/0000.fits"))
+    assert await driver.copy_file(source, tmp_path / "copy.fits") == (
+        source.stat().st_size
+    )
+    await driver.link_file(source, tmp_path / "link.fits")
+    assert (tmp_path / "link.fits").resolve() == source
+    with pytest.raises(FileNotFoundError):
+        await driver.copy_file(astronomy_source / "missing.fits", tmp_path / "x")
+
+
+class SlowDriver(aio.ThreadedDriver):
+    """Native copies, counting how many are waiting at once."""
+
+    active = peak = 0
+
+    async def copy_file(self, src: Path, dest: Path) -> int:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return await asyncio.to_thread(self.driver.copy_file, src, dest)
+
+
+class NativeDriver(aio.AsyncDriver):
+    """An async driver that isn't wrapping a synchronous one."""
+
+    def __init__(self, driver: SlowDriver) -> None:
+        self.slow = driver
+
+    def list_sessions(self) -> AsyncIterator[SourceDirectory]:
+        return self.slow.list_sessions()
+
+    async def create_session(self, p: Path) -> SourceDirectory | None:
+        return await self.slow.create_session(p)
+
+    async def prepare(
+        self, format: ConfigFormat, session: DestinationDirectory, target_path: Path
+    ) -> tuple[list[Path], dict[Path, str], dict[Path, str]]:
+        return await self.slow.prepare(format, session, target_path)
+
+    async def copy_file(self, src: Path, dest: Path) -> int:
+        return await self.slow.copy_file(src, dest)
+
+    async def link_file(self, src: Path, dest: Path) -> None:
+        await self.slow.link_file(src, dest)
+
+    async def match_wildcards(self, base: Path, filename: str) -> list[Path]:
+        return await self.slow.match_wildcards(base, filename)
+
+
+def copies(source: Path, tmp_path: Path) -> list[FileCommand]:
+    frames = sorted(source.glob("*.fits"))
+    return [
+        CopyCommand(
+            source=frame,
+            dest=tmp_path / frame.name,
+            source_folder=source,
+            working_folder=tmp_path,
+        )
+        for frame in [*frames, source / "missing.fits"]
+    ]
+
+
+@pytest.mark.parametrize("native", [False, True])
+async def test_copy_all(astronomy_source: Path, tmp_path: Path, native: bool) -> None:
+    source = astronomy_source / M1
+    slow = SlowDriver(disk.Driver(astronomy_source))
+    driver: aio.AsyncDriver = NativeDriver(slow) if native else aio.adapt(slow.driver)
+    commands = copies(source, tmp_path)
+    progress: list[Progress] = []
+
+    await aio.copy_all(driver, commands, 2, progress.append)
+
+    assert sorted(p.action.dest for p in progress) == sorted(c.dest for c in commands)
+    (failed,) = [p for p in progress if p.error is not None]
+    assert failed.action.source.name == "missing.fits"
+    for p in progress:
+        if p.error is None:
+            assert p.action.dest.read_bytes() == p.action.source.read_bytes()
+            # Marked as complete, so a resumed copy keeps it, unless the source
+            # can't be read directly.
+            assert journal.is_copied(p.action.source, p.action.dest) is not native
+    if native:
+        assert slow.peak == 2
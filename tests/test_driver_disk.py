@@ -1,3 +1,5 @@
+import errno
+import os
 from datetime import datetime
 from pathlib import Path
 from typing import Callable
@@ -7,11 +9,14 @@ from pytest_mock import MockFixture
 from textual import work
 from textual.app import App
 
-from dwarf_copier.configuration import BaseDriver
+from dwarf_copier.configuration import BaseDriver, ConfigurationModel
 from dwarf_copier.drivers import disk
+from dwarf_copier.models.destination_directory import DestinationDirectory
 from dwarf_copier.models.shots_info import ShotsInfo
 from dwarf_copier.models.source_directory import SourceDirectory
 
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
 pytestmark = pytest.mark.anyio
 
 
@@ -118,3 +123,50 @@ async def test_list_dirs(
         await worker.wait()
 
     assert callback.call_args_list == expected
+
+
+@pytest.mark.skipif(not disk.SEQUENTIAL_HINTS, reason="Linux only")
+@pytest.mark.parametrize("size", [0, 100, disk.CHUNK_SIZE * 2 + 1234])
+def test_copy_sequential(tmp_path: Path, mocker: MockFixture, size: int) -> None:
+    data = os.urandom(size)
+    src = tmp_path / "src.fits"
+    src.write_bytes(data)
+    fallocate = mocker.spy(os, "posix_fallocate")
+    fadvise = mocker.spy(os, "posix_fadvise")
+
+    assert disk.Driver(tmp_path).copy_file(src, tmp_path / "dest.fits") == size
+    assert (tmp_path / "dest.fits").read_bytes() == data
+    assert fallocate.call_count == (size >= disk.PREALLOCATE_SIZE)
+    advice = [c.args[3] for c in fadvise.call_args_list]
+    assert advice[0] == os.POSIX_FADV_SEQUENTIAL
+    assert advice.count(os.POSIX_FADV_DONTNEED) == 2 * -(-size // disk.CHUNK_SIZE)
+
+
+@pytest.mark.skipif(not disk.SEQUENTIAL_HINTS, reason="Linux only")
+def test_copy_sequential_fallbacks(tmp_path: Path, mocker: MockFixture) -> None:
+    data = os.urandom(disk.PREALLOCATE_SIZE)
+    src = tmp_path / "src.fits"
+    src.write_bytes(data)
+    # Neither preallocation nor sendfile are essential.
+    mocker.patch.object(os, "posix_fallocate", side_effect=OSError(errno.EOPNOTSUPP))
+    mocker.patch.object(os, "sendfile", side_effect=OSError(errno.EINVAL, "sendfile"))
+
+    assert disk.copy_sequential(src, tmp_path / "dest.fits") == len(data)
+    assert (tmp_path / "dest.fits").read_bytes() == data
+
+
+def test_file_maps(config_dummy: ConfigurationModel, tmp_path: Path) -> None:
+    source = config_dummy.get_source("TestEnv")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    destination = DestinationDirectory(
+        session, config_dummy.get_target("Siril"), config_dummy.get_format("Siril")
+    )
+    names = ["0001.fits", "0000.fits", ".0002.fits", "shotsInfo.json", "stacked.jpg"]
+    mkdirs, links, copies = disk.file_maps(destination, names, tmp_path)
+    assert tmp_path / "lights" in mkdirs
+    maps = {**links, **copies}
+    # Hidden files are left out, each file is copied or linked once.
+    assert sorted(p.name for p in maps) == sorted(names[:2] + names[3:])
+    assert maps[session.path / "0000.fits"] == "lights/0000.fits"
+    assert len(links) + len(copies) == len(maps)
@@ -0,0 +1,144 @@
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier.configuration import ConfigSourceFTP, ConfigurationModel
+from dwarf_copier.drivers import ftp
+from dwarf_copier.model import CopyCommand
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+from dwarf_copier.pipeline import run_command
+from tests.ftp_server import FTPServer
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+@pytest.fixture
+def server(test_folder: Path) -> Iterator[FTPServer]:
+    with FTPServer(test_folder / "data") as server:
+        yield server
+
+
+@pytest.fixture
+def driver(server: FTPServer, cache_path: Path) -> Iterator[ftp.Driver]:
+    driver = ftp.Driver(
+        Path("/Astronomy"), "127.0.0.1", port=server.port, cache_dir=cache_path
+    )
+    yield driver
+    driver.pool.close()
+
+
+def list_dirs(driver: ftp.Driver) -> list[SourceDirectory]:
+    sessions: list[SourceDirectory] = []
+    driver.list_dirs(lambda s: sessions.append(s) if s is not None else None)
+    return sessions
+
+
+def test_list_dirs(
+    driver: ftp.Driver, server: FTPServer, source_directories: list[SourceDirectory]
+) -> None:
+    sessions = list_dirs(driver)
+
+    assert [(s.path.name, s.info, s.date) for s in sessions] == [
+        (s.path.name, s.info, s.date) for s in source_directories
+    ]
+    assert all(s.path.parent == Path("/Astronomy") for s in sessions)
+    assert len(server.retrieved) == 3
+
+
+def test_list_dirs_cached(
+    driver: ftp.Driver, server: FTPServer, cache_path: Path
+) -> None:
+    list_dirs(driver)
+    server.retrieved.clear()
+
+    # A new driver (i.e. next run of the app) still avoids downloading shotsInfo.
+    again = ftp.Driver(
+        Path("/Astronomy"), "127.0.0.1", port=server.port, cache_dir=cache_path
+    )
+    assert len(list_dirs(again)) == 3
+    assert server.retrieved == []
+    again.pool.close()
+
+
+def test_create_session(driver: ftp.Driver) -> None:
+    session = driver.create_session(Path("/Astronomy") / M1)
+    assert session is not None
+    assert session.info.target == "M1"
+    assert driver.create_session(Path("/Astronomy/DWARF_DARK")) is None
+    assert driver.create_session(Path("/Astronomy/missing")) is None
+
+
+def test_match_wildcards(driver: ftp.Driver) -> None:
+    base = Path("/Astronomy")
+    assert driver.match_wildcards(base, "DWARF_DARK/exp_*_bin_1") == [
+        base / "DWARF_DARK/exp_15_gain_80_bin_1",
+        base / "DWARF_DARK/exp_5_gain_60_bin_1",
+    ]
+    assert driver.match_wildcards(base / "DWARF_DARK", "../DWARF_RAW_EXP_*") == [
+        base / "DWARF_RAW_EXP_5_GAIN_60_2024-02-24-22-31-52-161"
+    ]
+
+
+def test_copy_reuses_connections(
+    driver: ftp.Driver,
+    server: FTPServer,
+    config_dummy: ConfigurationModel,
+    tmp_path: Path,
+    test_folder: Path,
+) -> None:
+    session = driver.create_session(Path("/Astronomy") / M1)
+    assert session is not None
+    target = config_dummy.get_target("Backup")
+    destination = DestinationDirectory(
+        session, target, config_dummy.get_format("Backup")
+    )
+    _, links, copies = driver.prepare(destination.config_format, destination, tmp_path)
+    assert links == {}
+    assert sorted(p.name for p in copies) == [
+        "0000.fits",
+        "0001.fits",
+        "shotsInfo.json",
+        "stacked-16.png",
+        "stacked.jpg",
+        "stacked_thumbnail.jpg",
+    ]
+
+    for src, name in copies.items():
+        size = driver.copy_file(src, tmp_path / name)
+        assert size == (tmp_path / name).stat().st_size
+        local = test_folder / "data" / src.relative_to("/")
+        assert (tmp_path / name).read_bytes() == local.read_bytes()
+
+    assert server.connections == 1
+
+
+def test_config_driver(server: FTPServer) -> None:
+    source = ConfigSourceFTP(
+        name="WiFi", ip_address="127.0.0.1", port=server.port, path=Path("/Astronomy")
+    )
+    assert isinstance(source.driver, ftp.Driver)
+    assert source.driver.create_session(Path("/Astronomy") / M1) is not None
+
+
+def test_missing_file(
+    driver: ftp.Driver, server: FTPServer, tmp_path: Path, mocker: MockFixture
+) -> None:
+    command = CopyCommand(
+        source=Path("/Astronomy") / M1 / "missing.fits",
+        dest=tmp_path / "missing.fits",
+        source_folder=Path("/Astronomy") / M1,
+        working_folder=tmp_path,
+    )
+    with pytest.raises(OSError, match="550"):
+        driver.copy_file(command.source, command.dest)
+    # Reported against the file, the worker carries on with the same connection.
+    progress = run_command(driver, command)
+    assert isinstance(progress.error, OSError)
+    assert server.connections == 1
+
+    mocker.patch.object(driver, "copy_file", side_effect=BrokenProcessPool())
+    assert isinstance(run_command(driver, command).error, BrokenProcessPool)
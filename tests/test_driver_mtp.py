@@ -0,0 +1,122 @@
+from pathlib import Path
+
+import pytest
+
+from dwarf_copier.configuration import ConfigSourceMTP, ConfigurationModel
+from dwarf_copier.drivers import disk, mtp
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.source_directory import SourceDirectory
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+@pytest.fixture
+def transport(test_folder: Path) -> mtp.FilesystemTransport:
+    return mtp.FilesystemTransport(test_folder / "data")
+
+
+@pytest.fixture
+def driver(transport: mtp.FilesystemTransport) -> mtp.Driver:
+    return mtp.Driver(Path("/Astronomy"), transport)
+
+
+def list_dirs(driver: mtp.Driver) -> list[SourceDirectory]:
+    sessions: list[SourceDirectory] = []
+    driver.list_dirs(lambda s: sessions.append(s) if s is not None else None)
+    return sessions
+
+
+def test_list_dirs(
+    driver: mtp.Driver,
+    transport: mtp.FilesystemTransport,
+    source_directories: list[SourceDirectory],
+    astronomy_source: Path,
+) -> None:
+    sessions = list_dirs(driver)
+
+    assert [(s.path.name, s.info, s.date) for s in sessions] == [
+        (s.path.name, s.info, s.date) for s in source_directories
+    ]
+    assert all(s.path.parent == Path("/Astronomy") for s in sessions)
+    # Storage root, Astronomy, a listing of each session folder and a read of each
+    # shotsInfo.json.
+    folders = [p for p in astronomy_source.iterdir() if disk.FOLDER_REGEX.match(p.name)]
+    assert transport.requests == 2 + len(folders) + len(sessions)
+
+
+def test_create_session(driver: mtp.Driver) -> None:
+    session = driver.create_session(Path("/Astronomy") / M1)
+    assert session is not None
+    assert session.info.target == "M1"
+    assert driver.create_session(Path("/Astronomy/DWARF_DARK")) is None
+    assert driver.create_session(Path("/Astronomy/missing")) is None
+    assert driver.create_session(Path("/missing") / M1) is None
+
+
+def test_match_wildcards(driver: mtp.Driver) -> None:
+    base = Path("/Astronomy")
+    assert driver.match_wildcards(base, "DWARF_DARK/exp_*_bin_1") == [
+        base / "DWARF_DARK/exp_15_gain_80_bin_1",
+        base / "DWARF_DARK/exp_5_gain_60_bin_1",
+    ]
+    assert driver.match_wildcards(base / "DWARF_DARK", "../DWARF_RAW_EXP_*") == [
+        base / "DWARF_RAW_EXP_5_GAIN_60_2024-02-24-22-31-52-161"
+    ]
+
+
+def test_prepare_and_copy(
+    driver: mtp.Driver,
+    transport: mtp.FilesystemTransport,
+    config_dummy: ConfigurationModel,
+    astronomy_source: Path,
+    tmp_path: Path,
+) -> None:
+    session = driver.create_session(Path("/Astronomy") / M1)
+    assert session is not None
+    destination = DestinationDirectory(
+        session, config_dummy.get_target("Siril"), config_dummy.get_format("Siril")
+    )
+    mkdirs, links, copies = driver.prepare(
+        destination.config_format, destination, tmp_path
+    )
+
+    # Same plan as for the files on a card.
+    local = disk.Driver(astronomy_source).create_session(astronomy_source / M1)
+    assert local is not None
+    expected = disk.Driver(astronomy_source).prepare(
+        destination.config_format,
+        DestinationDirectory(
+            local, config_dummy.get_target("Siril"), destination.config_format
+        ),
+        tmp_path,
+    )
+    assert mkdirs == expected[0]
+    assert {p.name: name for p, name in links.items()} == {
+        p.name: name for p, name in expected[1].items()
+    }
+    assert copies == {}
+
+    requests = transport.requests
+    for src, name in links.items():
+        size = driver.copy_file(src, tmp_path / src.name)
+        assert size == (tmp_path / src.name).stat().st_size
+        assert (tmp_path / src.name).read_bytes() == (
+            astronomy_source / M1 / src.name
+        ).read_bytes()
+    # Listings are cached so each copy is a single streamed read.
+    assert transport.requests == requests + len(links)
+
+    with pytest.raises(FileNotFoundError):
+        driver.copy_file(Path("/Astronomy") / M1 / "missing.fits", tmp_path / "x")
+
+
+def test_config_driver(test_folder: Path) -> None:
+    source = ConfigSourceMTP(
+        name="USB", device=str(test_folder / "data"), path=Path("/Astronomy")
+    )
+    assert source.type == "MTP"
+    assert isinstance(source.driver, mtp.Driver)
+    assert source.driver.create_session(Path("/Astronomy") / M1) is not None
+
+    with pytest.raises(FileNotFoundError):
+        ConfigSourceMTP(name="USB", device="", path=Path("/Astronomy")).driver
@@ -0,0 +1,88 @@
+import os
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier import durability
+from dwarf_copier.configuration import ConfigurationModel, Durability
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.pipeline import Progress, SessionRunner
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+def test_sync_tree(tmp_path: Path, mocker: MockFixture) -> None:
+    (tmp_path / "lights").mkdir()
+    (tmp_path / "a.fits").write_bytes(b"a")
+    (tmp_path / "lights" / "b.fits").write_bytes(b"b")
+    (tmp_path / "link.fits").symlink_to(tmp_path / "a.fits")
+    fsync_file = mocker.patch.object(durability, "fsync_file")
+    fsync_dir = mocker.patch.object(durability, "fsync_dir")
+
+    durability.sync_tree(tmp_path)
+    assert sorted(c.args[0] for c in fsync_file.call_args_list) == [
+        tmp_path / "a.fits",
+        tmp_path / "lights" / "b.fits",
+    ]
+    # Subdirectories before their parent.
+    assert [c.args[0] for c in fsync_dir.call_args_list] == [
+        tmp_path / "lights",
+        tmp_path,
+    ]
+
+    fsync_file.reset_mock()
+    durability.sync_tree(tmp_path, files=False)
+    fsync_file.assert_not_called()
+
+
+def test_fsync(tmp_path: Path) -> None:
+    (tmp_path / "a").write_bytes(b"a")
+    durability.fsync_file(tmp_path / "a")
+    durability.fsync_dir(tmp_path)
+    # Missing directories are ignored.
+    durability.fsync_dir(tmp_path / "missing")
+    with pytest.raises(FileNotFoundError):
+        durability.fsync_file(tmp_path / "missing")
+
+
+@pytest.mark.parametrize("policy", list(Durability))
+def test_session_durability(
+    config_dummy: ConfigurationModel, mocker: MockFixture, policy: Durability
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    target = config_dummy.get_target("Backup")
+    target.durability = policy
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    destination = DestinationDirectory(
+        session, target, config_dummy.get_format("Backup")
+    )
+    fsync_file = mocker.spy(durability, "fsync_file")
+    sync_tree = mocker.spy(durability, "sync_tree")
+    fsync_dir = mocker.spy(durability, "fsync_dir")
+
+    progress: list[Progress] = []
+    with SessionRunner(source, 2, progress.append) as runner:
+        assert runner.copy(destination)
+
+    copied = list(destination.destination.iterdir())
+    assert len(copied) == len(progress)
+    if policy == Durability.NONE:
+        sync_tree.assert_not_called()
+        fsync_file.assert_not_called()
+        fsync_dir.assert_not_called()
+        return
+    # Each file is flushed once, either as it is copied or in a batch before the
+    # rename, then the rename is flushed by syncing the parent.
+    sync_tree.assert_called_once()
+    assert fsync_file.call_count == len(copied)
+    assert fsync_dir.call_args_list[-1].args[0] == destination.destination.parent
+
+
+def test_fsync_windows(tmp_path: Path, mocker: MockFixture) -> None:
+    (tmp_path / "a").write_bytes(b"a")
+    mocker.patch.object(durability.os, "name", "nt")
+    open_ = mocker.spy(durability.os, "open")
+    durability.fsync_file(tmp_path / "a")
+    assert open_.call_args.args[1] == os.O_RDWR
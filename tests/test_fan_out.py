@@ -0,0 +1,143 @@
+import os
+from pathlib import Path
+from typing import Iterable
+
+from pytest_mock import MockFixture
+
+from dwarf_copier import configuration, pipeline
+from dwarf_copier.configuration import ConfigurationModel
+from dwarf_copier.journal import WORKING_PREFIX
+from dwarf_copier.model import LinkCommand
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.pipeline import Progress, SessionRunner, make_links, make_skeleton
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+def destinations(config: ConfigurationModel) -> list[DestinationDirectory]:
+    source = config.get_source("TestEnv")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    return [
+        DestinationDirectory(session, config.get_target(name), config.get_format(name))
+        for name in ("Backup", "Siril")
+    ]
+
+
+def test_fan_out_links(config_dummy: ConfigurationModel) -> None:
+    for target in config_dummy.targets:
+        target.link = True
+    backup, siril = destinations(config_dummy)
+    progress: list[Progress] = []
+    source = config_dummy.get_source("TestEnv")
+    with SessionRunner(source, 2, progress.append) as runner:
+        assert runner.fan_out([backup, siril]) == [True, True]
+
+    # The second target links to the files in the first once it is in place.
+    light = siril.destination / "lights" / "0000.fits"
+    assert light.is_symlink()
+    assert light.resolve() == backup.destination / "0000.fits"
+    # Relative, so the targets can be moved together.
+    relative = os.path.relpath(backup.destination / "0000.fits", light.parent)
+    assert os.readlink(light) == relative
+    links = [p for p in progress if isinstance(p.action, LinkCommand)]
+    assert {p.action.source_folder for p in links} == {backup.destination}
+    assert not [
+        p
+        for p in siril.destination.parent.iterdir()
+        if p.name.startswith(WORKING_PREFIX)
+    ]
+
+
+def test_fan_out_primary_failed(
+    config_dummy: ConfigurationModel, mocker: MockFixture
+) -> None:
+    backup, siril = destinations(config_dummy)
+    source = config_dummy.get_source("TestEnv")
+    copy_file = source.driver.copy_file
+
+    def fail_first_frame(src: Path, dest: Path) -> int:
+        if src.name == "0000.fits":
+            raise OSError("Card read error")
+        return copy_file(src, dest)
+
+    mocker.patch.object(source.driver, "copy_file", fail_first_frame)
+    with SessionRunner(source, 2, lambda p: None) as runner:
+        # There is nothing for the second target to copy from.
+        assert runner.fan_out([backup, siril]) == [False, False]
+    assert not backup.destination.exists()
+    assert not siril.destination.exists()
+    assert not list(siril.destination.parent.iterdir())
+
+
+def test_make_skeleton(tmp_path: Path, mocker: MockFixture) -> None:
+    sessions = [tmp_path / "target" / name for name in ("a", "b")]
+    wanted = [
+        path / folder for path in sessions for folder in ("darks", "lights", "flats")
+    ]
+    mkdir = mocker.spy(Path, "mkdir")
+    make_skeleton([*sessions, *wanted, sessions[0] / "lights"])
+    assert all(path.is_dir() for path in wanted)
+    # Each directory is created once, missing parents with the first of them.
+    created = [c.args[0] for c in mkdir.call_args_list]
+    assert set(created) == {*sessions, *wanted, tmp_path / "target"}
+    assert all(created.count(path) == 1 for path in wanted)
+
+
+def test_fan_out_skeleton(
+    config_dummy: ConfigurationModel, mocker: MockFixture
+) -> None:
+    backup, siril = destinations(config_dummy)
+    source = config_dummy.get_source("TestEnv")
+    mkdir = mocker.spy(Path, "mkdir")
+    cache = configuration.cache_dir()
+    assert cache is not None
+
+    def targets_created() -> list[Path]:
+        paths = [c.args[0] for c in mkdir.call_args_list]
+        return [path for path in paths if not path.is_relative_to(cache)]
+
+    skeletons: list[list[Path]] = []
+    make = pipeline.make_skeleton
+
+    def make_skeleton(directories: Iterable[Path]) -> None:
+        make(directories)
+        skeletons.append(targets_created())
+
+    mocker.patch.object(pipeline, "make_skeleton", make_skeleton)
+    with SessionRunner(source, 2, lambda p: None) as runner:
+        assert runner.fan_out([backup, siril]) == [True, True]
+
+    # Made in one step for both targets, nothing else creates a directory.
+    assert skeletons == [targets_created()]
+    names = {path.name for path in skeletons[0]}
+    assert names >= {"lights", "darks", "flats", "biases"}
+    assert (siril.destination / "darks").is_dir()
+
+
+def test_make_links(tmp_path: Path) -> None:
+    frames = tmp_path / "session"
+    frames.mkdir()
+    (tmp_path / "lights").mkdir()
+    links = []
+    for name in ("0000.fits", "0001.fits"):
+        (frames / name).write_bytes(b"frame")
+        links.append(
+            LinkCommand(
+                source=frames / name,
+                dest=tmp_path / "lights" / name,
+                source_folder=frames,
+                working_folder=tmp_path,
+            )
+        )
+    (tmp_path / "lights" / "0000.fits").write_bytes(b"in the way")
+    links.append(links[0].model_copy(update={"dest": tmp_path / "missing" / "a"}))
+
+    progress = make_links(links)
+    assert [p.action for p in progress] == links
+    assert [type(p.error) for p in progress] == [
+        FileExistsError,
+        type(None),
+        FileNotFoundError,
+    ]
+    assert os.readlink(tmp_path / "lights" / "0001.fits") == "../session/0001.fits"
@@ -0,0 +1,123 @@
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier import fits
+from dwarf_copier.drivers import disk
+from tests.fits_files import header_bytes, write_fits
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+@pytest.fixture
+def session(tmp_path: Path, astronomy_source: Path) -> Path:
+    folder = tmp_path / M1
+    folder.mkdir()
+    (folder / "shotsInfo.json").write_bytes(
+        (astronomy_source / M1 / "shotsInfo.json").read_bytes()
+    )
+    for i in range(3):
+        write_fits(
+            folder / f"{i:04}.fits",
+            {
+                "DATE-OBS": f"2024-01-18T21:0{i}:00.000",
+                "EXPTIME": 15.0,
+                "CCD-TEMP": 12 + i,
+                "OBJECT": "M1",
+            },
+            data_size=1024 * 1024,
+        )
+    return folder
+
+
+def test_parse_cards() -> None:
+    header: fits.Header = {}
+    block = header_bytes(
+        {
+            "OBJECT": "It's M1",
+            "EXPTIME": 1.5e-3,
+            "GAIN": 80,
+            "FLIP": False,
+            "EMPTY": "",
+        }
+    )
+    assert fits.parse_block(block, header)
+    assert header == {
+        "SIMPLE": True,
+        "BITPIX": 16,
+        "NAXIS": 2,
+        "OBJECT": "It's M1",
+        "EXPTIME": 0.0015,
+        "GAIN": 80,
+        "FLIP": False,
+        "EMPTY": "",
+    }
+    assert fits.parse_value("  1.0D2 / comment") == 100.0
+    assert fits.parse_value(" 'a / b'  / comment") == "a / b"
+
+
+def test_multi_block_header(tmp_path: Path) -> None:
+    cards: dict[str, fits.HeaderValue] = {f"KEY{i}": i for i in range(60)}
+    write_fits(tmp_path / "big.fits", cards, data_size=10)
+    header = fits.read_file_header(str(tmp_path / "big.fits"))
+    assert header["KEY59"] == 59
+    assert len(header) == 63
+
+
+def test_index_session(session: Path, cache_path: Path, mocker: MockFixture) -> None:
+    pread = mocker.spy(os, "pread")
+    frames = fits.index_session(session, cache_path)
+
+    assert [f.name for f in frames] == ["0000.fits", "0001.fits", "0002.fits"]
+    assert frames[1].date_obs == datetime(2024, 1, 18, 21, 1)
+    assert frames[1].exposure == 15.0
+    assert frames[2].temperature == 14.0
+    assert frames[0].get("OBJECT") == "M1"
+    # Only the header block of each file is read, never the pixel data.
+    assert [c.args[1:] for c in pread.call_args_list] == [(fits.BLOCK_SIZE, 0)] * 3
+
+    # Indexed again from the cache without reading the files.
+    pread.reset_mock()
+    assert fits.index_session(session, cache_path) == frames
+    assert pread.call_count == 0
+
+    # Only a changed file is read again.
+    write_fits(session / "0001.fits", {"EXPTIME": 30.0})
+    frames = fits.index_session(session, cache_path)
+    assert pread.call_count == 1
+    assert frames[1].exposure == 30.0
+
+
+def test_not_fits(astronomy_source: Path, cache_path: Path) -> None:
+    # The test data contains placeholder files rather than real FITS files.
+    frames = fits.index_session(astronomy_source / M1, cache_path)
+    assert [(f.name, f.header) for f in frames] == [
+        ("0000.fits", {}),
+        ("0001.fits", {}),
+    ]
+    assert fits.index_session(astronomy_source / "missing", cache_path) == []
+
+
+def test_source_directory_frames(session: Path, mocker: MockFixture) -> None:
+    driver = disk.Driver(session.parent)
+    source = driver.create_session(session)
+    assert source is not None
+    assert [f.exposure for f in source.frames(driver)] == [15.0, 15.0, 15.0]
+    # Not read from sources that can't be read directly, e.g. FTP.
+    mocker.patch.object(driver, "local_path", return_value=None)
+    assert source.frames(driver) == []
+    assert source.model_dump().keys() == {
+        "path",
+        "info",
+        "date",
+        "darks",
+        "flats",
+        "biases",
+    }
+
+
+def test_no_cache(session: Path) -> None:
+    assert len(fits.index_session(session, None)) == 3
@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import pytest
+
+from dwarf_copier.configuration import ConfigurationModel
+from dwarf_copier.frame_filter import Criterion, FrameFilter, parse_ranges
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.models.frame_header import FrameHeader
+from dwarf_copier.pipeline import SessionCopy
+from tests.fits_files import write_fits
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+def header(**cards: str | int | float | bool) -> FrameHeader:
+    return FrameHeader(name="0000.fits", size=0, mtime_ns=0, header=cards)
+
+
+def test_parse_ranges() -> None:
+    assert parse_ranges("0-99, 120,150-") == [(0, 99), (120, 120), (150, None)]
+    with pytest.raises(ValueError):
+        parse_ranges("a-b")
+
+
+def test_criterion() -> None:
+    temp = Criterion.parse("ccd-temp < 20")
+    assert temp == Criterion("CCD-TEMP", "<", 20)
+    assert temp.test(header(**{"CCD-TEMP": 12.5}))
+    assert temp.test(header(**{"CCD-TEMP": 25})) is False
+    assert temp.test(header()) is None
+
+    date = Criterion.parse("DATE-OBS>=2024-01-18T21:01")
+    assert date.test(header(**{"DATE-OBS": "2024-01-18T21:01:30"}))
+    assert not date.test(header(**{"DATE-OBS": "2024-01-18T21:00:30"}))
+    assert Criterion.parse("OBJECT='M1'").test(header(OBJECT="M1"))
+    with pytest.raises(ValueError):
+        Criterion.parse("no operator")
+
+
+def test_reject_list(tmp_path: Path) -> None:
+    seq = tmp_path / "lights_.seq"
+    seq.write_text("#Siril sequence file\nS 'lights_' 1 4 3 0 1 5\nL -1\n")
+    seq.write_text(seq.read_text() + "I 1 1\nI 2 0\nI 3 1\nI 4 0\n")
+    listed = tmp_path / "rejected.txt"
+    listed.write_text("# bad frames\n0007.fits\n12\n\n")
+
+    frame_filter = FrameFilter()
+    frame_filter.read_reject_list(seq)
+    frame_filter.read_reject_list(listed)
+    assert frame_filter.rejected_positions == {2, 4}
+    assert frame_filter.rejected_names == {"0007.fits"}
+    assert frame_filter.rejected_numbers == {12}
+
+    assert not frame_filter.accepts("0001.fits", 2, None)
+    assert not frame_filter.accepts("0007.fits", 8, None)
+    assert not frame_filter.accepts("0012.fits", 13, None)
+    assert frame_filter.accepts("0002.fits", 3, None)
+
+
+@pytest.fixture
+def session(tmp_path: Path, astronomy_source: Path) -> Path:
+    folder = tmp_path / "card" / M1
+    folder.mkdir(parents=True)
+    (folder / "shotsInfo.json").write_bytes(
+        (astronomy_source / M1 / "shotsInfo.json").read_bytes()
+    )
+    (folder / "stacked.jpg").write_bytes(b"jpg")
+    for i in range(6):
+        write_fits(folder / f"{i:04}.fits", {"CCD-TEMP": 10 + i * 2}, 1000)
+    return folder
+
+
+def test_session_copy(
+    session: Path, config_dummy: ConfigurationModel, tmp_path: Path
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    source.path = session.parent
+    source_dir = source.driver.create_session(session)
+    assert source_dir is not None
+    destination = DestinationDirectory(
+        source_dir, config_dummy.get_target("Siril"), config_dummy.get_format("Siril")
+    )
+    frame_filter = FrameFilter(
+        ranges=parse_ranges("1-"), criteria=[Criterion.parse("CCD-TEMP<=18")]
+    )
+    frame_filter.rejected_numbers.add(2)
+    job = SessionCopy(destination, source, frame_filter)
+    try:
+        commands = job.start()
+    finally:
+        job.cleanup()
+
+    assert sorted(c.source.name for c in commands) == [
+        "0001.fits",
+        "0003.fits",
+        "0004.fits",
+        "shotsInfo.json",
+        "stacked.jpg",
+    ]
+
+
+def test_stacked_not_numbered(session: Path, config_dummy: ConfigurationModel) -> None:
+    write_fits(session / "stacked-16.fits", {}, 1000)
+    driver = config_dummy.get_source("TestEnv").driver
+    source_dir = driver.create_session(session)
+    assert source_dir is not None
+    # Siril numbers the six frames 1-6, the stacked image has no number.
+    frame_filter = FrameFilter(rejected_positions={6, 7})
+    assert frame_filter.excluded(source_dir, sorted(session.iterdir()), driver) == {
+        session / "0005.fits"
+    }
@@ -0,0 +1,47 @@
+"""Import-time benchmark, the same measurement as `python -X importtime`."""
+import subprocess
+import sys
+from typing import Callable
+
+import pytest
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Import module in a fresh interpreter, return cumulative time (us) by module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["dwarf_copier.configuration", "dwarf_copier.model", "dwarf_copier.drivers.disk"],
+)
+def test_no_heavy_imports(
+    module: str, record_property: Callable[[str, object], None]
+) -> None:
+    times = import_times(module)
+    record_property("import_us", times[module])
+
+    heavy = {"textual", "pydantic_settings", "rich", "yaml"}
+    assert heavy.isdisjoint(times)
+
+
+def test_app_import_defers_screens(
+    record_property: Callable[[str, object], None],
+) -> None:
+    times = import_times("dwarf_copier.app")
+    record_property("import_us", times["dwarf_copier.app"])
+
+    assert "dwarf_copier.screens.help" not in times
+    assert "textual.widgets._markdown" not in times
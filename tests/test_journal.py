@@ -0,0 +1,131 @@
+import gzip
+import os
+import time
+from pathlib import Path
+
+from dwarf_copier import journal
+from dwarf_copier.configuration import Compression, ConfigurationModel
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.pipeline import Progress, SessionRunner
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+def interrupted(tmp_path: Path, name: str) -> tuple[Path, Path]:
+    destination = tmp_path / "target" / name
+    working = journal.working_path(destination)
+    working.mkdir(parents=True)
+    (working / "0000.fits").write_bytes(b"frame")
+    return working, destination
+
+
+def test_recover(tmp_path: Path) -> None:
+    path = tmp_path / journal.JOURNAL_FILE
+    log = journal.Journal(path)
+    committing = interrupted(tmp_path, "committing")
+    stale = interrupted(tmp_path, "stale")
+    fresh = interrupted(tmp_path, "fresh")
+    done = interrupted(tmp_path, "done")
+    for working, destination in (committing, stale, fresh, done):
+        log.begin(working, destination)
+    log.committing(*committing)
+    log.done(*done)
+    with path.open("a") as f:
+        f.write('{"step": "copy')
+
+    now = time.time() + journal.STALE_AFTER / 2
+    entries = log.pending()
+    entries[str(stale[0])].time -= journal.STALE_AFTER
+    log.rewrite(list(entries.values()))
+
+    recovery = log.recover(now)
+    assert recovery == journal.Recovery(completed=1, removed=1, resumable=1)
+    assert (committing[1] / "0000.fits").exists()
+    assert not committing[0].exists()
+    assert not stale[0].exists()
+    assert fresh[0].exists()
+    # Entries done with are dropped, only the copy to resume is remembered.
+    assert list(log.pending()) == [str(fresh[0])]
+    # Nothing changes the second time.
+    assert log.recover(now) == journal.Recovery(resumable=1)
+
+
+def test_recover_committed(tmp_path: Path) -> None:
+    log = journal.Journal(tmp_path / journal.JOURNAL_FILE)
+    working, destination = interrupted(tmp_path, "session")
+    destination.mkdir()
+    log.committing(working, destination)
+    # A destination that already exists is never replaced.
+    assert log.recover() == journal.Recovery(removed=1)
+    assert not working.exists()
+    assert not list(destination.iterdir())
+
+
+def test_disabled() -> None:
+    log = journal.Journal(None)
+    log.begin(Path("a"), Path("b"))
+    assert log.pending() == {}
+    assert log.recover() == journal.Recovery()
+
+
+def test_resume(config_dummy: ConfigurationModel) -> None:
+    source = config_dummy.get_source("TestEnv")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    destination = DestinationDirectory(
+        session, config_dummy.get_target("Backup"), config_dummy.get_format("Backup")
+    )
+
+    # An earlier copy stopped after copying one file and part of another.
+    working = journal.working_path(destination.destination)
+    working.mkdir(parents=True)
+    frames = sorted(session.path.glob("*.fits"))
+    complete, partial = frames[:2]
+    (working / complete.name).write_bytes(complete.read_bytes())
+    journal.mark_copied(complete, working / complete.name)
+    (working / partial.name).write_bytes(bytes(partial.stat().st_size))
+    journal.journal().begin(working, destination.destination)
+
+    progress: list[Progress] = []
+    with SessionRunner(source, 2, progress.append) as runner:
+        assert runner.copy(destination)
+
+    copied = {p.action.dest.name for p in progress}
+    assert complete.name not in copied
+    assert partial.name in copied
+    for frame in frames:
+        copy = destination.destination / frame.name
+        assert copy.read_bytes() == frame.read_bytes()
+        assert os.stat(copy).st_mtime_ns == frame.stat().st_mtime_ns
+    assert not working.exists()
+    assert journal.journal().pending() == {}
+
+
+def test_resume_compressed(config_dummy: ConfigurationModel) -> None:
+    source = config_dummy.get_source("TestEnv")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    format = config_dummy.get_format("Backup")
+    format.compress = Compression.GZIP
+    destination = DestinationDirectory(
+        session, config_dummy.get_target("Backup"), format
+    )
+
+    working = journal.working_path(destination.destination)
+    working.mkdir(parents=True)
+    complete, partial = sorted(session.path.glob("*.fits"))[:2]
+    with gzip.open(working / f"{complete.name}.gz", "wb") as f:
+        f.write(complete.read_bytes())
+    journal.mark_copied(complete, working / f"{complete.name}.gz")
+    (working / f"{partial.name}.gz").write_bytes(b"\x1f\x8b")
+    journal.journal().begin(working, destination.destination)
+
+    progress: list[Progress] = []
+    with SessionRunner(source, 2, progress.append) as runner:
+        assert runner.copy(destination)
+
+    copied = {p.action.dest.name for p in progress}
+    assert f"{complete.name}.gz" not in copied
+    assert f"{partial.name}.gz" in copied
+    with gzip.open(destination.destination / f"{partial.name}.gz") as f:
+        assert f.read() == partial.read_bytes()
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from dwarf_copier import cli, profiling
+from dwarf_copier.configuration import ConfigurationModel
+
+
+def test_phases(tmp_path: Path) -> None:
+    assert profiling.phase("copy") is profiling.phase("prepare")
+    profiling.start(tmp_path)
+    try:
+        with profiling.phase("copy"):
+            # Time is recorded for an overlapping phase, its calls are profiled
+            # with the outer one.
+            with profiling.phase("specials"):
+                sum(range(1000))
+        with profiling.phase("copy"):
+            pass
+    finally:
+        assert profiling.stop() == tmp_path
+
+    assert (tmp_path / "copy.prof").exists()
+    assert not (tmp_path / "specials.prof").exists()
+    summary = (tmp_path / profiling.SUMMARY_FILE).read_text()
+    assert "copy: 2 calls" in summary
+    assert "specials: 1 calls" in summary
+    # Stopped, phases do nothing again.
+    assert profiling.stop() is None
+
+
+def test_profile_copy(
+    config_file: Path,
+    config_dummy: ConfigurationModel,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    folder = tmp_path / "profile"
+    monkeypatch.setenv("DWARF_COPY_PROFILE", str(folder))
+    args = ["--config", str(config_file), "copy", "--source", "TestEnv"]
+    assert cli.main(args + ["--target", "Backup", "--select", "M1"]) == 0
+
+    assert sorted(p.name for p in folder.iterdir()) == [
+        "copy.prof",
+        "list_dirs.prof",
+        "prepare.prof",
+        profiling.SUMMARY_FILE,
+    ]
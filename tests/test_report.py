@@ -0,0 +1,146 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier import report
+from dwarf_copier.configuration import ConfigurationModel
+from dwarf_copier.model import QUIT_COMMAND, CommandQueue, CopyCommand
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.pipeline import Progress, SessionRunner
+from dwarf_copier.report import FileTiming, RunReport
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+def test_timed_phases() -> None:
+    with report.timed() as timing:
+        time.sleep(0.01)
+        report.mark("open")
+        time.sleep(0.02)
+        report.mark("transfer")
+        time.sleep(0.01)
+    assert timing.open >= 0.01
+    assert timing.transfer >= 0.02
+    # Unmarked time after a phase counts as closing.
+    assert timing.close >= 0.01
+
+    with report.timed() as timing:
+        time.sleep(0.01)
+    assert timing.open == timing.close == 0
+    assert timing.transfer >= 0.01
+    # Marks outside a timed block are ignored.
+    report.mark("open")
+
+
+def test_queue_wait(tmp_path: Path) -> None:
+    queue = CommandQueue()
+    command = CopyCommand(
+        source=tmp_path / "a",
+        dest=tmp_path / "b",
+        source_folder=tmp_path,
+        working_folder=tmp_path,
+    )
+    queue.put(command)
+    time.sleep(0.01)
+    assert queue.waited(queue.get()) >= 0.01
+    assert queue.waited(command) == 0
+    # Nothing is left behind for the sentinel that stops the workers.
+    queue.put(QUIT_COMMAND)
+    assert queue.get() is QUIT_COMMAND
+    assert queue.queued == {}
+
+
+def test_run_report(tmp_path: Path) -> None:
+    run = RunReport()
+    command = CopyCommand(
+        source=tmp_path / "a",
+        dest=tmp_path / "b",
+        source_folder=tmp_path,
+        working_folder=tmp_path,
+    )
+    run.record(Progress(command, 1000, timing=FileTiming(1, 0.5, 2, 0.5)))
+    run.record(Progress(command, error=OSError("failed")))
+    run.end = run.start + 10
+
+    summary = run.summary()
+    assert summary["bytes"] == 1000
+    assert summary["files"] == 2
+    assert summary["errors"] == 1
+    assert summary["throughput"] == pytest.approx(100)
+    assert summary["phases"]["wait"] == 1
+    [worker] = summary["workers"].values()
+    assert worker["utilisation"] == pytest.approx(0.3, abs=0.01)
+
+    text = run.prometheus()
+    assert "dwarf_copy_bytes 1000\n" in text
+    assert 'dwarf_copy_files{status="error"} 1\n' in text
+    assert 'dwarf_copy_phase_seconds{phase="transfer"} 2' in text
+
+    path = run.save(tmp_path / "reports", prometheus=True)
+    assert path is not None
+    saved = json.loads(path.read_text())
+    assert saved["files"][0]["timing"]["transfer"] == 2
+    assert (tmp_path / "reports" / report.PROMETHEUS_FILE).exists()
+
+
+def test_prune(tmp_path: Path) -> None:
+    names = [f"2024-01-{day:02}T21-00-00.json" for day in range(1, 6)]
+    for name in names:
+        (tmp_path / name).write_text("{}")
+    (tmp_path / report.PROMETHEUS_FILE).touch()
+    run = RunReport()
+    path = run.save(tmp_path, keep=3)
+    assert path is not None
+    # The new report is the newest so two of the old ones are kept.
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        *names[3:],
+        path.name,
+        report.PROMETHEUS_FILE,
+    ]
+
+
+def test_same_second(tmp_path: Path) -> None:
+    """Runs started in the same second don't overwrite each other's reports."""
+    first, second = RunReport(), RunReport()
+    second.started = first.started
+    paths = [first.save(tmp_path, prometheus=True), second.save(tmp_path, keep=2)]
+    assert None not in paths
+    assert len(set(paths)) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        [p.name for p in paths if p] + [report.PROMETHEUS_FILE]
+    )
+    # The later run counts as newer when pruning.
+    RunReport(started=first.started).save(tmp_path, keep=2)
+    assert paths[0] is not None and not paths[0].exists()
+
+
+def test_prometheus_replaced(tmp_path: Path, mocker: MockFixture) -> None:
+    """The collector sees the old or the new metrics, never part of them."""
+    (tmp_path / report.PROMETHEUS_FILE).write_text("old\n")
+    replace = mocker.spy(Path, "replace")
+    RunReport().save(tmp_path, prometheus=True)
+    replace.assert_called_once()
+    assert "dwarf_copy_bytes 0\n" in (tmp_path / report.PROMETHEUS_FILE).read_text()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_session_report(config_dummy: ConfigurationModel, report_path: Path) -> None:
+    source = config_dummy.get_source("TestEnv")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    destination = DestinationDirectory(
+        session, config_dummy.get_target("Backup"), config_dummy.get_format("Backup")
+    )
+    with SessionRunner(source, 2, lambda p: None) as runner:
+        assert runner.copy(destination)
+
+    path = report.save(runner.report)
+    assert path is not None and path.parent == report_path
+    saved = json.loads(path.read_text())
+    assert saved["summary"]["files"] == len(list(destination.destination.iterdir()))
+    assert set(saved["summary"]["workers"]) <= {"copy_0", "copy_1"}
+    fits = [f for f in saved["files"] if f["source"].endswith("0000.fits")]
+    assert fits[0]["timing"]["transfer"] > 0
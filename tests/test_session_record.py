@@ -0,0 +1,27 @@
+import sys
+from datetime import datetime
+
+from dwarf_copier.models.session_record import SessionRecord
+from dwarf_copier.models.source_directory import SourceDirectory
+
+
+def test_round_trip(source_directories: list[SourceDirectory]) -> None:
+    for session in source_directories:
+        record = SessionRecord.from_session(session)
+        assert record.session() == session
+        assert record.name == session.path.name
+        assert record.exp_fraction == session.info.exp_fraction
+
+
+def test_strings_shared(source_directories: list[SourceDirectory]) -> None:
+    session = source_directories[0]
+    copy = session.model_copy(
+        update={
+            "info": session.info.model_copy(update={"target": "".join(["M", "1"])}),
+            "date": datetime(2024, 1, 19),
+        }
+    )
+    first = SessionRecord.from_session(session)
+    second = SessionRecord.from_session(copy)
+    assert first.target is second.target is sys.intern("M1")
+    assert not hasattr(first, "__dict__")
@@ -0,0 +1,38 @@
+import pytest
+from pytest_mock import MockFixture
+from textual.app import App
+
+from dwarf_copier.configuration import ConfigurationModel
+from dwarf_copier.model import State
+from dwarf_copier.screens.show_sessions import ShowSessions
+from dwarf_copier.thumbnails import Thumbnail
+from dwarf_copier.widgets.preview import SessionPreview
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_stale_preview(
+    mocker: MockFixture, config_dummy: ConfigurationModel
+) -> None:
+    target = config_dummy.get_target("Backup")
+    state = State(
+        config_dummy.get_source("TestEnv"),
+        target,
+        [],
+        config_dummy.get_format(target.format),
+    )
+    # No listing, so nothing else reaches the preview.
+    mocker.patch.object(ShowSessions, "list_dirs")
+    app: App[None] = App()
+    async with app.run_test() as pilot:
+        screen = ShowSessions(state)
+        await pilot.app.push_screen(screen)
+        show = mocker.patch.object(SessionPreview, "show")
+        thumbnail = Thumbnail(1, 1, bytes(3))
+
+        # A row the cursor has already left.
+        screen.show_preview(mocker.Mock(is_cancelled=True), thumbnail)
+        show.assert_not_called()
+
+        screen.show_preview(mocker.Mock(is_cancelled=False), thumbnail)
+        show.assert_called_once_with(thumbnail)
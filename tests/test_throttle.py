@@ -0,0 +1,170 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier import throttle
+from dwarf_copier.configuration import ConfigGeneral, ConfigurationModel
+from dwarf_copier.model import CopyCommand
+from dwarf_copier.models.destination_directory import DestinationDirectory
+from dwarf_copier.pipeline import Progress, SessionRunner
+from dwarf_copier.throttle import MEGABYTE, Throttle, TokenBucket
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_token_bucket() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(100, burst=50, clock=clock, sleep=clock.sleep)
+    # The burst is free, after that the rate applies.
+    assert bucket.consume(50) == 0
+    assert bucket.consume(100) == pytest.approx(1.0)
+    assert bucket.consume(300) == pytest.approx(3.0)
+    assert clock.now == pytest.approx(4.0)
+    # Tokens refill while idle but no more than the burst.
+    clock.now += 10
+    assert bucket.consume(50) == 0
+    assert bucket.consume(10) == pytest.approx(0.1)
+
+
+def test_token_bucket_shared() -> None:
+    clock = FakeClock()
+    lock = threading.Lock()
+
+    def sleep(seconds: float) -> None:
+        with lock:
+            clock.now += seconds
+
+    bucket = TokenBucket(1000, burst=0, clock=clock, sleep=sleep)
+    threads = [
+        threading.Thread(target=lambda: [bucket.consume(100) for _ in range(10)])
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 4000 bytes at 1000 per second, however the threads interleave.
+    assert clock.now >= 4.0 - 1e-9
+
+
+def test_from_config() -> None:
+    assert Throttle.from_config(ConfigGeneral()).bucket is None
+    limited = Throttle.from_config(ConfigGeneral(bandwidth=2.5, background=True))
+    assert limited.bucket is not None
+    assert limited.bucket.rate == 2.5 * MEGABYTE
+    assert limited.background
+
+
+def test_lower_priority(mocker: MockFixture) -> None:
+    mocker.patch("sys.platform", "linux")
+    mocker.patch("platform.machine", return_value="unknown")
+    setpriority = mocker.patch("os.setpriority", create=True)
+    throttle.lower_priority()
+    setpriority.assert_called_once()
+    assert setpriority.call_args.args[2] == throttle.NICE
+
+
+@pytest.mark.parametrize("system", ["darwin", "win32"])
+def test_lower_priority_elsewhere(mocker: MockFixture, system: str) -> None:
+    """Elsewhere the thread id would be taken as a process id."""
+    mocker.patch("sys.platform", system)
+    setpriority = mocker.patch("os.setpriority", create=True)
+    throttle.lower_priority()
+    setpriority.assert_not_called()
+
+
+def test_session_throttled(
+    config_dummy: ConfigurationModel, mocker: MockFixture, tmp_path: Path
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    destination = DestinationDirectory(
+        session, config_dummy.get_target("Backup"), config_dummy.get_format("Backup")
+    )
+    bucket = TokenBucket(100 * MEGABYTE)
+    consume = mocker.spy(bucket, "consume")
+    lower_priority = mocker.patch.object(throttle, "lower_priority")
+
+    progress: list[Progress] = []
+    with SessionRunner(
+        source, 2, progress.append, throttle=Throttle(bucket, background=True)
+    ) as runner:
+        assert runner.copy(destination)
+
+    assert lower_priority.call_count == 2
+    assert sum(c.args[0] for c in consume.call_args_list) == sum(
+        p.bytes for p in progress
+    )
+
+
+def test_transfer_limits(tmp_path: Path) -> None:
+    throttle = Throttle()
+    assert throttle.workers(4) == 4
+    throttle.limit(tmp_path / "source", 1)
+    throttle.limit(tmp_path / "nas", 8)
+    throttle.limit(tmp_path / "local", None)
+    assert throttle.workers(4) == 8
+
+    def command(target: str) -> CopyCommand:
+        return CopyCommand(
+            source=tmp_path / "source" / "a.fits",
+            dest=tmp_path / target / "work" / "a.fits",
+            source_folder=tmp_path / "source",
+            working_folder=tmp_path / target / "work",
+        )
+
+    with throttle.hold(command("nas")):
+        # Both ends are held.
+        assert not throttle.slots[tmp_path / "source"].acquire(blocking=False)
+        assert throttle.slots[tmp_path / "nas"].acquire(blocking=False)
+        throttle.slots[tmp_path / "nas"].release()
+    assert throttle.slots[tmp_path / "source"].acquire(blocking=False)
+
+
+def test_source_limit(
+    config_dummy: ConfigurationModel, mocker: MockFixture, tmp_path: Path
+) -> None:
+    source = config_dummy.get_source("TestEnv")
+    source.max_transfers = 1
+    target = config_dummy.get_target("Backup")
+    session = source.driver.create_session(source.path / M1)
+    assert session is not None
+    destination = DestinationDirectory(
+        session, target, config_dummy.get_format("Backup")
+    )
+    active = peak = 0
+    lock = threading.Lock()
+    copy_file = source.driver.copy_file
+
+    def counting_copy(src: Path, dest: Path) -> int:
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        return copy_file(src, dest)
+
+    mocker.patch.object(source.driver, "copy_file", counting_copy)
+    throttle = Throttle.from_config(config_dummy.general, source, target)
+    progress: list[Progress] = []
+    with SessionRunner(source, 4, progress.append, throttle=throttle) as runner:
+        assert runner.copy(destination)
+    assert len(progress) > 1
+    assert peak == 1
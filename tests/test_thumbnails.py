@@ -0,0 +1,74 @@
+import os
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier import thumbnails
+from dwarf_copier.drivers import disk
+from dwarf_copier.thumbnails import Thumbnail, ThumbnailCache
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+
+
+def solid(width: int, height: int, rgb: tuple[int, int, int]) -> Thumbnail:
+    return Thumbnail(width, height, bytes(rgb) * width * height)
+
+
+def test_ppm_round_trip() -> None:
+    thumbnail = Thumbnail(2, 1, bytes([1, 2, 3, 4, 5, 6]))
+    assert Thumbnail.from_ppm(thumbnail.to_ppm()) == thumbnail
+    with pytest.raises(ValueError):
+        Thumbnail.from_ppm(thumbnail.to_ppm()[:-1])
+
+
+def test_render() -> None:
+    text = solid(4, 3, (255, 0, 0)).render()
+    lines = text.plain.split("\n")
+    assert lines == ["\N{UPPER HALF BLOCK}" * 4] * 2
+    assert str(text.spans[0].style) == "rgb(255,0,0) on rgb(255,0,0)"
+    assert str(text.spans[-1].style) == "rgb(255,0,0)"
+
+
+def test_cache_lru(tmp_path: Path) -> None:
+    size = len(solid(4, 4, (0, 0, 0)).to_ppm())
+    cache = ThumbnailCache(tmp_path, max_bytes=size * 2)
+    cache.put("a", solid(4, 4, (1, 1, 1)))
+    cache.put("b", solid(4, 4, (2, 2, 2)))
+    os.utime(cache.path("a"), ns=(1, 1))
+    os.utime(cache.path("b"), ns=(2, 2))
+    # Using 'a' makes 'b' the least recently used.
+    assert cache.get("a") == solid(4, 4, (1, 1, 1))
+
+    cache.put("c", solid(4, 4, (3, 3, 3)))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_preview_cached(
+    astronomy_source: Path, tmp_path: Path, mocker: MockFixture
+) -> None:
+    driver = disk.Driver(astronomy_source)
+    session = driver.create_session(astronomy_source / M1)
+    assert session is not None
+    cache = ThumbnailCache(tmp_path)
+    make = mocker.patch.object(
+        thumbnails, "make_thumbnail", return_value=solid(2, 2, (9, 9, 9))
+    )
+    mocker.patch.object(thumbnails.importlib.util, "find_spec", return_value=True)
+
+    assert thumbnails.preview(session, driver, cache) == solid(2, 2, (9, 9, 9))
+    make.assert_called_once_with(astronomy_source / M1 / "stacked_thumbnail.jpg")
+
+    # The image is only decoded once.
+    assert thumbnails.preview(session, driver, cache) == solid(2, 2, (9, 9, 9))
+    assert make.call_count == 1
+
+
+def test_make_thumbnail(astronomy_source: Path) -> None:
+    pytest.importorskip("PIL")
+    thumbnail = thumbnails.make_thumbnail(astronomy_source / M1 / "stacked.jpg")
+    assert thumbnail.width <= thumbnails.WIDTH
+    assert thumbnail.height <= thumbnails.HEIGHT
+    assert len(thumbnail.pixels) == thumbnail.width * thumbnail.height * 3
@@ -0,0 +1,75 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+from dwarf_copier.drivers import disk
+from dwarf_copier.watch import SessionWatcher
+
+M1 = "DWARF_RAW_M1_EXP_15_GAIN_80_2024-01-18-21-04-26-954"
+M43 = "DWARF_RAW_M43_EXP_5_GAIN_60_2024-01-22-19-04-10-409"
+
+
+@pytest.fixture
+def card(tmp_path: Path, astronomy_source: Path) -> Path:
+    root = tmp_path / "card"
+    root.mkdir()
+    shutil.copytree(astronomy_source / M1, root / M1)
+    return root
+
+
+def test_waits_until_stable(card: Path) -> None:
+    watcher = SessionWatcher(disk.Driver(card), settle=10)
+
+    assert watcher.poll(now=0) == []
+    assert watcher.poll(now=5) == []
+    ready = watcher.poll(now=10)
+    assert [s.path.name for s in ready] == [M1]
+
+    # Copied sessions are not reported again.
+    assert watcher.poll(now=100) == []
+
+
+def test_new_session(card: Path, astronomy_source: Path) -> None:
+    watcher = SessionWatcher(disk.Driver(card), settle=10)
+    watcher.poll(now=0)
+    assert [s.path.name for s in watcher.poll(now=10)] == [M1]
+
+    # Telescope starts a new session, shotsInfo.json is written last.
+    session = card / M43
+    session.mkdir()
+    os.utime(card, ns=(1, 1))
+    shutil.copy(astronomy_source / M43 / "0000.fits", session)
+    assert watcher.poll(now=20) == []
+    assert watcher.poll(now=40) == []
+
+    shutil.copy(astronomy_source / M43 / "shotsInfo.json", session)
+    assert watcher.poll(now=41) == []
+    assert [s.path.name for s in watcher.poll(now=51)] == [M43]
+
+
+def test_no_rescan_when_unchanged(card: Path, mocker: MockFixture) -> None:
+    watcher = SessionWatcher(disk.Driver(card), settle=10)
+    scan = mocker.spy(watcher, "scan")
+
+    for now in range(0, 100, 10):
+        watcher.poll(now=now)
+    assert scan.call_count == 1
+
+
+def test_retry(card: Path, astronomy_source: Path) -> None:
+    watcher = SessionWatcher(disk.Driver(card), settle=10)
+    (card / M1 / "shotsInfo.json").write_text('{"target": ')
+    watcher.poll(now=0)
+    # Unreadable, e.g. still being written: kept and tried again.
+    assert watcher.poll(now=10) == []
+    shutil.copy(astronomy_source / M1 / "shotsInfo.json", card / M1)
+    assert watcher.poll(now=20) == []
+    (session,) = watcher.poll(now=30)
+
+    # The copy failed, it is reported again once settled.
+    watcher.retry(session)
+    assert watcher.poll(now=40) == []
+    assert [s.path.name for s in watcher.poll(now=50)] == [M1]